@@ -1,21 +1,15 @@
 # app.py — واجهة تبويبات + إصلاح KeyError + إبعاد زر التنزيل
-import os, io, re, tempfile, streamlit as st, pandas as pd
-from gtts import gTTS
-from openpyxl import Workbook
-from openpyxl.styles import Font, Alignment, PatternFill
-from openpyxl.utils import get_column_letter
+import re, uuid, streamlit as st
 from datetime import datetime
 
-# ===== استيراد الوحدات =====
+# ===== استيراد الوحدات الخفيفة (صفحة الهبوط لا تحتاج غيرها — راجع bench/import_budget.py) =====
 from modules.ui import setup_language, apply_theme, render_header, landing_hero
-from modules.extractors import parse_criteria_from_excel, extract_text_with_pages
-from modules.evaluator import evaluate_offers
-from modules.analyzer import (
-    suggest_criteria_from_offers,
-    analyze_sections_with_pages,
-    summarize_paragraphs_llm,
-)
-from modules.chatbot import TenderChat
+from modules.tracing import Trace, bind_trace
+
+# ===== قياس الأداء (سجل مقاطع لكل جلسة) =====
+if "trace" not in st.session_state:
+    st.session_state.trace = Trace()
+bind_trace(st.session_state.trace)
 
 # ===== إعداد الواجهة =====
 T = setup_language()
@@ -42,6 +36,121 @@ if not st.session_state.uploaded:
                 st.warning("⚠️ فضلاً ارفع ملف المعايير والعروض أولاً.")
     st.stop()
 
+# ===== استيراد وحدات المعالجة (بعد رفع الملفات فقط) =====
+# مكتبات PyMuPDF / openpyxl / Groq / OCR / الترجمة تُستورد داخل الوحدات عند أول استخدام فعلي
+import pandas as pd
+from modules.extractors import parse_criteria_from_excel
+from modules.document import open_document
+from modules.analyzer import summarize_paragraphs_llm
+from modules.chatbot import TenderChat
+from modules.llm import stream_chat_completion, usage_stats, PRIORITY_INTERACTIVE
+from modules.report import get_excel_report
+from modules.scoring import ScoreMatrix, NORMALIZATIONS
+from modules.jobs import get_queue, DONE, FAILED, CANCELLED, FINISHED
+from modules.tts import speak_async
+
+def _store_evaluation(ranked, details):
+    """حفظ نتيجة التقييم كمصفوفة درجات (الأوزان الابتدائية من عمود weight إن وُجد)"""
+    crit_df = st.session_state.criteria_df
+    weights = dict(zip(crit_df["criterion"], crit_df["weight"])) if "weight" in crit_df.columns else None
+    st.session_state.results = ranked
+    st.session_state.details = details
+    st.session_state.matrix = ScoreMatrix.from_results(ranked, details, crit_df["criterion"].tolist(), weights)
+    st.session_state.eval_id = st.session_state.get("eval_id", 0) + 1
+
+
+# ===== مهام الخلفية: التقييم والتحليل والاقتراح تعمل خارج دورة السكربت =====
+# (إعادة التشغيل أو التفاعل مع الواجهة لا يقطعها، وتُتابَع بمعرّف المهمة)
+JOB_POLL_SECONDS = 2
+job_queue = get_queue()
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+st.session_state.setdefault("jobs", {})        # نوع المهمة → آخر معرّف أُرسل
+st.session_state.setdefault("jobs_seen", set())  # مهام منتهية طُبّقت نتيجتها على الجلسة
+
+
+def _submit_job(kind, params=None):
+    """إرسال مهمة بملفات العروض الحالية (المهمة السابقة من نفس النوع تُلغى إن كانت جارية)"""
+    previous = st.session_state.jobs.get(kind)
+    if previous:
+        job_queue.cancel(previous)
+    files = [(f.name, f.getvalue()) for f in st.session_state._offers]
+    st.session_state.jobs[kind] = job_queue.submit(
+        kind, params, files=files, owner=st.session_state.session_id, trace=st.session_state.trace
+    )
+
+
+def _apply_evaluation(result):
+    ranked = pd.DataFrame(result["ranking"]) if result["ranking"] else pd.DataFrame(columns=["file", "overall", "comment"])
+    details = {name: pd.DataFrame(rows) for name, rows in result["details"].items()}
+    _store_evaluation(ranked, details)
+
+
+def _apply_suggestions(rows):
+    st.session_state.suggested_criteria_df = pd.DataFrame(rows)
+
+
+def _apply_sections(topics):
+    st.session_state.topics = topics
+
+
+# تحديث دوري لجزء الحالة فقط (st.fragment)، أو زر تحديث في الإصدارات الأقدم من Streamlit
+_poll = st.fragment(run_every=JOB_POLL_SECONDS) if hasattr(st, "fragment") else (lambda fn: fn)
+
+
+def _job_panel(kind, label, on_done):
+    """حالة مهمة النوع kind: المهمة المنتهية تُعرض مرة واحدة دون تحديث دوري، والجارية عبر _job_progress"""
+    job_id = st.session_state.jobs.get(kind)
+    job = job_queue.status(job_id) if job_id else None
+    if job is None:
+        return
+    if job["status"] not in FINISHED:
+        _job_progress(job_id, label)
+        return
+    if job_id not in st.session_state.jobs_seen:
+        st.session_state.jobs_seen.add(job_id)
+        if job["status"] == DONE:
+            on_done(job_queue.result(job_id))
+        st.rerun()
+    if job["status"] == DONE:
+        st.success(f"✅ {label}: اكتملت خلال {job['elapsed_s']} ث.")
+    elif job["status"] == FAILED:
+        st.error(f"⚠️ {label}: فشلت المهمة — {job['error']}")
+    elif job["status"] == CANCELLED:
+        st.warning(f"⛔ {label}: أُلغيت المهمة.")
+    notes = [(level, msg) for level, msg in job["messages"] if level in ("warning", "error")]
+    if notes:
+        with st.expander(f"📋 ملاحظات {label} ({len(notes)})", expanded=False):
+            for level, msg in notes:
+                getattr(st, level)(msg)
+
+
+@_poll
+def _job_progress(job_id, label):
+    """يُحدَّث دوريًا ما دامت المهمة في الانتظار أو قيد التنفيذ فقط؛ عند انتهائها تُعاد الصفحة كاملة مرة واحدة"""
+    job = job_queue.status(job_id)
+    if job is None or job["status"] in FINISHED:
+        st.rerun()
+    waiting = job["status"] == "queued"
+    text = "⏳ في انتظار دورها..." if waiting else (job["message"] or "…")
+    st.progress(min(max(job["progress"], 0.0), 1.0), text=f"{label} — {text}")
+    col_cancel, col_refresh, _ = st.columns([1, 1, 4])
+    col_cancel.button("⛔ إلغاء", key=f"cancel_{job_id}", on_click=job_queue.cancel, args=(job_id,))
+    if not hasattr(st, "fragment"):
+        col_refresh.button("🔄 تحديث", key=f"refresh_{job_id}")
+
+
+@_poll
+def _audio_wait():
+    """ينتظر تركيب الصوت دون إعادة تشغيل الصفحة كاملة، ثم يعيد تشغيلها مرة واحدة لعرض المشغّل"""
+    audio = st.session_state.get("chat_audio")
+    if audio is not None and audio.done():
+        st.rerun()
+    st.caption("🔊 جارٍ تجهيز الصوت...")
+    if not hasattr(st, "fragment"):
+        st.button("🔄 تحديث", key="refresh_audio")
+
+
 # ===== تحميل المعايير =====
 criteria_df = parse_criteria_from_excel(st.session_state._excel)
 if "criteria_df" not in st.session_state:
@@ -100,43 +209,21 @@ with tab1:
     with st.expander("📋 عرض المعايير الحالية", expanded=True):
         st.dataframe(st.session_state.criteria_df, use_container_width=True)
 
+    eval_mode = st.radio(
+        "🧮 وضع التقييم:",
+        ["truncate", "mapreduce", "retrieval"],
+        format_func=lambda m: {
+            "truncate": "⚡ سريع (بداية العرض)",
+            "mapreduce": "📚 شامل (العرض كاملًا على أجزاء)",
+            "retrieval": "🔎 بالأدلة (الصفحات ذات الصلة بكل معيار)",
+        }[m],
+        horizontal=True,
+    )
+
     # 🔮 اقتراح معايير جديدة
     if st.button("🤖 اقتراح معايير جديدة من العروض"):
-        st.info("🤖 جاري تحليل العروض واقتراح معايير جديدة...")
-        offers_texts = []
-        for f in st.session_state._offers:
-            data = extract_text_with_pages(f)
-            if isinstance(data, dict):
-                if data.get("type") == "pdf":
-                    offers_texts.append("\n".join([p["text"] for p in data.get("pages", [])]))
-                elif data.get("type") == "docx":
-                    offers_texts.append(data.get("text", ""))
-        suggested_all = suggest_criteria_from_offers(offers_texts, criteria_list) or []
-        suggested_all = suggested_all[:5]
-        synonyms = {s: [s, s.replace(" ", "_"), s.lower()] for s in suggested_all}
-        results = []
-        for s, syns in synonyms.items():
-            count, pages_found = 0, []
-            for f in st.session_state._offers:
-                data = extract_text_with_pages(f)
-                if isinstance(data, dict) and "pages" in data:
-                    for p in data["pages"]:
-                        text = p["text"]
-                        for term in syns:
-                            if re.search(rf"\b{re.escape(term)}\b", text, re.IGNORECASE):
-                                count += 1
-                                pages_found.append(p["page_num"])
-            pages_str = ", ".join(map(str, sorted(set(pages_found)))) or "-"
-            weight = min(5, 1 + count // 3)
-            results.append({
-                "criterion": s,
-                "synonyms": ", ".join(syns),
-                "count": count,
-                "pages": pages_str,
-                "weight": weight
-            })
-        st.session_state.suggested_criteria_df = pd.DataFrame(results)
-        st.success("✅ تم توليد معايير جديدة بنجاح!")
+        _submit_job("suggest", {"criteria": criteria_list})
+    _job_panel("suggest", "🤖 اقتراح المعايير", _apply_suggestions)
 
     # عرض المقترحات وإضافتها
     if "suggested_criteria_df" in st.session_state and not st.session_state.suggested_criteria_df.empty:
@@ -148,153 +235,92 @@ with tab1:
             st.session_state.criteria_df = pd.concat(
                 [st.session_state.criteria_df, to_add], ignore_index=True
             ).drop_duplicates(subset=["criterion"], keep="last")
-            ranked, details = evaluate_offers(st.session_state._offers, st.session_state.criteria_df["criterion"].tolist())
-            st.session_state.results = ranked
-            st.session_state.details = details
-            st.success("✅ تم تشغيل التقييم!")
+            _submit_job("evaluate", {"criteria": st.session_state.criteria_df["criterion"].tolist(), "mode": eval_mode})
             st.rerun()
 
     # تشغيل التقييم مباشرة
     if st.button("⚙️ تشغيل التقييم الذكي", type="primary"):
-        ranked, details = evaluate_offers(st.session_state._offers, criteria_list)
-        st.session_state.results = ranked
-        st.session_state.details = details
-        st.success("✅ تم اكتمال التقييم!")
-        st.rerun()
+        _submit_job("evaluate", {"criteria": criteria_list, "mode": eval_mode})
+    _job_panel("evaluate", "⚙️ التقييم", _apply_evaluation)
 
     # عرض النتائج والتفسير
-    if "results" in st.session_state:
-        ranked = st.session_state.results.copy()
-        details = st.session_state.details
+    if "matrix" in st.session_state:
+        matrix = st.session_state.matrix
+
+        # ⚖️ الأوزان والتطبيع: إعادة الترتيب عملية مصفوفية فورية دون أي استدعاء للنموذج
+        with st.expander("⚖️ أوزان المعايير وطريقة التطبيع", expanded=False):
+            weights_df = st.data_editor(
+                pd.DataFrame({"criterion": matrix.criteria, "weight": matrix.weights}),
+                column_config={
+                    "criterion": st.column_config.TextColumn("المعيار", disabled=True),
+                    "weight": st.column_config.NumberColumn("الوزن", min_value=0.0, max_value=10.0, step=0.5),
+                },
+                hide_index=True,
+                use_container_width=True,
+                key=f"weights_{st.session_state.eval_id}",
+            )
+            norm_method = st.selectbox("📏 التطبيع:", list(NORMALIZATIONS), format_func=NORMALIZATIONS.get)
+        matrix = matrix.with_weights(weights_df["weight"].tolist())
+        ranked = matrix.ranking(norm_method)
+        details = matrix.details(norm_method)
+
         ranked["النسبة %"] = (ranked["overall"] * 100).round(1)
-        st.dataframe(ranked[["file", "النسبة %"]], use_container_width=True)
+        st.dataframe(ranked[["rank", "file", "النسبة %"]], use_container_width=True, hide_index=True)
         best = ranked.iloc[0]
         st.markdown(f"✅ **أفضل عرض:** {best['file']} بنسبة {best['النسبة %']}%")
 
-        # 🔍 تفسير الذكاء الصناعي
+        # 🎯 التعادل وثبات الترتيب عند تغيّر الأوزان
+        with st.expander("🎯 التعادل وحساسية الترتيب للأوزان", expanded=False):
+            sens = matrix.sensitivity(method=norm_method)
+            st.dataframe(pd.DataFrame({
+                "file": list(sens["top_share"]),
+                "البقاء في المركز الأول %": [round(v * 100, 1) for v in sens["top_share"].values()],
+                "متوسط تغيّر الترتيب": list(sens["mean_rank_shift"].values()),
+            }), use_container_width=True, hide_index=True)
+            if sens["flips"]:
+                for flip in sens["flips"]:
+                    st.warning(f"⚠️ {flip['change']} وزن «{flip['criterion']}» يجعل {flip['new_best']} هو الأفضل.")
+            else:
+                st.success("✅ العرض الأفضل ثابت عند إلغاء أو مضاعفة وزن أي معيار.")
+            for criterion, tied in matrix.ties().items():
+                st.caption(f"🤝 تعادل على أعلى درجة في «{criterion}»: {'، '.join(tied)}")
+
+        # 🔍 تفسير الذكاء الصناعي (يُولَّد مرة واحدة لكل ترتيب ويُعرض متدفقًا)
         explanation = ""
+        explain_box = "<div style='background:#f5f0ff;border-right:5px solid #5A33A4;padding:15px;border-radius:10px;text-align:justify;margin-bottom:25px;'>{}</div>"
+        ranking_text = ranked[["file", "النسبة %", "comment"]].to_string(index=False)
+        # التفسير مرتبط بترتيب العروض لا بالأرقام: تعديل الأوزان دون تغيير الترتيب لا يستدعي النموذج
+        explain_key = (st.session_state.eval_id, tuple(ranked["file"]))
+        explanations = st.session_state.setdefault("explanations", {})
         try:
-            from groq import Groq
-            client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-            prompt = f"بناءً على النتائج التالية:\n{ranked.to_string(index=False)}\nاشرح بالعربية المختصرة لماذا العرض {best['file']} هو الأفضل."
-            resp = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0.4,
-            )
-            explanation = resp.choices[0].message.content.strip()
             st.markdown("### 🧾 سبب اختيار العرض الأفضل")
-            st.markdown(
-                f"<div style='background:#f5f0ff;border-right:5px solid #5A33A4;padding:15px;border-radius:10px;text-align:justify;margin-bottom:25px;'>{explanation}</div>",
-                unsafe_allow_html=True
-            )
+            explain_slot = st.empty()
+            if explain_key in explanations:
+                explanation = explanations[explain_key]
+            else:
+                prompt = f"بناءً على النتائج التالية:\n{ranking_text}\nاشرح بالعربية المختصرة لماذا العرض {best['file']} هو الأفضل."
+                for delta in stream_chat_completion(
+                    [{"role": "user", "content": prompt}],
+                    model="llama-3.3-70b-versatile",
+                    temperature=0.4,
+                    priority=PRIORITY_INTERACTIVE,
+                ):
+                    explanation += delta
+                    explain_slot.markdown(explain_box.format(explanation + " ▌"), unsafe_allow_html=True)
+                explanation = explanation.strip()
+                explanations[explain_key] = explanation
+            explain_slot.markdown(explain_box.format(explanation), unsafe_allow_html=True)
         except Exception as e:
             st.warning(f"⚠️ لم يتمكن النظام من توليد التفسير: {e}")
 
-        # 📊 زر تنزيل التقرير الكامل (Excel)
-        if st.button("📊 تنزيل التقرير الكامل (Excel)"):
-            PURPLE_DARK = "4B2E83"
-            PURPLE_LIGHT = "8B5CF6"
-            ROW_ALT = "F5F0FF"
-            WHITE = "FFFFFF"
-
-            wb = Workbook()
-            ws_rank = wb.active
-            ws_rank.title = "🏆 الترتيب النهائي"
-
-            # عنوان
-            ws_rank.merge_cells("A1:C1")
-            ws_rank["A1"] = "📊 الترتيب النهائي للعروض"
-            ws_rank["A1"].font = Font(bold=True, size=16, color=WHITE)
-            ws_rank["A1"].alignment = Alignment(horizontal="center", vertical="center")
-            ws_rank["A1"].fill = PatternFill(start_color=PURPLE_DARK, end_color=PURPLE_DARK, fill_type="solid")
-
-            ws_rank.append(["اسم العرض", "النسبة %", "الدرجة الإجمالية"])
-            for cell in ws_rank[2]:
-                cell.font = Font(bold=True, color=WHITE)
-                cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-                cell.fill = PatternFill(start_color=PURPLE_LIGHT, end_color=PURPLE_LIGHT, fill_type="solid")
-
-            for i, (_, row) in enumerate(ranked.iterrows(), start=0):
-                percent = round(row["overall"] * 100, 1)
-                ws_rank.append([row["file"], percent, round(row["overall"], 3)])
-                if i % 2 == 0:
-                    for c in ws_rank[ws_rank.max_row]:
-                        c.fill = PatternFill(start_color=ROW_ALT, end_color=ROW_ALT, fill_type="solid")
-                for c in ws_rank[ws_rank.max_row]:
-                    c.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-                    c.font = Font(size=13)
-
-            for col_idx in range(1, ws_rank.max_column + 1):
-                ws_rank.column_dimensions[get_column_letter(col_idx)].width = 35
-
-            # 🧾 تفاصيل العروض
-            for fname, df in details.items():
-                ws = wb.create_sheet(title=fname[:28])
-                ws.merge_cells("A1:E1")
-                ws["A1"] = f"📋 تفاصيل العرض: {fname}"
-                ws["A1"].font = Font(bold=True, size=15, color=WHITE)
-                ws["A1"].alignment = Alignment(horizontal="center", vertical="center")
-                ws["A1"].fill = PatternFill(start_color=PURPLE_DARK, end_color=PURPLE_DARK, fill_type="solid")
-
-                ws.append(["المعيار", "الدرجة", "تحويل (0..1)", "السبب", "سؤال الذكاء الصناعي"])
-                for cell in ws[2]:
-                    cell.font = Font(bold=True, color=WHITE)
-                    cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-                    cell.fill = PatternFill(start_color=PURPLE_LIGHT, end_color=PURPLE_LIGHT, fill_type="solid")
-
-                df2 = df.copy()
-                # ✅ إصلاح الأعمدة المفقودة
-                if "reason" not in df2.columns:
-                    df2["reason"] = ""
-                if "ai_question" not in df2.columns:
-                    df2["ai_question"] = ""
-                if "score" not in df2.columns:
-                    df2["score"] = 0
-
-                df2["reason"] = df2["reason"].astype(str)
-                df2["ai_question"] = df2["ai_question"].astype(str)
-                df2["score"] = df2["score"].astype(float)
-                df2["تحويل (0..1)"] = ((df2["score"] - 1) / 3).round(3)
-
-                for i, r in enumerate(df2.itertuples(), start=0):
-                    ws.append([
-                        r.criterion,
-                        r.score,
-                        r._asdict().get("تحويل (0..1)", ""),
-                        r.reason,
-                        r.ai_question
-                    ])
-                    if i % 2 == 0:
-                        for c in ws[ws.max_row]:
-                            c.fill = PatternFill(start_color=ROW_ALT, end_color=ROW_ALT, fill_type="solid")
-                    for c in ws[ws.max_row]:
-                        c.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-                        c.font = Font(size=13)
-
-                for col_idx in range(1, ws.max_column + 1):
-                    ws.column_dimensions[get_column_letter(col_idx)].width = 45
-
-            if explanation:
-                ws_exp = wb.create_sheet("🧠 سبب الاختيار")
-                ws_exp["A1"] = "🧠 سبب اختيار العرض الأفضل"
-                ws_exp["A1"].font = Font(bold=True, size=15, color=WHITE)
-                ws_exp["A1"].alignment = Alignment(horizontal="center", vertical="center")
-                ws_exp["A1"].fill = PatternFill(start_color=PURPLE_DARK, end_color=PURPLE_DARK, fill_type="solid")
-                ws_exp["A2"] = explanation
-                ws_exp["A2"].alignment = Alignment(wrap_text=True, vertical="top")
-                ws_exp.column_dimensions["A"].width = 100
-
-            buffer = io.BytesIO()
-            wb.save(buffer)
-            buffer.seek(0)
-            st.download_button(
-                "⬇️ تحميل التقرير الكامل (Excel)",
-                data=buffer,
-                file_name=f"SmartTender_Report_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
-                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                use_container_width=True
-            )
+        # 📊 زر تنزيل التقرير الكامل (Excel) — يُبنى مرة واحدة لكل نتيجة تقييم
+        st.download_button(
+            "⬇️ تحميل التقرير الكامل (Excel)",
+            data=get_excel_report(ranked, details, explanation, norm_method),
+            file_name=f"SmartTender_Report_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
+            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+            use_container_width=True
+        )
 
     st.markdown("</div>", unsafe_allow_html=True)
 
@@ -309,18 +335,8 @@ with tab2:
 
     # خطوة 1: تحليل العروض تلقائيًا
     if st.button("🔍 تحليل العروض تلقائيًا"):
-        st.info("🤖 جاري قراءة العروض واستخراج الأقسام...")
-        topics_data = {}
-        for offer in st.session_state._offers:
-            try:
-                st.markdown(f"📂 **جارٍ تحليل العرض:** {offer.name}")
-                data = extract_text_with_pages(offer)
-                sections = analyze_sections_with_pages(data)
-                topics_data[offer.name] = sections
-                st.success(f"✅ تم تحليل {offer.name} بنجاح ({len(sections)} قسم).")
-            except Exception as e:
-                st.error(f"⚠️ خطأ أثناء تحليل {offer.name}: {e}")
-        st.session_state.topics = topics_data
+        _submit_job("sections")
+    _job_panel("sections", "🔍 تحليل الأقسام", _apply_sections)
 
     # خطوة 2: عرض النتائج
     if "topics" in st.session_state and st.session_state.topics:
@@ -348,7 +364,7 @@ with tab2:
                     # تلخيص تفصيلي LLM
                     if st.button("🪄 توليد ملخص تفصيلي للقسم", key=f"summ_{selected_offer}_{selected_section}"):
                         try:
-                            summary = summarize_paragraphs_llm(sec["content"][:18000])
+                            summary = summarize_paragraphs_llm(sec["content"])
                             st.success("✅ تم توليد الملخص بنجاح!")
                             st.markdown("### ✨ الملخص الذكي")
                             st.markdown(
@@ -380,56 +396,84 @@ with tab3:
         st.info("📋 يرجى اختيار عرض أولًا لبدء المحادثة.")
         st.stop()
 
-    # بناء سياق النص (مع أرقام الصفحات)
+    # بناء سياق النص (صفحات العرض + فهرس البحث يُبنى مرة واحدة لكل عرض)
     if "chat_ctx" not in st.session_state or st.session_state.get("ctx_name") != selected_offer:
         for f in st.session_state._offers:
             if f.name == selected_offer:
                 try:
-                    data = extract_text_with_pages(f)
-                    if isinstance(data, dict):
-                        ctx_text = "\n".join([f"[صفحة {p['page_num']}]\n{p['text']}" for p in data.get("pages", [])])
-                        st.session_state.chat_ctx = {selected_offer: ctx_text}
-                        st.session_state.ctx_name = selected_offer
-                        f.seek(0)
+                    # نفس المستند الذي قرأه التقييم والتحليل (لا قراءة ولا استخراج جديد)
+                    st.session_state.chat_ctx = {selected_offer: open_document(f).page_dicts()}
+                    st.session_state.ctx_name = selected_offer
                 except Exception as e:
                     st.error(f"⚠️ لم يتمكن من قراءة {selected_offer}: {e}")
                     st.stop()
         st.session_state.chat_msgs = []
+        st.session_state.chat_audio = None
         st.session_state.chatbot = TenderChat(st.session_state.chat_ctx)
 
     # عرض سجل المحادثة
-    chat_html = "<div style='display:flex;flex-direction:column;gap:6px;margin-bottom:10px;'>"
+    USER_BUBBLE = "<div style='background:#E5E7EB;color:#111827;padding:10px 14px;border-radius:16px;align-self:flex-end;max-width:80%;'>{}</div>"
+    BOT_BUBBLE = "<div style='background:#5A33A4;color:white;padding:10px 14px;border-radius:16px;align-self:flex-start;max-width:80%;'>{}</div>"
+    CHAT_WRAP = "<div style='display:flex;flex-direction:column;gap:6px;margin-bottom:10px;'>{}</div>"
+    chat_html = ""
     for role, msg in st.session_state.chat_msgs:
-        if role == "user":
-            chat_html += f"<div style='background:#E5E7EB;color:#111827;padding:10px 14px;border-radius:16px;align-self:flex-end;max-width:80%;'>{msg}</div>"
-        else:
-            chat_html += f"<div style='background:#5A33A4;color:white;padding:10px 14px;border-radius:16px;align-self:flex-start;max-width:80%;'>{msg}</div>"
-    chat_html += "</div>"
-    st.markdown(chat_html, unsafe_allow_html=True)
+        chat_html += (USER_BUBBLE if role == "user" else BOT_BUBBLE).format(msg)
+    st.markdown(CHAT_WRAP.format(chat_html), unsafe_allow_html=True)
+
+    # 🔊 صوت آخر رد (يُركَّب في الخلفية ويُحفظ؛ لا ملفات مؤقتة)
+    audio = st.session_state.get("chat_audio")
+    if audio is not None and audio.done():
+        try:
+            data, mime = audio.result()
+            if data:
+                st.audio(data, format=mime, start_time=0)
+        except Exception as e:
+            st.warning(f"⚠️ لم يتمكن من توليد الصوت: {e}")
+    elif audio is not None:
+        _audio_wait()
 
     # إدخال المستخدم والرد
     st.markdown("<div style='height:100px'></div>", unsafe_allow_html=True)
     user_input = st.chat_input(f"💭 اكتب سؤالك عن {selected_offer}...")
     if user_input:
         st.session_state.chat_msgs.append(("user", user_input))
-        with st.spinner("🤖 المساعد يكتب الآن..."):
-            answer = st.session_state.chatbot.answer(
+        # بث الرد داخل فقاعة المساعد جزءًا بجزء
+        live_slot = st.empty()
+        live_slot.markdown(CHAT_WRAP.format(USER_BUBBLE.format(user_input) + BOT_BUBBLE.format("🤖 المساعد يكتب الآن...")), unsafe_allow_html=True)
+        raw = ""
+        try:
+            for delta in st.session_state.chatbot.answer_stream(
                 f"العرض الحالي هو: {selected_offer}\n\nالسؤال: {user_input}"
-            )
-        # محاولة التقاط رقم الصفحة
+            ):
+                raw += delta
+                live_slot.markdown(CHAT_WRAP.format(USER_BUBBLE.format(user_input) + BOT_BUBBLE.format(raw + " ▌")), unsafe_allow_html=True)
+            answer = TenderChat.format_answer(raw)
+        except Exception as e:
+            answer = f"⚠️ حدث خطأ أثناء تحليل السؤال: {e}"
+        # محاولة التقاط رقم الصفحة (على الرد الكامل بعد انتهاء البث)
         _re = re
         m = _re.search(r"صفحة\s+(\d+)", answer)
         if m:
             answer += f"<br><br>📄 <i>المعلومة وردت في الصفحة رقم {m.group(1)}.</i>"
         answer += f"<br><br>🗂️ <i>الإجابة مستندة إلى عرض:</i> <b>{selected_offer}</b>"
         st.session_state.chat_msgs.append(("assistant", answer))
-        # صوت عربي
-        try:
-            tts = gTTS(text=answer, lang='ar')
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
-                tts.save(tmp.name)
-                st.audio(tmp.name, format="audio/mp3", start_time=0)
-        except Exception as e:
-            st.warning(f"⚠️ لم يتمكن من توليد الصوت: {e}")
+        # صوت عربي في الخلفية: الرد النصي يظهر فورًا والمشغّل عند جاهزية الصوت
+        st.session_state.chat_audio = speak_async(answer)
         st.rerun()
     st.markdown("</div>", unsafe_allow_html=True)
+
+# ===== ⏱️ لوحة الأداء =====
+with st.expander("⏱️ الأداء (زمن كل مرحلة في هذه الجلسة)", expanded=False):
+    perf = st.session_state.trace.summary()
+    if perf:
+        st.dataframe(pd.DataFrame(perf), use_container_width=True, hide_index=True)
+        usage = usage_stats()
+        st.caption(
+            f"🧮 استدعاءات النموذج (كل الجلسات): {usage['calls']} — من الذاكرة {usage['cached']} — "
+            f"رموز المطالبات {usage['prompt_tokens']:,} / الردود {usage['completion_tokens']:,}"
+        )
+        if st.button("🧹 مسح القياسات"):
+            st.session_state.trace.clear()
+            st.rerun()
+    else:
+        st.caption("لا توجد قياسات بعد.")
@@ -0,0 +1,166 @@
+# bench/corpus.py — توليد مناقصة اصطناعية (عربي/إنجليزي) لقياس الأداء
+import os
+import random
+import argparse
+
+CRITERIA = [
+    "جودة الحل المقترح", "المنهجية الفنية", "الخبرة السابقة", "خطة التنفيذ",
+    "فريق العمل", "الابتكار في الحل", "إدارة المشروع", "الامتثال للمتطلبات",
+]
+
+SECTIONS = {
+    "المقدمة": "Introduction",
+    "الأهداف": "Objectives",
+    "المنهجية": "Methodology",
+    "خطة التنفيذ": "Implementation Plan",
+    "فريق العمل": "Project Team",
+    "إدارة المخاطر": "Risk Management",
+    "الخاتمة": "Conclusion",
+}
+
+AR_SENTENCES = [
+    "يقدم العرض حلاً متكاملاً يلبي متطلبات المناقصة الفنية والتشغيلية.",
+    "تعتمد المنهجية على مراحل واضحة تبدأ بالتحليل وتنتهي بالتسليم والتدريب.",
+    "يمتلك فريق العمل خبرة سابقة في تنفيذ مشاريع مماثلة لدى جهات حكومية.",
+    "تتضمن خطة التنفيذ جدولاً زمنياً مفصلاً ومؤشرات أداء لكل مرحلة.",
+    "سيتم تطبيق إجراءات ضمان الجودة ومراجعة المخرجات بشكل دوري.",
+    "تشمل إدارة المشروع تقارير أسبوعية واجتماعات متابعة مع الجهة المالكة.",
+    "يلتزم المورد بالامتثال الكامل للمتطلبات والمعايير الوطنية المعتمدة.",
+    "يتميز الحل بالابتكار في استخدام التقنيات السحابية والتحليلات المتقدمة.",
+]
+
+EN_SENTENCES = [
+    "The proposed solution covers all functional and non-functional requirements.",
+    "Our methodology follows an agile delivery model with two-week sprints.",
+    "The team includes certified project managers and senior solution architects.",
+    "Risk management is handled through a weekly risk register review.",
+    "All deliverables are subject to quality assurance and acceptance testing.",
+    "The implementation plan spans six months with clear milestones.",
+]
+
+
+# ============================================================
+# ✍️ نص العرض
+# ============================================================
+def offer_pages(rng: random.Random, n_pages: int, english_ratio: float = 0.3) -> list:
+    """قائمة نصوص صفحات: عنوان قسم في بداية كل مجموعة صفحات ثم فقرات عربية/إنجليزية"""
+    names = list(SECTIONS)
+    per_section = max(1, n_pages // len(names))
+    pages = []
+    for i in range(n_pages):
+        lines = []
+        if i % per_section == 0:
+            ar = names[min(i // per_section, len(names) - 1)]
+            lines.append(f"{ar} / {SECTIONS[ar]}")
+        for _ in range(rng.randint(4, 7)):
+            pool = EN_SENTENCES if rng.random() < english_ratio else AR_SENTENCES
+            lines.append(" ".join(rng.choice(pool) for _ in range(rng.randint(2, 4))))
+        pages.append("\n\n".join(lines))
+    return pages
+
+
+# ============================================================
+# 📄 كتابة الملفات (PDF نصي، PDF ممسوح ضوئيًا، DOCX، معايير Excel)
+# ============================================================
+def _text_page(doc, text: str):
+    page = doc.new_page(width=595, height=842)
+    rect = page.rect + (40, 40, -40, -40)
+    if hasattr(page, "insert_htmlbox"):  # تشكيل العربية واتجاه RTL
+        html = "".join(f"<p dir='auto'>{para}</p>" for para in text.split("\n\n"))
+        page.insert_htmlbox(rect, html, css="* {font-size: 10px;}")
+    else:
+        page.insert_textbox(rect, text, fontsize=10)
+    return page
+
+
+def write_text_pdf(path: str, pages: list):
+    import fitz
+    doc = fitz.open()
+    for text in pages:
+        _text_page(doc, text)
+    doc.save(path)
+    doc.close()
+
+
+def write_scanned_pdf(path: str, pages: list, dpi: int = 150):
+    """كل صفحة تُرسم كصورة فقط (بدون طبقة نص) لتمر عبر مسار OCR"""
+    import fitz
+    src = fitz.open()
+    for text in pages:
+        _text_page(src, text)
+    out = fitz.open()
+    for page in src:
+        pix = page.get_pixmap(dpi=dpi)
+        img_page = out.new_page(width=page.rect.width, height=page.rect.height)
+        img_page.insert_image(img_page.rect, pixmap=pix)
+    out.save(path)
+    out.close()
+    src.close()
+
+
+def write_docx(path: str, pages: list):
+    from docx import Document
+    doc = Document()
+    for text in pages:
+        for para in text.split("\n\n"):
+            doc.add_paragraph(para)
+    doc.save(path)
+
+
+def write_criteria(path: str, criteria: list = None):
+    from openpyxl import Workbook
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "Evaluation"
+    ws.append(["criterion"])
+    for c in criteria or CRITERIA:
+        ws.append([c])
+    wb.save(path)
+
+
+def generate(out_dir: str, offers: int = 4, pages: int = 20, scanned: int = 1,
+             docx: int = 1, seed: int = 0) -> dict:
+    """
+    يكتب مناقصة كاملة في out_dir:
+    criteria.xlsx + offers/ (PDF نصية، ثم scanned ملفات ممسوحة، ثم docx ملفات وورد)
+    يعيد {"criteria": مسار، "offers_dir": مسار، "text_pdfs": [...], "scanned_pdfs": [...], "docx": [...]}.
+    """
+    rng = random.Random(seed)
+    offers_dir = os.path.join(out_dir, "offers")
+    os.makedirs(offers_dir, exist_ok=True)
+    out = {"criteria": os.path.join(out_dir, "criteria.xlsx"), "offers_dir": offers_dir,
+           "text_pdfs": [], "scanned_pdfs": [], "docx": []}
+    write_criteria(out["criteria"])
+
+    for i in range(offers):
+        path = os.path.join(offers_dir, f"offer_{i + 1:02d}.pdf")
+        write_text_pdf(path, offer_pages(rng, pages))
+        out["text_pdfs"].append(path)
+    for i in range(scanned):
+        # الصفحات الممسوحة أقل عددًا لأن OCR هو الأبطأ
+        path = os.path.join(offers_dir, f"scanned_{i + 1:02d}.pdf")
+        write_scanned_pdf(path, offer_pages(rng, max(2, pages // 4), english_ratio=0.5))
+        out["scanned_pdfs"].append(path)
+    for i in range(docx):
+        path = os.path.join(offers_dir, f"offer_docx_{i + 1:02d}.docx")
+        write_docx(path, offer_pages(rng, pages))
+        out["docx"].append(path)
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="توليد مناقصة اصطناعية لقياس الأداء.")
+    parser.add_argument("--out", default="bench/corpus")
+    parser.add_argument("--offers", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--scanned", type=int, default=1)
+    parser.add_argument("--docx", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    written = generate(args.out, args.offers, args.pages, args.scanned, args.docx, args.seed)
+    print(f"criteria: {written['criteria']}\noffers: {written['offers_dir']}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,238 @@
+# bench/fake_groq.py — خادم محلي بديل لواجهة Groq (chat/completions) لقياس الأداء دون مفتاح
+import re
+import json
+import time
+import random
+import argparse
+import threading
+import itertools
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+COMPLETIONS_PATH = "/openai/v1/chat/completions"
+
+
+# ============================================================
+# 🧾 ردود جاهزة حسب نوع المطالبة (بنفس الأشكال التي تتوقعها الوحدات)
+# ============================================================
+def _criteria_from_prompt(prompt: str) -> list:
+    """أسطر "- معيار" بعد عنوان المعايير حتى أول سطر فارغ"""
+    m = re.search(r"المعايير:\s*\n((?:-[^\n]*\n?)+)", prompt)
+    if not m:
+        return []
+    return [line[1:].strip() for line in m.group(1).splitlines() if line.startswith("-")]
+
+
+def _pages_from_prompt(prompt: str) -> list:
+    return sorted({int(n) for n in re.findall(r"\[\[PAGE:(\d+)\]\]", prompt)}) or [1]
+
+
+def canned_reply(prompt: str, rng: random.Random) -> str:
+    """يختار ردًا مناسبًا من محتوى المطالبة (تقييم، أدلة، أقسام، اقتراح معايير، تلخيص، محادثة)"""
+    if '"evidence"' in prompt:
+        pages = _pages_from_prompt(prompt)
+        return json.dumps({"evidence": [
+            {"criterion": c, "strength": rng.randint(1, 4), "pages": rng.sample(pages, min(2, len(pages))),
+             "evidence": f"دليل تجريبي على {c}"}
+            for c in _criteria_from_prompt(prompt)
+        ]}, ensure_ascii=False)
+    if '"scores"' in prompt:
+        return json.dumps({"scores": [
+            {"criterion": c, "score": rng.randint(1, 4), "ai_question": f"هل يغطي العرض {c}؟",
+             "reason": "تقييم تجريبي من الخادم المحلي", "pages": [1]}
+            for c in _criteria_from_prompt(prompt)
+        ], "overall_comment": "عرض تجريبي"}, ensure_ascii=False)
+    if "[[SECTION:" in prompt:
+        idx = [int(n) for n in re.findall(r"\[\[SECTION:(\d+)\]\]", prompt)]
+        names = ["المقدمة", "الأهداف", "المنهجية", "خطة التنفيذ", "الفريق", "الخاتمة"]
+        return json.dumps([
+            {"i": i, "section": names[(i - 1) % len(names)], "summary": f"ملخص القسم {i}"}
+            for i in idx
+        ], ensure_ascii=False)
+    if '"section"' in prompt:
+        names = ["المقدمة", "الأهداف", "المنهجية", "خطة التنفيذ", "الفريق", "الخاتمة"]
+        pages = _pages_from_prompt(prompt)
+        step = max(1, len(pages) // len(names))
+        return json.dumps([
+            {"section": name, "start_page": pages[min(i * step, len(pages) - 1)],
+             "summary": f"ملخص {name}", "content": f"نص قسم {name} التجريبي."}
+            for i, name in enumerate(names)
+        ], ensure_ascii=False)
+    if '"paragraph"' in prompt:
+        return json.dumps([
+            {"paragraph": "فقرة تجريبية.", "summary_ar": "ملخص الفقرة التجريبية."}
+        ], ensure_ascii=False)
+    if "اقترح حتى 10 معايير" in prompt:
+        return json.dumps(["إدارة المخاطر", "ضمان الجودة", "الاستدامة", "نقل المعرفة"], ensure_ascii=False)
+    return "بحسب العرض [صفحة 1] فإن المنهجية المقترحة واضحة، وخطة التنفيذ مذكورة في [صفحة 2]."
+
+
+# ============================================================
+# 🌐 الخادم
+# ============================================================
+class FakeGroqServer:
+    """
+    خادم HTTP محلي يحاكي POST /openai/v1/chat/completions (عادي ومتدفق SSE):
+    - latency/jitter: زمن الرد بالثواني (متوسط ± تشويش)
+    - error_rate: نسبة ردود 500، rate_limit_rate: نسبة ردود 429 مع Retry-After
+    - replies: قائمة [{"match": "نص", "content": "..."}] تسبق الردود الجاهزة المدمجة
+    يُستخدم بضبط GROQ_BASE_URL=server.url قبل إنشاء عميل Groq.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.05, jitter=0.02,
+                 error_rate=0.0, rate_limit_rate=0.0, replies=None, seed=0, stream_chunks=8):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.replies = replies or []
+        self.stream_chunks = stream_chunks
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._ids = itertools.count(1)
+        self.stats = {"requests": 0, "errors": 0, "rate_limited": 0}
+        self._httpd = ThreadingHTTPServer((host, port), self._handler())
+        self._httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------------- منطق الرد ----------------
+    def _roll(self):
+        with self._rng_lock:
+            return self._rng.random(), max(0.0, self._rng.gauss(self.latency, self.jitter))
+
+    def _content(self, prompt: str) -> str:
+        for r in self.replies:
+            if r.get("match", "") in prompt:
+                return r["content"] if isinstance(r["content"], str) else json.dumps(r["content"], ensure_ascii=False)
+        with self._rng_lock:
+            return canned_reply(prompt, self._rng)
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _json(self, status, body, headers=None):
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for k, v in (headers or {}).items():
+                    self.send_header(k, v)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if self.path.rstrip("/") != COMPLETIONS_PATH:
+                    return self._json(404, {"error": {"message": f"unknown path {self.path}"}})
+
+                server.stats["requests"] += 1
+                roll, delay = server._roll()
+                time.sleep(delay)
+                if roll < server.rate_limit_rate:
+                    server.stats["rate_limited"] += 1
+                    return self._json(429, {"error": {"message": "rate limit", "type": "tokens"}},
+                                      {"retry-after": "0.2"})
+                if roll < server.rate_limit_rate + server.error_rate:
+                    server.stats["errors"] += 1
+                    return self._json(500, {"error": {"message": "internal error"}})
+
+                messages = body.get("messages", [])
+                prompt = "\n".join(str(m.get("content", "")) for m in messages)
+                content = server._content(prompt)
+                usage = {
+                    "prompt_tokens": len(prompt) // 3 + 1,
+                    "completion_tokens": len(content) // 3 + 1,
+                }
+                usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+                cid = f"chatcmpl-fake-{next(server._ids)}"
+                model = body.get("model", "fake")
+
+                if body.get("stream"):
+                    return self._stream(cid, model, content, usage, delay)
+                self._json(200, {
+                    "id": cid, "object": "chat.completion", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                                 "finish_reason": "stop", "logprobs": None}],
+                    "usage": usage,
+                })
+
+            def _stream(self, cid, model, content, usage, delay):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Cache-Control", "no-cache")
+                self.send_header("Connection", "close")
+                self.end_headers()
+                n = max(1, server.stream_chunks)
+                size = max(1, -(-len(content) // n))
+                base = {"id": cid, "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+                for i in range(0, len(content), size):
+                    chunk = dict(base, choices=[{"index": 0, "delta": {"content": content[i:i + size]},
+                                                 "finish_reason": None}])
+                    self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                    time.sleep(delay / n)
+                last = dict(base, choices=[{"index": 0, "delta": {}, "finish_reason": "stop"}],
+                            x_groq={"id": cid, "usage": usage})
+                self.wfile.write(f"data: {json.dumps(last, ensure_ascii=False)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="خادم Groq محلي وهمي لقياس الأداء.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.3, help="زمن الرد بالثواني")
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--replies", help="ملف JSON بقائمة ردود [{match, content}]")
+    args = parser.parse_args(argv)
+
+    replies = None
+    if args.replies:
+        with open(args.replies, encoding="utf-8") as fh:
+            replies = json.load(fh)
+    server = FakeGroqServer(args.host, args.port, args.latency, args.jitter,
+                            args.error_rate, args.rate_limit_rate, replies)
+    print(f"GROQ_BASE_URL={server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server._httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
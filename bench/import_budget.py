@@ -0,0 +1,120 @@
+# bench/import_budget.py — ميزانية زمن الاستيراد عند بدء التطبيق (صفحة الهبوط)
+#
+#   python -m bench.import_budget                 # يفشل (رمز خروج 1) عند تجاوز الميزانية
+#   python -m bench.import_budget --budget-ms 1500 --top 15
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+# ما يستورده app.py قبل st.stop() في صفحة الهبوط
+LANDING = ["streamlit", "modules.ui", "modules.tracing", "modules.progress"]
+
+# وحدات المعالجة التي تُستورد بعد رفع الملفات (يجب ألا تجرّ المكتبات الثقيلة معها)
+PIPELINE = ["modules.extractors", "modules.evaluator", "modules.analyzer", "modules.chatbot",
+            "modules.llm", "modules.report", "modules.matcher", "modules.scoring", "modules.utils",
+            "modules.ocr", "modules.translation", "modules.budget", "modules.document", "modules.jobs",
+            "modules.sections", "modules.evidence", "modules.tts"]
+
+# مكتبات تُحمَّل عند أول استخدام فعلي فقط
+HEAVY = ["groq", "fitz", "openpyxl", "gtts", "pytesseract", "PIL", "docx",
+         "langdetect", "deep_translator", "tiktoken", "sentence_transformers", "httpx", "pyttsx3"]
+
+LANDING_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_MS", "2500"))
+PIPELINE_BUDGET_MS = float(os.getenv("IMPORT_BUDGET_PIPELINE_MS", "1500"))
+
+
+# ============================================================
+# ⏱️ القياس (عملية فرعية نظيفة مع python -X importtime)
+# ============================================================
+_PROBE = """
+import sys, json
+base = set(sys.modules)
+for name in {modules!r}:
+    __import__(name)
+print(json.dumps(sorted(set(sys.modules) - base)))
+"""
+
+
+def measure(modules: list, preload: list = ()) -> dict:
+    """
+    يستورد الوحدات في مفسّر جديد ويعيد:
+    total_ms (الزمن التراكمي لوحدات المستوى الأعلى)، top (أبطأ الحزم)، loaded (كل ما حُمّل).
+    الوحدات في preload تُستورد أولًا ولا تدخل في الزمن (لقياس ما تضيفه مرحلة فوق أخرى).
+    """
+    code = "".join(f"import {m}\n" for m in preload) + "import sys\nprint('--', file=sys.stderr)\n"
+    code += _PROBE.format(modules=list(modules))
+    env = dict(os.environ)
+    env.setdefault("GROQ_API_KEY", "import-budget")
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code],
+                          capture_output=True, text=True, env=env,
+                          cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else "import failed")
+
+    # سطور importtime: "import time: self [us] | cumulative | imported package"
+    lines = proc.stderr.split("--\n", 1)[-1].splitlines()
+    total_us, per_pkg = 0, {}
+    for line in lines:
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        self_us, cum_us, name = line[len("import time:"):].split("|", 2)
+        depth = (len(name) - len(name.lstrip()) - 1) // 2  # مسافتان لكل مستوى تداخل بعد الفاصل
+        pkg = name.strip().split(".")[0]
+        per_pkg[pkg] = per_pkg.get(pkg, 0) + int(self_us)
+        if depth == 0:
+            total_us += int(cum_us)
+    loaded = json.loads(proc.stdout.strip().splitlines()[-1])
+    top = sorted(per_pkg.items(), key=lambda kv: kv[1], reverse=True)
+    return {"total_ms": round(total_us / 1000, 1),
+            "top": [(pkg, round(us / 1000, 1)) for pkg, us in top],
+            "loaded": loaded}
+
+
+def heavy_loaded(loaded: list) -> list:
+    return sorted({m.split(".")[0] for m in loaded} & set(HEAVY))
+
+
+# ============================================================
+# 🚀 التشغيل
+# ============================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="قياس زمن استيراد صفحة الهبوط ووحدات المعالجة.")
+    parser.add_argument("--budget-ms", type=float, default=LANDING_BUDGET_MS, help="ميزانية صفحة الهبوط")
+    parser.add_argument("--pipeline-budget-ms", type=float, default=PIPELINE_BUDGET_MS,
+                        help="ميزانية وحدات المعالجة فوق صفحة الهبوط")
+    parser.add_argument("--top", type=int, default=10, help="عدد الحزم الأبطأ المعروضة")
+    parser.add_argument("--json", action="store_true", help="طباعة النتيجة بصيغة JSON")
+    args = parser.parse_args(argv)
+
+    stages = [
+        ("landing", LANDING, (), args.budget_ms),
+        ("pipeline", PIPELINE, LANDING, args.pipeline_budget_ms),
+    ]
+    failures, report = [], {}
+    for name, modules, preload, budget in stages:
+        res = measure(modules, preload)
+        heavy = heavy_loaded(res["loaded"])
+        report[name] = {"total_ms": res["total_ms"], "budget_ms": budget,
+                        "heavy": heavy, "top": res["top"][:args.top]}
+        if res["total_ms"] > budget:
+            failures.append(f"{name}: {res['total_ms']}ms > {budget}ms")
+        if heavy:
+            failures.append(f"{name}: heavy packages imported eagerly: {', '.join(heavy)}")
+
+    if args.json:
+        print(json.dumps({"stages": report, "failures": failures}, ensure_ascii=False, indent=2))
+    else:
+        for name, res in report.items():
+            flag = "✅" if res["total_ms"] <= res["budget_ms"] and not res["heavy"] else "❌"
+            print(f"{flag} {name:<9} {res['total_ms']:>8.1f}ms / {res['budget_ms']:.0f}ms")
+            for pkg, ms in res["top"]:
+                print(f"     {pkg:<24} {ms:>8.1f}ms")
+        for line in failures:
+            print(f"❌ {line}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,294 @@
+# bench/run.py — قياس أداء خط المعالجة كاملًا مقابل خادم Groq محلي وهمي
+#
+#   python -m bench.run                      # كل القياسات، النتائج في bench/results/<وقت>.json
+#   python -m bench.run --only evaluation chat --compare bench/results/base.json
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import resource
+import subprocess
+
+BENCHMARKS = ["extraction", "ocr", "evaluation", "sections", "chat", "report"]
+
+CHAT_QUESTIONS = [
+    "ما هي المنهجية المقترحة في العرض؟",
+    "من هم أعضاء فريق العمل وما خبراتهم؟",
+    "ما مدة خطة التنفيذ؟",
+    "How is risk management handled?",
+    "هل يلتزم العرض بالمتطلبات الفنية؟",
+]
+
+
+# ============================================================
+# 📐 أدوات القياس
+# ============================================================
+def percentile(values: list, q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    k = (len(values) - 1) * q
+    lo, hi = int(k), min(int(k) + 1, len(values) - 1)
+    return values[lo] + (values[hi] - values[lo]) * (k - lo)
+
+
+def peak_rss_mb() -> float:
+    """أعلى ذاكرة مقيمة للعملية (وأكبر عملية فرعية، مثل عمال OCR) منذ البدء"""
+    self_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    child_kb = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024  # macOS بالبايت، Linux بالكيلوبايت
+    return round(max(self_kb, child_kb) / scale, 1)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except Exception:
+        return ""
+
+
+def measure(name: str, fn, ctx: dict) -> dict:
+    """
+    يشغّل قياسًا واحدًا: fn(ctx) تعيد أزمنة العمليات (ثوانٍ) أو dict إضافي.
+    يضيف زمن الجدار وp50/p95 للعمليات ولاستدعاءات النموذج وذروة الذاكرة.
+    """
+    from modules.llm import usage_stats, USAGE_HISTORY
+
+    started_at = time.time()
+    t0 = time.perf_counter()
+    try:
+        out = fn(ctx)
+        error = None
+    except Exception as e:  # قياس فاشل لا يوقف البقية (مثل غياب Tesseract)
+        out, error = [], f"{type(e).__name__}: {e}"
+    wall = time.perf_counter() - t0
+
+    extra = {}
+    if isinstance(out, dict):
+        extra = {k: v for k, v in out.items() if k != "latencies"}
+        out = out.get("latencies", [])
+    calls = [c for c in usage_stats(recent=USAGE_HISTORY)["recent"] if c["at"] >= started_at and not c["cached"]]
+    llm_lat = [c["seconds"] for c in calls]
+
+    result = {
+        "wall_s": round(wall, 3),
+        "ops": len(out),
+        "p50_s": round(percentile(out, 0.5), 4),
+        "p95_s": round(percentile(out, 0.95), 4),
+        "llm_calls": len(calls),
+        "llm_p50_s": round(percentile(llm_lat, 0.5), 4),
+        "llm_p95_s": round(percentile(llm_lat, 0.95), 4),
+        "prompt_tokens": sum(c["prompt_tokens"] for c in calls),
+        "completion_tokens": sum(c["completion_tokens"] for c in calls),
+        "peak_rss_mb": peak_rss_mb(),
+        **extra,
+    }
+    if error:
+        result["error"] = error
+    return result
+
+
+# ============================================================
+# 🏃 القياسات
+# ============================================================
+def _timed(fn, *args, **kwargs):
+    t0 = time.perf_counter()
+    value = fn(*args, **kwargs)
+    return time.perf_counter() - t0, value
+
+
+def bench_extraction(ctx):
+    from modules.extractors import LocalUpload, extract_text_with_pages
+    paths = ctx["corpus"]["text_pdfs"] + ctx["corpus"]["docx"]
+    cold = [_timed(extract_text_with_pages, LocalUpload(p))[0] for p in paths]
+    warm = [_timed(extract_text_with_pages, LocalUpload(p))[0] for p in paths]  # من سجل المستندات (بصمة فقط)
+    return {"latencies": cold, "warm_p50_s": round(percentile(warm, 0.5), 4)}
+
+
+def bench_ocr(ctx):
+    from modules.analyzer import extract_text_with_ocr
+    lat, pages, ocr_used = [], 0, 0
+    for path in ctx["corpus"]["scanned_pdfs"]:
+        with open(path, "rb") as fh:
+            data = fh.read()
+        t, result = _timed(extract_text_with_ocr, data, show_progress=False)
+        lat.append(t)
+        pages += len(result["pages"])
+        ocr_used += sum(1 for p in result["pages"] if p.get("ocr_used"))
+    return {"latencies": lat, "pages": pages, "ocr_pages": ocr_used}
+
+
+def bench_evaluation(ctx):
+    from modules.evaluator import evaluate_offers
+    out = {"latencies": []}
+    for mode in ("truncate", "mapreduce", "retrieval"):
+        t, (ranked, details) = _timed(evaluate_offers, ctx["offers"](), ctx["criteria"], mode=mode)
+        out["latencies"].append(t)
+        out[f"{mode}_s"] = round(t, 3)
+        ctx["evaluation"] = (ranked, details)
+    return out
+
+
+def bench_sections(ctx):
+    from modules.document import open_document
+    from modules.analyzer import iter_sections_analysis
+    payloads = {f.name: open_document(f) for f in ctx["offers"]()}
+    t0 = time.perf_counter()
+    done_at = []
+    for _name, _sections, done, total in iter_sections_analysis(payloads):
+        if done >= total:
+            done_at.append(time.perf_counter() - t0)  # زمن اكتمال كل عرض منذ البدء
+    return done_at
+
+
+def bench_chat(ctx):
+    from modules.document import open_document
+    from modules.chatbot import TenderChat
+    context = {f.name: open_document(f).page_dicts() for f in ctx["offers"]()}
+    t_index, chat = _timed(TenderChat, context)
+
+    lat = [_timed(chat.answer, q)[0] for q in CHAT_QUESTIONS]
+    first_token = []
+    for q in CHAT_QUESTIONS:
+        t0 = time.perf_counter()
+        stream = chat.answer_stream(f"{q} (بث)")  # سؤال مختلف حتى لا يُخدم من الذاكرة
+        next(stream, None)
+        first_token.append(time.perf_counter() - t0)
+        for _ in stream:
+            pass
+    return {"latencies": lat, "index_s": round(t_index, 4),
+            "first_token_p50_s": round(percentile(first_token, 0.5), 4)}
+
+
+def bench_report(ctx, repeats: int = 10):
+    from modules.report import build_excel_report
+    if "evaluation" not in ctx:
+        bench_evaluation(ctx)
+    ranked, details = ctx["evaluation"]
+    lat, size = [], 0
+    for _ in range(repeats):
+        t, data = _timed(build_excel_report, ranked, details, "شرح تجريبي لسبب الاختيار.")
+        lat.append(t)
+        size = len(data)
+    return {"latencies": lat, "bytes": size}
+
+
+RUNNERS = {
+    "extraction": bench_extraction,
+    "ocr": bench_ocr,
+    "evaluation": bench_evaluation,
+    "sections": bench_sections,
+    "chat": bench_chat,
+    "report": bench_report,
+}
+
+
+# ============================================================
+# 🔁 المقارنة مع تشغيل سابق
+# ============================================================
+def compare(current: dict, baseline_path: str) -> list:
+    with open(baseline_path, encoding="utf-8") as fh:
+        base = json.load(fh).get("benchmarks", {})
+    lines = []
+    for name, res in current["benchmarks"].items():
+        old = base.get(name)
+        if not old or not old.get("wall_s"):
+            continue
+        ratio = res["wall_s"] / old["wall_s"]
+        flag = "⚠️" if ratio > 1.10 else ("✅" if ratio < 0.90 else "  ")
+        lines.append(f"{flag} {name:<11} {old['wall_s']:>8.3f}s → {res['wall_s']:>8.3f}s  (×{ratio:.2f})")
+    return lines
+
+
+# ============================================================
+# 🚀 التشغيل
+# ============================================================
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="قياس أداء SmartTender مقابل خادم Groq محلي.")
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument("--out", help="ملف النتائج (الافتراضي bench/results/<وقت>.json)")
+    parser.add_argument("--compare", help="ملف نتائج سابق للمقارنة")
+    parser.add_argument("--offers", type=int, default=4)
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--scanned", type=int, default=1)
+    parser.add_argument("--docx", type=int, default=1)
+    parser.add_argument("--latency", type=float, default=0.05, help="زمن رد الخادم الوهمي (ثوانٍ)")
+    parser.add_argument("--jitter", type=float, default=0.02)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--llm-cache", action="store_true", help="إبقاء ذاكرة ردود النموذج مفعلة")
+    parser.add_argument("--quota", action="store_true", help="تطبيق حصة LLM_RPM/LLM_TPM الفعلية")
+    args = parser.parse_args(argv)
+
+    work = tempfile.mkdtemp(prefix="smarttender-bench-")
+    # يجب ضبط البيئة قبل استيراد الوحدات (الثوابت تُقرأ عند الاستيراد)
+    os.environ["SMARTTENDER_CACHE_DIR"] = os.path.join(work, "cache")
+    os.environ.setdefault("GROQ_API_KEY", "bench-fake-key")
+    if not args.llm_cache:
+        os.environ["LLM_CACHE"] = "0"
+    if not args.quota:
+        os.environ["LLM_RPM"] = "100000"
+        os.environ["LLM_TPM"] = "100000000"
+
+    from bench.fake_groq import FakeGroqServer
+    from bench.corpus import generate, CRITERIA
+
+    server = FakeGroqServer(latency=args.latency, jitter=args.jitter,
+                            error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate).start()
+    os.environ["GROQ_BASE_URL"] = server.url
+    try:
+        corpus = generate(os.path.join(work, "corpus"), args.offers, args.pages, args.scanned, args.docx)
+
+        from modules.extractors import LocalUpload
+        ctx = {
+            "corpus": corpus,
+            "criteria": list(CRITERIA),
+            "offers": lambda: [LocalUpload(p) for p in corpus["text_pdfs"] + corpus["docx"]],
+        }
+
+        results = {
+            "meta": {
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "commit": _git_commit(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "corpus": {"offers": args.offers, "pages": args.pages, "scanned": args.scanned, "docx": args.docx},
+                "server": {"latency": args.latency, "jitter": args.jitter,
+                           "error_rate": args.error_rate, "rate_limit_rate": args.rate_limit_rate},
+                "llm_cache": args.llm_cache,
+                "quota": args.quota,
+            },
+            "benchmarks": {},
+        }
+        for name in BENCHMARKS:
+            if name in args.only:
+                res = measure(name, RUNNERS[name], ctx)
+                results["benchmarks"][name] = res
+                status = f"  ❌ {res['error']}" if "error" in res else ""
+                print(f"{name:<11} {res['wall_s']:>8.3f}s  p50={res['p50_s']:.3f}s  p95={res['p95_s']:.3f}s  "
+                      f"llm={res['llm_calls']}  rss={res['peak_rss_mb']}MB{status}")
+        results["meta"]["server_stats"] = dict(server.stats)
+    finally:
+        server.stop()
+        shutil.rmtree(work, ignore_errors=True)
+
+    out = args.out or os.path.join("bench", "results", time.strftime("%Y%m%d-%H%M%S") + ".json")
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", encoding="utf-8") as fh:
+        json.dump(results, fh, ensure_ascii=False, indent=2)
+    print(f"results: {out}")
+
+    if args.compare:
+        for line in compare(results, args.compare):
+            print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
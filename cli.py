@@ -0,0 +1,36 @@
+# cli.py — تشغيل دفعي لتقييم مناقصة كاملة دون Streamlit
+import argparse
+import logging
+
+from modules.batch import run_batch
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="تقييم جميع عروض مناقصة (PDF/DOCX) وفق ملف معايير Excel دون واجهة."
+    )
+    parser.add_argument("--criteria", required=True, help="ملف Excel للمعايير")
+    parser.add_argument("--offers", required=True, help="مجلد ملفات العروض")
+    parser.add_argument("--out", default="out", help="مجلد المخرجات (JSON/XLSX)")
+    parser.add_argument("--workers", type=int, default=4, help="عدد العروض التي تُعالج بالتوازي")
+    parser.add_argument("--mode", choices=["truncate", "mapreduce", "retrieval"], default=None,
+                        help="وضع التقييم (الافتراضي من EVAL_MODE)")
+    parser.add_argument("--sections", action="store_true", help="تحليل أقسام كل عرض أيضًا")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    written = run_batch(
+        args.criteria, args.offers, args.out,
+        workers=args.workers, mode=args.mode, sections=args.sections,
+    )
+    for kind, path in written.items():
+        print(f"{kind}: {path}")
+    return 0 if written else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,16 +1,15 @@
 # modules/analyzer.py
 import os, json, hashlib, re
-import streamlit as st
-from groq import Groq
-import fitz
-import pytesseract
-from PIL import Image
-
-# ============================================================
-# ☁️ إعداد Groq (سحابي فقط)
-# ============================================================
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-client = Groq(api_key=GROQ_API_KEY) if GROQ_API_KEY else None
+from concurrent.futures import FIRST_COMPLETED, wait
+from modules.ocr import OCR_DPI, ocr_pages
+from modules.extractors import load_cached_extraction, store_extraction
+from modules.document import Document, open_bytes
+from modules.sections import SECTIONS_MODE, split_sections
+from modules.llm import chat_completion, submit_completion
+from modules.budget import chunk_pages, context_budget, fit_text
+from modules.matcher import TermMatcher
+from modules.progress import Cancelled, check_cancelled, get_reporter, streamlit_active
+from modules.tracing import activate, current_span, start_span, traced
 
 def _md5(s: str) -> str:
     return hashlib.md5(s.encode("utf-8", "ignore")).hexdigest()
@@ -39,79 +38,103 @@ def clean_text(text):
     return text.strip()
 
 
-def extract_text_with_ocr(pdf_bytes, show_progress=True):
+@traced("ocr")
+def extract_text_with_ocr(pdf_bytes, show_progress=True, dpi=None, workers=None):
     """
     🧠 استخراج نص دقيق من PDF:
     - يستخدم النص الأصلي إن وُجد
-    - يفعّل OCR عند الحاجة
-    - يعرض شريط تقدم في Streamlit
+    - يحدد أولاً الصفحات الفقيرة نصيًا ثم يشغّل OCR عليها بالتوازي (محرك modules.ocr)
+    - يعرض شريط تقدم في Streamlit مع الحفاظ على ترتيب الصفحات
+    - يحفظ النتيجة في ذاكرة الاستخراج الدائمة حسب بصمة الملف ودقة المسح
+    pdf_bytes: bytes أو Document (النصوص وأعلام OCR ومقبض fitz تُؤخذ من المستند الموحّد)
     """
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    pages = []
-    total = len(doc)
-    ocr_count = 0
-
-    progress_bar = st.progress(0)
-    for i, page in enumerate(doc):
-        text = page.get_text("text").strip()
-        used_ocr = False
-
-        if len(text) < 40:  # إذا الصفحة فقيرة نصيًا → استخدم OCR
-            pix = page.get_pixmap(dpi=200)
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            text = pytesseract.image_to_string(img, lang="ara+eng")
-            used_ocr = True
-            ocr_count += 1
+    dpi = dpi or OCR_DPI
+    doc = pdf_bytes if isinstance(pdf_bytes, Document) else open_bytes("document.pdf", pdf_bytes)
+    sp = current_span().set(bytes=doc.size, dpi=dpi)
+    fid = doc.fid
+    cached = load_cached_extraction(f"ocr@{dpi}", fid)
+    if cached is not None:
+        sp.set(cached=True, pages=len(cached.get("pages", [])))
+        return {"type": "pdf", "pages": cached.get("pages", [])}
+
+    texts = [t.strip() for t in doc.texts]
+    ocr_indexes = [i for i, flag in enumerate(doc.ocr_flags) if flag]
+    total = len(texts)
+    ocr_count = len(ocr_indexes)
+    sp.set(pages=total, ocr_pages=ocr_count)
+
+    # الصفحات النصية تُحتسب منجزة مباشرة، ثم يتقدم الشريط مع كل صفحة OCR
+    rep = get_reporter()
+    progress_bar = rep.progress()
+    done = [total - ocr_count]
+    if total:
+        progress_bar.update(done[0] / total)
+
+    def _on_page(_i):
+        done[0] += 1
+        progress_bar.update(done[0] / total)
+
+    ocr_texts = ocr_pages(doc.raw, ocr_indexes, dpi=dpi, workers=workers, on_page=_on_page,
+                          open_handle=doc.handle)
 
-        text = clean_text(text)
-        pages.append({"page_num": i + 1, "text": text, "ocr_used": used_ocr})
-
-        # تحديث شريط التقدم
-        progress_bar.progress((i + 1) / total)
+    pages = []
+    for i, text in enumerate(texts):
+        used_ocr = i in ocr_texts
+        if used_ocr:  # إذا الصفحة فقيرة نصيًا → نص OCR
+            text = ocr_texts[i]
+        pages.append({"page_num": i + 1, "text": clean_text(text), "ocr_used": used_ocr})
 
-    if show_progress:
+    if show_progress and total:
         percent_ocr = (ocr_count / total) * 100
         if ocr_count > 0:
-            st.warning(f"🟨 تم استخدام OCR في {ocr_count} صفحة ({percent_ocr:.1f}%).")
+            rep.warning(f"🟨 تم استخدام OCR في {ocr_count} صفحة ({percent_ocr:.1f}%).")
         else:
-            st.success("🟩 تم استخراج جميع الصفحات نصيًا بدون الحاجة إلى OCR.")
+            rep.success("🟩 تم استخراج جميع الصفحات نصيًا بدون الحاجة إلى OCR.")
 
-    return {"type": "pdf", "pages": pages}
+    result = {"type": "pdf", "pages": pages}
+    store_extraction(f"ocr@{dpi}", fid, result, extractor="pymupdf+tesseract")
+    return result
 
 
 # ============================================================
 # 🧠 استدعاء Groq (مع دعم اختيار النموذج)
 # ============================================================
+def _json_request(prompt: str, model=None, max_tokens=None) -> dict:
+    """معاملات طلب JSON (مشتركة بين الاستدعاء المباشر والدفعات غير المتزامنة)"""
+    return {
+        "messages": [{"role": "user", "content": prompt}],
+        "model": model or ANALYZE_MODEL,
+        "temperature": 0.25,
+        "max_tokens": max_tokens or ANALYZE_MAX_TOKENS,
+    }
+
+
 def _llm_json_only(prompt: str, model=None) -> str:
     """استدعاء Groq وإرجاع الاستجابة كنص فقط (يتوقع JSON)."""
-    if not client:
-        raise RuntimeError("⚠️ GROQ_API_KEY غير مضبوط.")
-
-    selected_model = model or "llama-3.3-70b-versatile"
-    resp = client.chat.completions.create(
-        model=selected_model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.25,
-        max_tokens=4000
-    )
-    return resp.choices[0].message.content.strip()
+    return chat_completion(**_json_request(prompt, model)).strip()
+
+
+def _json_list(reply: str) -> list:
+    data = _safe_json_loads(reply)
+    return data if isinstance(data, list) else []
 
 
 # ============================================================
 # 📄 تحليل الأقسام بدقة مع رقم الصفحة الحقيقي
 # ============================================================
-def analyze_sections_with_pages(doc_payload: dict):
-    st.info("🤖 جارٍ تحليل المستند بدقة مع الحفاظ على النصوص الكاملة...")
-
-    if doc_payload.get("type") == "pdf":
-        parts = [f"[[PAGE:{p['page_num']}]]\n{p['text']}" for p in doc_payload["pages"]]
-        full_text = "\n\n".join(parts)
-        chunks = [full_text[i:i+18000] for i in range(0, len(full_text), 18000)]
-        all_sections = []
-
-        for idx, chunk in enumerate(chunks):
-            st.caption(f"📄 تحليل الجزء {idx+1}/{len(chunks)}...")
-            prompt = f"""
+# حد مشترك لعدد استدعاءات التحليل المتزامنة (على مستوى الأجزاء والعروض معًا)
+ANALYZE_MAX_WORKERS = int(os.getenv("ANALYZE_MAX_WORKERS", "4"))
+ANALYZE_MODEL = "llama-3.3-70b-versatile"
+ANALYZE_MAX_TOKENS = 4000
+# سقف رموز كل جزء: النموذج يعيد نص القسم كاملًا فلا معنى لجزء أطول بكثير من حد المخرجات
+SECTION_CHUNK_TOKENS = int(os.getenv("SECTION_CHUNK_TOKENS", "6000"))
+# مسار التقسيم البنيوي: النموذج يرى عنوان كل قسم ومقتطفًا قصيرًا منه فقط
+SECTION_EXCERPT_TOKENS = int(os.getenv("SECTION_EXCERPT_TOKENS", "200"))
+SECTION_LABEL_BATCH = 20          # أقسام لكل استدعاء تسمية
+SECTION_LABEL_TOKENS = 80         # رموز مخرجات لكل قسم (اسم + ملخص قصير)
+
+
+_PDF_SECTIONS_PROMPT = """
 اقرأ النص أدناه من عرض فني يحتوي على علامات صفحات بالشكل [[PAGE:n]].
 قسّمه إلى أقسام رئيسية مثل:
 المقدمة، الأهداف، المنهجية، خطة التنفيذ، الفريق، النتائج، الخاتمة.
@@ -130,16 +153,46 @@ def analyze_sections_with_pages(doc_payload: dict):
 النص:
 {chunk}
 """
-            try:
-                reply = _llm_json_only(prompt)
-                data = _safe_json_loads(reply)
-                if data:
-                    all_sections.extend(data)
-            except Exception as e:
-                st.error(f"❌ خطأ أثناء تحليل الجزء {idx+1}: {e}")
-
-        merged = {}
-        for sec in all_sections:
+
+_DOCX_SECTIONS_PROMPT = """
+قسّم النص التالي إلى أقسام واضحة مثل المقدمة، الأهداف، المنهجية، خطة التنفيذ، الفريق، النتائج، الخاتمة.
+لكل قسم:
+- "section": الاسم بالعربية
+- "summary": ملخص بسيط دون تحريف
+- "start_page": دائماً 1
+- "content": النص الكامل كما هو.
+
+أعد النتيجة بصيغة JSON فقط.
+النص:
+{text}
+"""
+
+
+def _section_budget(template: str) -> int:
+    return min(SECTION_CHUNK_TOKENS, context_budget(ANALYZE_MODEL, ANALYZE_MAX_TOKENS, template))
+
+
+def _section_jobs(doc_payload: dict) -> list:
+    """تقسيم المستند إلى مطالبات مستقلة (أجزاء بميزانية رموز على حدود الصفحات في PDF، ومطالبة واحدة لـ DOCX)"""
+    if doc_payload.get("type") == "pdf":
+        chunks = chunk_pages(doc_payload["pages"], _section_budget(_PDF_SECTIONS_PROMPT.format(chunk="")))
+        return [_PDF_SECTIONS_PROMPT.format(chunk=chunk) for chunk in chunks]
+
+    elif doc_payload.get("type") == "docx":
+        text = fit_text(doc_payload["text"], _section_budget(_DOCX_SECTIONS_PROMPT.format(text="")))
+        return [_DOCX_SECTIONS_PROMPT.format(text=text)]
+    return []
+
+
+def _section_requests(doc_payload: dict) -> list:
+    return [_json_request(prompt) for prompt in _section_jobs(doc_payload)]
+
+
+def _merge_sections(chunk_results: list) -> list:
+    """دمج الأقسام حسب الاسم بترتيب الأجزاء (الأجزاء غير المكتملة بعد تُتجاوز)"""
+    merged = {}
+    for sections in chunk_results:
+        for sec in sections or []:
             name = sec.get("section", "").strip()
             if not name:
                 continue
@@ -148,42 +201,163 @@ def analyze_sections_with_pages(doc_payload: dict):
                 merged[name]["summary"] = merged[name]["summary"] or sec.get("summary", "")
                 merged[name]["start_page"] = min(merged[name]["start_page"], sec.get("start_page", 1))
             else:
-                merged[name] = sec
+                merged[name] = dict(sec)
 
-        out = sorted(merged.values(), key=lambda x: x["start_page"])
-        return out
+    return sorted(merged.values(), key=lambda x: x["start_page"])
 
-    elif doc_payload.get("type") == "docx":
-        text = doc_payload["text"]
-        prompt = f"""
-قسّم النص التالي إلى أقسام واضحة مثل المقدمة، الأهداف، المنهجية، خطة التنفيذ، الفريق، النتائج، الخاتمة.
+
+_LABEL_PROMPT = """
+أمامك أقسام عرض فني حُددت حدودها مسبقًا من بنية المستند. لكل قسم علامة [[SECTION:n]] ثم عنوانه ومقتطف من بدايته.
 لكل قسم:
-- "section": الاسم بالعربية
-- "summary": ملخص بسيط دون تحريف
-- "start_page": دائماً 1
-- "content": النص الكامل كما هو.
+- "i": رقم القسم كما في العلامة
+- "section": اسم موحّد بالعربية (مثل المقدمة، الأهداف، المنهجية، خطة التنفيذ، الفريق، النتائج، الخاتمة)
+- "summary": ملخص قصير وواضح من المقتطف دون تحريف
 
-أعد النتيجة بصيغة JSON فقط.
-النص:
-{text[:20000]}
+أعد JSON فقط بهذا الشكل:
+[{{"i": 1, "section": "...", "summary": "..."}}]
+
+الأقسام:
+{sections}
 """
-        reply = _llm_json_only(prompt)
-        data = _safe_json_loads(reply)
-        return data or []
+
+
+def _label_requests(structure: list) -> list:
+    """طلبات تسمية وتلخيص الأقسام البنيوية (دفعات من SECTION_LABEL_BATCH قسمًا)"""
+    jobs = []
+    for start in range(0, len(structure), SECTION_LABEL_BATCH):
+        blocks = [
+            f"[[SECTION:{i + 1}]]\n{sec['heading']}\n{fit_text(sec['content'], SECTION_EXCERPT_TOKENS)}"
+            for i, sec in enumerate(structure[start:start + SECTION_LABEL_BATCH], start)
+        ]
+        max_tokens = min(ANALYZE_MAX_TOKENS, 100 + len(blocks) * SECTION_LABEL_TOKENS)
+        jobs.append(_json_request(_LABEL_PROMPT.format(sections="\n\n".join(blocks)), max_tokens=max_tokens))
+    return jobs
+
+
+def _label_sections(structure: list, label_results: list) -> list:
+    """
+    أقسام بنيوية + تسميات النموذج (حسب الرقم) → نفس شكل أقسام التحليل القديم
+    (section/start_page/summary/content) مع end_page وheading. القسم دون تسمية بعد يحمل عنوانه.
+    """
+    labels = {}
+    for batch in label_results:
+        for item in batch or []:
+            try:
+                labels[int(item.get("i"))] = item
+            except (AttributeError, TypeError, ValueError):
+                continue
+    sections, seen = [], {}
+    for i, sec in enumerate(structure, 1):
+        label = labels.get(i, {})
+        name = str(label.get("section") or sec["heading"]).strip() or sec["heading"]
+        seen[name] = seen.get(name, 0) + 1
+        if seen[name] > 1:
+            name = f"{name} ({seen[name]})"
+        sections.append({
+            "section": name,
+            "heading": sec["heading"],
+            "start_page": sec["start_page"],
+            "end_page": sec["end_page"],
+            "summary": str(label.get("summary") or ""),
+            "content": sec["content"],
+        })
+    return sections
+
+
+def _section_plan(src):
+    """
+    (طلبات, دالة الدمج, بنيوي؟) لمستند أو doc_payload:
+    - Document بحدود أقسام واضحة (فهرس/خطوط/ترقيم): النموذج يسمّي ويلخّص فقط من مقتطفات قصيرة
+    - غير ذلك: النموذج يقسّم النص كاملًا ويعيد محتوى كل قسم (المسار السابق)
+    """
+    if isinstance(src, Document):
+        structure = split_sections(src) if SECTIONS_MODE != "llm" else []
+        if structure:
+            return _label_requests(structure), lambda results: _label_sections(structure, results), True
+        src = src.payload()
+    if src.get("type") == "docx":
+        return _section_requests(src), lambda results: results[0] or [], False
+    return _section_requests(src), _merge_sections, False
+
+
+def iter_sections_analysis(payloads: dict, max_workers: int = None):
+    """
+    تحليل أقسام عدة عروض بالتوازي: كل أجزاء كل العروض طلبات غير متزامنة على مجمع الاتصالات
+    المشترك (بحد أقصى max_workers طلبًا في الطريق)، ومع اكتمال كل جزء يُعاد دمج أقسام عرضه فورًا.
+
+    payloads = {اسم العرض: Document أو doc_payload}
+    يُنتج (name, sections, done, total) بعد كل جزء مكتمل لعرض النتائج تدريجيًا.
+    المستندات ذات البنية الواضحة تُنتج أقسامها (بعناوينها الأصلية ونطاق صفحاتها) فورًا بـ done=0
+    قبل أي استدعاء للنموذج، ثم تُستبدل بالأسماء الموحدة والملخصات عند اكتمال التسمية.
+    """
+    rep = get_reporter()
+    plans = {name: _section_plan(src) for name, src in payloads.items()}
+    jobs = {name: plan[0] for name, plan in plans.items()}
+    results = {name: [None] * len(requests) for name, requests in jobs.items()}
+    done = {name: 0 for name in jobs}
+    in_flight = {}  # Future → (name, idx)
+
+    # مقطع القياس يمتد عبر yield، لذلك يُنشأ دون أن يصبح الحالي ويُجعل أبًا للطلبات فقط
+    sp = start_span("sections", offers=len(jobs), chunks=sum(len(p) for p in jobs.values()),
+                    structured=sum(1 for plan in plans.values() if plan[2]))
+    try:
+        for name, (requests, merge, structured) in plans.items():
+            if not requests:
+                yield name, [], 0, 0
+            elif structured:
+                yield name, merge(results[name]), 0, len(requests)
+
+        pending = [(name, idx, req) for name, requests in jobs.items() for idx, req in enumerate(requests)]
+        pending.reverse()
+        limit = max(1, max_workers or ANALYZE_MAX_WORKERS)
+        while pending or in_flight:
+            check_cancelled()  # لا أجزاء جديدة لمهمة أُلغيت
+            with activate(sp):
+                while pending and len(in_flight) < limit:
+                    name, idx, req = pending.pop()
+                    in_flight[submit_completion(**req)] = (name, idx)
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                name, idx = in_flight.pop(fut)
+                try:
+                    results[name][idx] = _json_list(fut.result())
+                except Cancelled:
+                    raise  # الأجزاء الجارية تُلغى في finally
+                except Exception as e:
+                    rep.error(f"❌ خطأ أثناء تحليل الجزء {idx+1} من {name}: {e}")
+                    results[name][idx] = []
+                done[name] += 1
+                yield name, plans[name][1](results[name]), done[name], len(jobs[name])
+    finally:
+        for fut in in_flight:  # المستهلك توقف مبكرًا: لا داعي لبقية الأجزاء
+            fut.cancel()
+        sp.finish()
+
+
+def analyze_sections_with_pages(doc_payload: dict):
+    rep = get_reporter()
+    rep.info("🤖 جارٍ تحليل المستند بدقة مع الحفاظ على النصوص الكاملة...")
+
+    sections = []
+    for _name, sections, done, total in iter_sections_analysis({"_": doc_payload}):
+        if total:
+            rep.caption(f"📄 اكتمل تحليل الجزء {done}/{total}...")
+    return sections
 
 
 # ============================================================
 # 💡 اقتراح معايير إضافية بالذكاء الصناعي
 # ============================================================
 def suggest_criteria_from_offers(offers_texts, base_criteria, lang="ar"):
-    api_key = os.getenv("GROQ_API_KEY")
-    if not api_key:
-        st.error("❌ لم يتم ضبط مفتاح GROQ_API_KEY في ملف .env")
+    if not os.getenv("GROQ_API_KEY"):
+        get_reporter().error("❌ لم يتم ضبط مفتاح GROQ_API_KEY في ملف .env")
         return []
 
-    client = Groq(api_key=api_key)
-    joined = "\n\n---\n\n".join(offers_texts)[:12000]
     seed = ", ".join(base_criteria[:15])
+    # نصيب متساوٍ من الميزانية لكل عرض بدل أن يستهلك العرض الأول المساحة كلها
+    budget = context_budget(ANALYZE_MODEL, 600, seed) // 2  # نصف النافذة يكفي لاقتراح المعايير
+    share = max(256, budget // max(1, len(offers_texts)))
+    joined = "\n\n---\n\n".join(fit_text(t, share) for t in offers_texts)
 
     system = (
         "أنت خبير تقييم مناقصات. اقترح معايير تقييم إضافية مختصرة وواضحة "
@@ -199,16 +373,15 @@ def suggest_criteria_from_offers(offers_texts, base_criteria, lang="ar"):
     )
 
     try:
-        resp = client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[
+        txt = chat_completion(
+            [
                 {"role": "system", "content": system},
                 {"role": "user", "content": user}
             ],
+            model=ANALYZE_MODEL,
             temperature=0.25,
             max_tokens=600,
-        )
-        txt = resp.choices[0].message.content.strip()
+        ).strip()
 
         # 🧩 إصلاح ناتج النص لو رجع كـ string بدلاً من list
         if txt.startswith("[") and txt.endswith("]"):
@@ -231,27 +404,56 @@ def suggest_criteria_from_offers(offers_texts, base_criteria, lang="ar"):
         lines = [l.strip("•- ").strip() for l in txt.splitlines() if l.strip()]
         return [l for l in lines if l]
     except Exception as e:
-        st.error(f"⚠️ خطأ أثناء اقتراح المعايير: {e}")
+        get_reporter().error(f"⚠️ خطأ أثناء اقتراح المعايير: {e}")
         return []
 
 
+def suggest_criteria_table(offers_pages: dict, base_criteria, limit: int = 5) -> list:
+    """
+    اقتراح معايير من العروض مع إحصاءات ورودها:
+    offers_pages = {اسم العرض: [{"page_num", "text"}, ...]}
+    يعيد [{"criterion", "synonyms", "count", "pages", "weight"}] (الوزن من عدد مرات الورود).
+    """
+    offers_texts = ["\n".join(p["text"] for p in pages) for pages in offers_pages.values()]
+    suggested = (suggest_criteria_from_offers(offers_texts, base_criteria) or [])[:limit]
+    synonyms = {s: [s, s.replace(" ", "_"), s.lower()] for s in suggested}
+    # مرور واحد على كل صفحة لجميع المعايير والمرادفات والعروض معًا
+    stats = TermMatcher(synonyms).scan_offers(offers_pages)
+    rows = []
+    for s, syns in synonyms.items():
+        count = stats[s]["count"]
+        rows.append({
+            "criterion": s,
+            "synonyms": ", ".join(syns),
+            "count": count,
+            "pages": ", ".join(map(str, stats[s]["pages"])) or "-",
+            "weight": min(5, 1 + count // 3),
+        })
+    return rows
+
+
 # ============================================================
 # 🧠 تحسين وتلخيص الفقرات (عرض منسق داخل Streamlit)
 # ============================================================
-def summarize_paragraphs_llm(section_text, model="llama-3.3-70b-versatile"):
-    if not section_text.strip():
-        return {"clean_text": "", "summaries": []}
-
-    prompt = f"""
+_SUMMARY_PROMPT = """
 قسم النص التالي إلى فقرات قصيرة ومفهومة، ولكل فقرة اكتب ملخصًا بالعربية الفصحى يشرح فكرتها الأساسية بإيجاز.
 أعد النتيجة بصيغة JSON فقط كالتالي:
 [
   {{"paragraph": "النص الأصلي للفقره", "summary_ar": "ملخص بالعربية"}}
 ]
 النص:
-{section_text[:15000]}
+{text}
 """
 
+
+def summarize_paragraphs_llm(section_text, model=ANALYZE_MODEL):
+    if not section_text.strip():
+        return {"clean_text": "", "summaries": []}
+
+    # كل فقرة تُعاد مع ملخصها، فالمدخل محدود بنصف حد المخرجات تقريبًا
+    budget = min(ANALYZE_MAX_TOKENS // 2, context_budget(model, ANALYZE_MAX_TOKENS, _SUMMARY_PROMPT))
+    prompt = _SUMMARY_PROMPT.format(text=fit_text(section_text, budget))
+
     summaries = []
     try:
         raw = _llm_json_only(prompt, model=model)
@@ -259,15 +461,19 @@ def summarize_paragraphs_llm(section_text, model="llama-3.3-70b-versatile"):
         if isinstance(data, list):
             summaries = data
         else:
-            st.warning("⚠️ لم يتمكن الذكاء الصناعي من إرجاع تنسيق JSON صحيح.")
+            get_reporter().warning("⚠️ لم يتمكن الذكاء الصناعي من إرجاع تنسيق JSON صحيح.")
             summaries = [{"paragraph": section_text, "summary_ar": raw.strip()}]
     except Exception as e:
-        st.error(f"⚠️ خطأ أثناء تلخيص الفقرات: {e}")
+        get_reporter().error(f"⚠️ خطأ أثناء تلخيص الفقرات: {e}")
         summaries = [{"paragraph": section_text, "summary_ar": "لم يتم توليد ملخص بسبب خطأ تقني."}]
 
     clean_text_out = re.sub(r"\s+", " ", section_text).strip()
 
-    # 🎨 عرض منسق
+    # 🎨 عرض منسق (داخل التطبيق فقط)
+    if not streamlit_active():
+        return {"clean_text": clean_text_out, "summaries": summaries}
+
+    import streamlit as st
     st.markdown("### ✨ الملخص الذكي ")
     for idx, item in enumerate(summaries, start=1):
         st.markdown(
@@ -0,0 +1,96 @@
+# modules/batch.py
+import os
+import json
+
+from modules.extractors import LocalUpload, parse_criteria_from_excel
+from modules.document import open_document
+from modules.utils import frame_records
+from modules.evaluator import evaluate_offers
+from modules.analyzer import iter_sections_analysis
+from modules.report import build_excel_report
+from modules.progress import LogReporter, get_reporter, use_reporter
+from modules.tracing import capture
+
+SUPPORTED_EXT = (".pdf", ".docx")
+
+
+# ============================================================
+# 📂 تحميل ملفات العروض من مجلد
+# ============================================================
+def load_offers(offers_dir: str) -> list:
+    """يقرأ جميع ملفات PDF/DOCX في المجلد (مرتبة بالاسم) ككائنات LocalUpload"""
+    names = sorted(
+        n for n in os.listdir(offers_dir)
+        if n.lower().endswith(SUPPORTED_EXT) and not n.startswith("~$")
+    )
+    return [LocalUpload(os.path.join(offers_dir, n)) for n in names]
+
+
+# ============================================================
+# 🧭 تحليل الأقسام لعدة عروض بالتوازي (حد تزامن مشترك للأجزاء والعروض)
+# ============================================================
+def analyze_offers_sections(offers, workers: int = 4) -> dict:
+    rep = get_reporter()
+    payloads = {f.name: open_document(f) for f in offers}
+    out = {name: [] for name in payloads}
+    for name, sections, done, total in iter_sections_analysis(payloads, max_workers=workers):
+        out[name] = sections
+        if done >= total:
+            rep.success(f"✅ تم تحليل {name} ({len(sections)} قسم).")
+    return out
+
+
+# ============================================================
+# 🚚 خط المعالجة الكامل دون واجهة
+# ============================================================
+def run_batch(criteria_path: str, offers_dir: str, out_dir: str, workers: int = 4,
+              mode: str = None, sections: bool = False, reporter=None) -> dict:
+    """
+    استخراج → تقييم → (تحليل الأقسام اختياريًا) → كتابة المخرجات:
+    - results.json: الترتيب وتفاصيل درجات كل عرض
+    - sections.json: أقسام كل عرض (عند تفعيل sections)
+    - report.xlsx: التقرير الكامل
+    - trace.jsonl: مقطع قياس لكل مرحلة (استخراج، OCR، ترجمة، استدعاء نموذج، تقرير...)
+    يعيد dict بمسارات الملفات المكتوبة.
+    """
+    reporter = reporter or LogReporter()
+    os.makedirs(out_dir, exist_ok=True)
+    written = {}
+    trace_path = os.path.join(out_dir, "trace.jsonl")
+    if os.path.exists(trace_path):
+        os.remove(trace_path)
+
+    with use_reporter(reporter), capture(trace_path) as trace:
+        criteria_list = parse_criteria_from_excel(criteria_path)["criterion"].tolist()
+        offers = load_offers(offers_dir)
+        reporter.info(f"📥 {len(criteria_list)} معيار، {len(offers)} عرض من {offers_dir}")
+        if not offers:
+            reporter.warning("⚠️ لا توجد ملفات PDF/DOCX في المجلد.")
+            return written
+
+        ranked, details = evaluate_offers(offers, criteria_list, max_workers=workers, mode=mode)
+
+        results = {
+            "criteria": criteria_list,
+            "ranking": frame_records(ranked),
+            "details": {name: frame_records(df) for name, df in details.items()},
+        }
+        written["results"] = os.path.join(out_dir, "results.json")
+        with open(written["results"], "w", encoding="utf-8") as fh:
+            json.dump(results, fh, ensure_ascii=False, indent=2)
+
+        if sections:
+            topics = analyze_offers_sections(offers, workers=workers)
+            written["sections"] = os.path.join(out_dir, "sections.json")
+            with open(written["sections"], "w", encoding="utf-8") as fh:
+                json.dump(topics, fh, ensure_ascii=False, indent=2)
+
+        written["report"] = os.path.join(out_dir, "report.xlsx")
+        with open(written["report"], "wb") as fh:
+            fh.write(build_excel_report(ranked, details))
+
+        written["trace"] = trace_path
+        for row in trace.summary():
+            reporter.caption(f"⏱️ {row['stage']}: {row['calls']} × — {row['total_s']}s")
+        reporter.success(f"✅ تم حفظ المخرجات في {out_dir}")
+    return written
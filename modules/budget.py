@@ -0,0 +1,139 @@
+# modules/budget.py
+import os
+import re
+
+# ============================================================
+# 📏 حدود النماذج وميزانية المطالبات
+# ============================================================
+MODEL_CONTEXT = {
+    "llama-3.3-70b-versatile": 131072,
+    "llama-3.1-8b-instant": 131072,
+}
+DEFAULT_CONTEXT = 8192
+
+# حد أعلى اختياري لحجم المطالبة (0 = بلا حد إضافي)، وحصة الرموز/دقيقة حتى لا يُرفض الطلب
+LLM_MAX_PROMPT_TOKENS = int(os.getenv("LLM_MAX_PROMPT_TOKENS", "0"))
+LLM_TPM = int(os.getenv("LLM_TPM", "12000"))
+SAFETY_MARGIN = 64  # رموز احتياطية لرسائل النظام وهوامش العدّ
+
+# معايرة المُقدِّر عند غياب tiktoken (تقدير محافظ لمُرمِّز Llama 3: العربية أكثف رموزًا من الإنجليزية)
+ARABIC_CHARS_PER_TOKEN = 2.6
+OTHER_CHARS_PER_TOKEN = 3.8
+_ARABIC_RE = re.compile(r"[\u0600-\u06FF\u0750-\u077F\uFB50-\uFDFF\uFE70-\uFEFF]")
+
+_ENCODER = False  # False = لم يُحمَّل بعد، None = غير متاح
+
+
+def _encoder():
+    """مُرمِّز محلي اختياري (أدق من التقدير) يُحمَّل عند أول عدّ"""
+    global _ENCODER
+    if _ENCODER is False:
+        try:
+            import tiktoken
+            _ENCODER = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _ENCODER = None
+    return _ENCODER
+
+
+# ============================================================
+# 🔢 عدّ الرموز
+# ============================================================
+def count_tokens(text: str) -> int:
+    """عدد الرموز التقريبي للنص: tiktoken إن توفر، وإلا مُقدِّر معاير يفرّق بين العربية وغيرها"""
+    if not text:
+        return 0
+    encoder = _encoder()
+    if encoder is not None:
+        return len(encoder.encode(text, disallowed_special=()))
+    arabic = len(_ARABIC_RE.findall(text))
+    other = len(text) - arabic
+    return int(arabic / ARABIC_CHARS_PER_TOKEN + other / OTHER_CHARS_PER_TOKEN) + 1
+
+
+def count_message_tokens(messages: list) -> int:
+    return sum(count_tokens(m.get("content", "")) + 4 for m in messages)
+
+
+def context_budget(model: str, max_tokens: int, template: str = "") -> int:
+    """
+    أكبر عدد رموز متاح لمحتوى المستند في مطالبة واحدة:
+    نافذة النموذج − max_tokens − نص القالب − هامش، ولا يتجاوز حصة الرموز/دقيقة أو الحد الاختياري.
+    """
+    limit = MODEL_CONTEXT.get(model, DEFAULT_CONTEXT) - (max_tokens or 0)
+    if LLM_TPM:
+        limit = min(limit, LLM_TPM - (max_tokens or 0))
+    if LLM_MAX_PROMPT_TOKENS:
+        limit = min(limit, LLM_MAX_PROMPT_TOKENS)
+    return max(256, limit - count_tokens(template) - SAFETY_MARGIN)
+
+
+# ============================================================
+# ✂️ القص على حدود الفقرات والصفحات
+# ============================================================
+def _paragraphs(text: str) -> list:
+    return [p for p in re.split(r"(\n\s*\n|\n)", text) if p]
+
+
+def fit_text(text: str, budget: int) -> str:
+    """أطول بداية للنص تتسع للميزانية، مقطوعة على حدود الفقرات (أو الأسطر)"""
+    if count_tokens(text) <= budget:
+        return text
+    out, used = [], 0
+    for para in _paragraphs(text):
+        n = count_tokens(para)
+        if used + n > budget:
+            if not out:  # فقرة واحدة أطول من الميزانية: قص تقريبي بنسبة الرموز
+                out.append(para[: max(1, int(len(para) * budget / max(n, 1)))])
+            break
+        out.append(para)
+        used += n
+    return "".join(out)
+
+
+def fit_pages(pages: list, budget: int, marker: str = "[[PAGE:{n}]]\n") -> str:
+    """
+    يضم الصفحات بالترتيب (مع علامة رقم الصفحة) حتى امتلاء الميزانية؛
+    الصفحة الأخيرة تُقص على حدود الفقرات بدل منتصف الجملة.
+    """
+    out, used = [], 0
+    for p in pages:
+        block = marker.format(n=p["page_num"]) + (p.get("text") or "") + "\n\n"
+        n = count_tokens(block)
+        if used + n > budget:
+            rest = budget - used
+            if rest > 32:
+                out.append(fit_text(block, rest))
+            break
+        out.append(block)
+        used += n
+    return "".join(out)
+
+
+def chunk_pages(pages: list, budget: int, marker: str = "[[PAGE:{n}]]\n") -> list:
+    """
+    يقسم الصفحات إلى أجزاء متتالية لا يتجاوز كل منها الميزانية (حدود الصفحات أولًا ثم الفقرات).
+    """
+    chunks, buf, used = [], [], 0
+    for p in pages:
+        block = marker.format(n=p["page_num"]) + (p.get("text") or "") + "\n\n"
+        n = count_tokens(block)
+        if buf and used + n > budget:
+            chunks.append("".join(buf))
+            buf, used = [], 0
+        if n <= budget:
+            buf.append(block)
+            used += n
+            continue
+        # صفحة أطول من الميزانية: يُقسم نصها وحده على الفقرات، وتُسبق كل جزء علامة الصفحة
+        # (رموز العلامة محسوبة من الميزانية، فلا يتجاوزها أي جزء)
+        head = marker.format(n=p["page_num"])
+        room = max(1, budget - count_tokens(head))
+        rest = (p.get("text") or "") + "\n\n"
+        while rest.strip():
+            piece = fit_text(rest, room) or rest[:1]
+            chunks.append(head + piece)
+            rest = rest[len(piece):]
+    if buf:
+        chunks.append("".join(buf))
+    return chunks
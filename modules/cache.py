@@ -0,0 +1,153 @@
+# modules/cache.py
+import os
+import json
+import time
+import zlib
+import sqlite3
+import threading
+
+# ============================================================
+# 📁 إعداد مجلد التخزين المؤقت الدائم
+# ============================================================
+CACHE_DIR = os.getenv("SMARTTENDER_CACHE_DIR", os.path.join(os.getcwd(), ".cache"))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key      TEXT PRIMARY KEY,
+    value    BLOB NOT NULL,
+    size     INTEGER NOT NULL,
+    created  REAL NOT NULL,
+    accessed REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_entries_accessed ON entries(accessed);
+"""
+
+
+# ============================================================
+# 💾 ذاكرة مؤقتة على القرص (SQLite) مع إخلاء LRU محدود الحجم
+# ============================================================
+class DiskCache:
+    """
+    مخزن مفتاح/قيمة دائم مبني على SQLite:
+    - القيم تُخزَّن مضغوطة (zlib)
+    - إخلاء الأقدم استخدامًا (LRU) عند تجاوز الحجم الأقصى
+    - صلاحية اختيارية (ttl بالثواني)
+    - آمن للاستخدام من عدة خيوط وعدة عمليات (وضع WAL)
+    """
+
+    def __init__(self, path: str, max_bytes: int = 512 * 1024 * 1024, ttl: float = None):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+
+    # ---------- قراءة ----------
+    def get(self, key: str):
+        """يعيد القيمة (bytes) أو None إذا لم تكن موجودة أو انتهت صلاحيتها"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created FROM entries WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or (self.ttl and now - row[1] > self.ttl):
+                if row is not None:
+                    self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                    self._conn.commit()
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return zlib.decompress(row[0])
+
+    # ---------- كتابة ----------
+    def set(self, key: str, value: bytes):
+        """يخزن القيمة ثم يُخلي الأقدم استخدامًا إذا تجاوز المجموع الحد الأقصى"""
+        blob = zlib.compress(value, 6)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now, now),
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM entries ORDER BY accessed ASC"
+        ).fetchall():
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    # ---------- JSON ----------
+    def get_json(self, key: str):
+        raw = self.get(key)
+        if raw is None:
+            return None
+        try:
+            return json.loads(raw.decode("utf-8"))
+        except Exception:
+            return None
+
+    def set_json(self, key: str, obj):
+        self.set(key, json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+
+    # ---------- إدارة ----------
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM entries")
+            self._conn.commit()
+
+    def stats(self) -> dict:
+        """إحصاءات الاستخدام: عدد الإصابات/الإخفاقات والحجم الحالي"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+# ============================================================
+# 🔑 مخازن مشتركة حسب الاسم (مخزن واحد لكل غرض داخل العملية)
+# ============================================================
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name: str, max_mb: int = 512, ttl: float = None) -> DiskCache:
+    """يعيد مخزنًا مشتركًا باسم معيّن داخل مجلد CACHE_DIR (يُنشأ عند أول طلب)"""
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            cache = DiskCache(
+                os.path.join(CACHE_DIR, f"{name}.sqlite"),
+                max_bytes=int(max_mb) * 1024 * 1024,
+                ttl=ttl,
+            )
+            _caches[name] = cache
+        return cache
@@ -1,16 +1,8 @@
 # modules/chatbot.py
-import os
 import re
-from groq import Groq
-
-# =========================================================
-# 🔑 إعداد مفتاح Groq
-# =========================================================
-GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-if not GROQ_API_KEY:
-    raise RuntimeError("⚠️ لم يتم العثور على مفتاح GROQ_API_KEY في البيئة.")
-
-client = Groq(api_key=GROQ_API_KEY)
+from modules.llm import chat_completion, stream_chat_completion, PRIORITY_INTERACTIVE
+from modules.retrieval import BM25Index, pages_from_text
+from modules.budget import context_budget, count_tokens, fit_text
 
 # =========================================================
 # 🧹 أدوات مساعدة للنظافة والتهيئة
@@ -24,37 +16,21 @@ def clean_text_for_ai(text: str) -> str:
     return text
 
 
-def limit_text(text: str, limit: int = 15000) -> str:
-    """يقتطع النص الطويل لتفادي حدود النموذج"""
-    return text[:limit]
+CHAT_MODEL = "llama-3.3-70b-versatile"  # ✅ أحدث نموذج مدعوم
+CHAT_MAX_TOKENS = 1500
 
 
-# =========================================================
-# 💬 الكلاس الأساسي للشاتبوت
-# =========================================================
-class TenderChat:
-    def __init__(self, offers_context: dict):
-        """
-        offers_context = {
-            "offer_name.pdf": "نص العرض الكامل...",
-            ...
-        }
-        """
-        self.context = offers_context
+def limit_text(text: str, limit: int = None) -> str:
+    """يقتطع النص الطويل (بالرموز وعلى حدود الفقرات) لتفادي حدود النموذج"""
+    return fit_text(text, limit or context_budget(CHAT_MODEL, CHAT_MAX_TOKENS))
 
-    def _build_prompt(self, question: str) -> str:
-        """ينشئ البرومبت الذكي"""
-        context_text = ""
-        for fname, text in self.context.items():
-            context_text += f"\n\n### 📘 العرض: {fname}\n\n"
-            context_text += clean_text_for_ai(limit_text(text))
 
-        prompt = f"""
+_PROMPT = """
 أنت مساعد ذكي مختص في تحليل العروض الفنية المكتوبة بالعربية.
-استخدم النص أدناه للإجابة عن الأسئلة.
+استخدم المقتطفات أدناه للإجابة عن الأسئلة.
 أجب بالعربية فقط، وبأسلوب مهني وواضح.
 
-- إذا وُجدت أرقام صفحات داخل النص (مثل [صفحة 4]) فاذكرها في إجابتك.
+- كل مقتطف يبدأ برقم صفحته (مثل [صفحة 4]) فاذكر رقم الصفحة في إجابتك.
 - إذا كان النص بالإنجليزية، ترجمه للعربية أولاً.
 - لا تضف معلومات غير موجودة.
 - اجعل الإجابة موجزة ومركزة ومفهومة.
@@ -65,32 +41,100 @@ class TenderChat:
 المحتوى المتاح:
 {context_text}
 """
-        return prompt
+
+
+# =========================================================
+# 💬 الكلاس الأساسي للشاتبوت
+# =========================================================
+class TenderChat:
+    def __init__(self, offers_context: dict, top_k: int = 6):
+        """
+        offers_context = {
+            "offer_name.pdf": [{"page_num": 1, "text": "..."}, ...]   # صفحات العرض
+            أو "offer_name.pdf": "نص العرض الكامل مع علامات [صفحة n]...",
+            ...
+        }
+        يُبنى فهرس بحث (BM25) لكل عرض مرة واحدة عند إنشاء المحادثة،
+        ثم يُرسل للنموذج أفضل top_k مقاطع فقط لكل سؤال.
+        """
+        self.context = offers_context
+        self.top_k = top_k
+        self.indexes = {}
+        for fname, content in offers_context.items():
+            pages = content if isinstance(content, list) else pages_from_text(content)
+            self.indexes[fname] = BM25Index.from_pages(pages)
+
+    def _retrieve(self, fname: str, question: str) -> list:
+        """أفضل المقاطع للسؤال مرتبة حسب الصفحة؛ وإن لم يتطابق شيء نأخذ بداية العرض"""
+        index = self.indexes[fname]
+        hits = [c for _, c in index.search(question, k=self.top_k)]
+        if not hits:
+            hits = index.chunks[:self.top_k]
+        return sorted(hits, key=lambda c: c["page_num"])
+
+    def _build_prompt(self, question: str) -> str:
+        """
+        ينشئ البرومبت الذكي من المقاطع الأكثر صلة بالسؤال فقط؛
+        تُضاف المقاطع كاملة ما دامت تتسع لميزانية رموز النموذج (لا قص في منتصف المقطع).
+        """
+        budget = context_budget(CHAT_MODEL, CHAT_MAX_TOKENS, _PROMPT.format(question=question, context_text=""))
+        parts, used = [], 0
+        for fname in self.indexes:
+            header = f"\n\n### 📘 العرض: {fname}\n\n"
+            parts.append(header)
+            used += count_tokens(header)
+            for chunk in self._retrieve(fname, question):
+                block = f"[صفحة {chunk['page_num']}] {clean_text_for_ai(chunk['text'])}\n\n"
+                n = count_tokens(block)
+                if used + n > budget:
+                    continue
+                parts.append(block)
+                used += n
+
+        return _PROMPT.format(question=question, context_text="".join(parts))
+
+    def _messages(self, question: str) -> list:
+        return [
+            {"role": "system", "content": "أنت مساعد ذكي يجيب بالعربية فقط."},
+            {"role": "user", "content": self._build_prompt(question)}
+        ]
+
+    @staticmethod
+    def format_answer(answer: str) -> str:
+        """✨ تنسيق الإجابة النهائية (يُطبّق على الرد الكامل بعد انتهاء البث)"""
+        answer = (answer or "").strip()
+        answer = re.sub(r"\n{2,}", "\n\n", answer)
+        answer = answer.replace("###", "🔹").replace("**", "")
+        answer = re.sub(r"(\[صفحة\s*\d+\])", r"📄 \1", answer)
+
+        if not answer:
+            answer = "لم أجد معلومات كافية للإجابة عن هذا السؤال داخل العرض."
+        return answer
 
     def answer(self, question: str) -> str:
         """يرسل السؤال إلى نموذج Groq ويعيد الرد"""
         try:
-            prompt = self._build_prompt(question)
-            resp = client.chat.completions.create(
-                model="llama-3.3-70b-versatile",  # ✅ أحدث نموذج مدعوم
-                messages=[
-                    {"role": "system", "content": "أنت مساعد ذكي يجيب بالعربية فقط."},
-                    {"role": "user", "content": prompt}
-                ],
+            answer = chat_completion(
+                self._messages(question),
+                model=CHAT_MODEL,
                 temperature=0.25,
-                max_tokens=1500
+                max_tokens=CHAT_MAX_TOKENS,
+                priority=PRIORITY_INTERACTIVE,  # أسئلة المستخدم تسبق التقييم الدفعي
             )
-
-            answer = resp.choices[0].message.content.strip()
-
-            # ✨ تنسيق الإجابة النهائية
-            answer = re.sub(r"\n{2,}", "\n\n", answer)
-            answer = answer.replace("###", "🔹").replace("**", "")
-            answer = re.sub(r"(\[صفحة\s*\d+\])", r"📄 \1", answer)
-
-            if not answer:
-                answer = "لم أجد معلومات كافية للإجابة عن هذا السؤال داخل العرض."
-            return answer
+            return self.format_answer(answer)
 
         except Exception as e:
             return f"⚠️ حدث خطأ أثناء تحليل السؤال: {e}"
+
+    def answer_stream(self, question: str):
+        """
+        مولّد يُنتج أجزاء الرد الخام فور وصولها (للعرض التدريجي في فقاعة المحادثة).
+        التنسيق النهائي يتم عبر format_answer على النص الكامل بعد انتهاء البث.
+        """
+        yield from stream_chat_completion(
+            self._messages(question),
+            model=CHAT_MODEL,
+            temperature=0.25,
+            max_tokens=CHAT_MAX_TOKENS,
+            priority=PRIORITY_INTERACTIVE,
+        )
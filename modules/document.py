@@ -0,0 +1,283 @@
+# modules/document.py
+import os
+import bisect
+import threading
+import weakref
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from modules.extractors import _hash_bytes, load_cached_extraction, store_extraction
+from modules.ocr import page_needs_ocr
+from modules.progress import get_reporter
+from modules.tracing import span
+
+# ============================================================
+# ⚙️ الإعدادات
+# ============================================================
+DOCUMENT_CACHE_MB = int(os.getenv("DOCUMENT_CACHE_MB", "512"))  # حجم ملفات المستندات المحفوظة في الذاكرة
+LANG_SAMPLE_CHARS = 1000
+
+
+# ============================================================
+# 📄 المستند: نسخة واحدة لكل محتوى (بايتات + صفحات + لغة + فهرس مواضع)
+# ============================================================
+class Document:
+    """
+    تمثيل موحّد لملف مرفوع يُبنى مرة واحدة لكل بصمة محتوى ويُشارك بين كل الوحدات:
+    - data: memoryview على البايتات الأصلية (بلا نسخ)، وraw: نفس الكائن للمكتبات التي تتطلب bytes
+    - handle(): مقبض PyMuPDF يُفتح عند أول حاجة ويُعاد استخدامه (مع قفل؛ المقبض غير آمن بين الخيوط)
+    - texts: نصوص الصفحات (tuple، والصفحات المتطابقة كالأغلفة والفواصل تشترك في نفس الكائن)
+    - ocr_flags: الصفحات الفقيرة نصيًا التي تحتاج OCR (مسار modules.analyzer.extract_text_with_ocr)
+    - language / joined_text / offsets / page_at(): تُحسب مرة واحدة عند أول طلب
+    """
+
+    def __init__(self, name: str, data, fid: str = None):
+        self.name = name
+        if isinstance(data, memoryview) and isinstance(data.obj, bytes) and data.nbytes == len(data.obj):
+            data = data.obj  # memoryview على bytes كاملة: نفس الكائن دون نسخ
+        self.raw = data if isinstance(data, bytes) else bytes(data)
+        self.data = memoryview(self.raw)
+        self.size = len(self.raw)
+        self.fid = fid or _hash_bytes(self.data)
+        lower = name.lower()
+        self.kind = "pdf" if lower.endswith(".pdf") else "docx" if lower.endswith(".docx") else "unknown"
+        self._lock = threading.RLock()
+        self._fitz = None
+        self._texts = None
+        self._ocr = None
+        self._joined = None
+        self._offsets = None
+        self._language = None
+
+    def __repr__(self):
+        return f"<Document {self.name!r} {self.kind} {self.size}B {self.fid[:8]}>"
+
+    # ---------------- PyMuPDF ----------------
+    @contextmanager
+    def handle(self):
+        """مقبض fitz مفتوح على نفس البايتات (لا يُعاد فتح الملف لكل قراءة)"""
+        with self._lock:
+            if self._fitz is None:
+                import fitz
+                self._fitz = fitz.open(stream=self.raw, filetype="pdf")
+            yield self._fitz
+
+    def close(self):
+        with self._lock:
+            if self._fitz is not None:
+                self._fitz.close()
+                self._fitz = None
+
+    @property
+    def page_count(self) -> int:
+        if self._texts is not None:
+            return len(self._texts)
+        if self.kind == "pdf":
+            with self.handle() as doc:
+                return doc.page_count
+        return 1 if self.kind == "docx" else 0
+
+    # ---------------- النصوص ----------------
+    def _set_pages(self, texts, flags=None):
+        shared = {}
+        self._texts = tuple(shared.setdefault(t, t) for t in texts)
+        if flags is None or len(flags) != len(self._texts):
+            flags = [page_needs_ocr(t) for t in self._texts] if self.kind == "pdf" else []
+        self._ocr = bytes(bool(f) for f in flags)
+
+    def _load(self):
+        with self._lock:
+            if self._texts is not None:
+                return
+            with span("extract", file=self.name, bytes=self.size, kind=self.kind) as sp:
+                texts, flags, cached = self._read()
+                self._set_pages(texts, flags)
+                sp.set(pages=len(texts), chars=sum(len(t) for t in texts), cached=cached)
+
+    def _read(self):
+        """
+        (نصوص الصفحات، أعلام OCR أو None، من الذاكرة الدائمة؟) — الاستخراج الفعلي يحدث مرة واحدة لكل محتوى.
+        كل صفحة PDF تُحفظ مع needs_ocr، فالمستند المحمّل من الذاكرة يحمل نفس حالة OCR.
+        """
+        if self.kind == "pdf":
+            cached = load_cached_extraction("pdf", self.fid)
+            if cached is not None:
+                pages = cached.get("pages", [])
+                flags = [p["needs_ocr"] for p in pages] if all("needs_ocr" in p for p in pages) else None
+                return [p.get("text", "") for p in pages], flags, True
+            try:
+                with self.handle() as doc:
+                    texts = [page.get_text("text") or "" for page in doc]
+            except Exception as e:
+                get_reporter().error(f"❌ خطأ في قراءة PDF {self.name}: {e}")
+                return [], None, False
+            flags = [page_needs_ocr(t) for t in texts]
+            pages = [{"page_num": i + 1, "text": t, "needs_ocr": f} for i, (t, f) in enumerate(zip(texts, flags))]
+            store_extraction("pdf", self.fid, {"type": "pdf", "pages": pages}, name=self.name, extractor="pymupdf")
+            return texts, flags, False
+
+        if self.kind == "docx":
+            cached = load_cached_extraction("docx", self.fid)
+            if cached is not None:
+                return [cached.get("text", "")], None, True
+            try:
+                import io
+                from docx import Document as DocxDocument
+                doc = DocxDocument(io.BytesIO(self.raw))  # BytesIO يشارك كائن bytes دون نسخ (بخلاف memoryview)
+                text = "\n".join(p.text for p in doc.paragraphs)
+            except Exception as e:
+                get_reporter().error(f"❌ خطأ في قراءة DOCX {self.name}: {e}")
+                return [""], None, False
+            store_extraction("docx", self.fid, {"type": "docx", "text": text}, name=self.name, extractor="python-docx")
+            return [text], None, False
+
+        return [], None, False
+
+    @property
+    def texts(self) -> tuple:
+        self._load()
+        return self._texts
+
+    @property
+    def ocr_flags(self) -> tuple:
+        self._load()
+        return tuple(bool(b) for b in self._ocr)
+
+    # ---------------- النص الموحّد والمواضع ----------------
+    @property
+    def joined_text(self) -> str:
+        """كل الصفحات مفصولة بسطر جديد (نفس النص الذي كانت تبنيه الوحدات يدويًا)"""
+        if self._joined is None:
+            with self._lock:
+                if self._joined is None:
+                    texts = self.texts
+                    offsets, pos = array("q"), 0
+                    for t in texts:
+                        offsets.append(pos)
+                        pos += len(t) + 1
+                    self._offsets = offsets
+                    self._joined = "\n".join(texts)
+        return self._joined
+
+    @property
+    def offsets(self) -> array:
+        """موضع بداية كل صفحة داخل joined_text"""
+        if self._offsets is None:
+            self.joined_text  # يبني النص والفهرس معًا
+        return self._offsets
+
+    def page_at(self, offset: int) -> int:
+        """رقم الصفحة (يبدأ من 1) التي يقع فيها موضع من joined_text"""
+        return max(1, bisect.bisect_right(self.offsets, offset))
+
+    @property
+    def language(self) -> str:
+        """لغة المستند ("ar"/"en"/...) من عينة من بدايته، تُكشف مرة واحدة"""
+        if self._language is None:
+            from modules.translation import detect_language
+            self._language = detect_language(self.joined_text[:LANG_SAMPLE_CHARS])
+        return self._language
+
+    # ---------------- الأشكال المتوافقة مع بقية الوحدات ----------------
+    def page_dicts(self) -> list:
+        """[{"page_num", "text"}] — ملف DOCX صفحة واحدة"""
+        return [{"page_num": i + 1, "text": t} for i, t in enumerate(self.texts)]
+
+    def payload(self) -> dict:
+        """نفس شكل extract_text_with_pages: {"type": "pdf", "pages": [...]} أو {"type": "docx", "text": ...}"""
+        if self.kind == "pdf":
+            return {"type": "pdf", "pages": self.page_dicts()}
+        if self.kind == "docx":
+            return {"type": "docx", "text": self.texts[0] if self.texts else ""}
+        return {"type": "unknown"}
+
+
+# ============================================================
+# 🗂️ السجل: مستند واحد لكل بصمة، وكل ملف مرفوع يُقرأ ويُبصم مرة واحدة
+# ============================================================
+_documents = OrderedDict()   # بصمة → Document (الأقدم استخدامًا أولًا)
+_uploads = {}                # مفتاح الملف المرفوع → (مرجع ضعيف أو None، بصمة)
+_registry_lock = threading.Lock()
+
+
+def _upload_key(file_obj):
+    """UploadedFile في Streamlit له file_id ثابت؛ غيره (LocalUpload...) يُعرَّف بهويته مع مرجع ضعيف"""
+    file_id = getattr(file_obj, "file_id", None)
+    if file_id:
+        return ("st", file_id), None
+    try:
+        return ("obj", id(file_obj)), weakref.ref(file_obj)
+    except TypeError:
+        return None, None
+
+
+def _upload_bytes(file_obj) -> bytes:
+    """محتوى الملف دون نسخ حين يكون BytesIO لم يُعدَّل (getvalue تعيد نفس الكائن) ودون تحريك المؤشر"""
+    if hasattr(file_obj, "getvalue"):
+        return file_obj.getvalue()
+    pos = file_obj.tell()
+    file_obj.seek(0)
+    data = file_obj.read()
+    file_obj.seek(pos)
+    return data
+
+
+def _register(doc: Document) -> Document:
+    existing = _documents.get(doc.fid)
+    if existing is not None:
+        _documents.move_to_end(doc.fid)
+        return existing
+    _documents[doc.fid] = doc
+    limit = DOCUMENT_CACHE_MB * 1024 * 1024
+    total = sum(d.size for d in _documents.values())
+    while total > limit and len(_documents) > 1:
+        _fid, old = _documents.popitem(last=False)
+        total -= old.size
+        old.close()
+    return doc
+
+
+def open_bytes(name: str, data, fid: str = None) -> Document:
+    """المستند المسجل لهذا المحتوى (يُنشأ عند أول طلب)"""
+    fid = fid or _hash_bytes(memoryview(data))
+    with _registry_lock:
+        doc = _documents.get(fid)
+        if doc is not None:
+            _documents.move_to_end(fid)
+            return doc
+    doc = Document(name, data, fid)
+    with _registry_lock:
+        return _register(doc)
+
+
+def open_document(file_obj) -> Document:
+    """
+    المستند الموحّد لملف مرفوع (UploadedFile / LocalUpload / أي كائن name + read/seek):
+    نفس الكائن يعيد نفس المستند دون قراءة أو بصمة جديدة، ونفس المحتوى بأي اسم يشارك نفس النصوص.
+    """
+    if isinstance(file_obj, Document):
+        return file_obj
+    key, ref = _upload_key(file_obj)
+    with _registry_lock:
+        entry = _uploads.get(key) if key else None
+        if entry is not None and (entry[0] is None or entry[0]() is file_obj):
+            doc = _documents.get(entry[1])
+            if doc is not None:
+                _documents.move_to_end(entry[1])
+                return doc
+    doc = open_bytes(file_obj.name, _upload_bytes(file_obj))
+    if key is not None:
+        with _registry_lock:
+            _uploads[key] = (ref, doc.fid)
+            if ref is not None:
+                weakref.finalize(file_obj, _uploads.pop, key, None)
+    return doc
+
+
+def clear_documents():
+    with _registry_lock:
+        for doc in _documents.values():
+            doc.close()
+        _documents.clear()
+        _uploads.clear()
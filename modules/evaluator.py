@@ -1,68 +1,138 @@
 # modules/evaluator.py
-import streamlit as st
 import pandas as pd
 import json, re, os
-from groq import Groq
-from dotenv import load_dotenv
-from langdetect import detect
-from deep_translator import GoogleTranslator
-from modules.extractors import extract_text_with_pages
-
-# تحميل مفتاح Groq من .env
-load_dotenv()
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
+import difflib
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from modules.cache import get_cache
+from modules.document import open_document
+from modules.evidence import evidence_index, plan_evidence
+from modules.llm import chat_completion, gather_completions
+from modules.budget import context_budget, fit_pages, chunk_pages
+from modules.matcher import criteria_matcher
+from modules.progress import Cancelled, check_cancelled, get_reporter, cache_data, thread_initializer
+from modules.tracing import current_span, span, traced
+from modules.translation import detect_language, translate_texts
+from modules.scoring import normalize
 
 # ===========================================================
 # 🔤 ترجمة المعايير عند الحاجة
 # ===========================================================
-def translate_if_needed(criteria_list, text):
-    """إذا كان النص إنجليزيًا تُترجم المعايير تلقائيًا"""
-    try:
-        sample = text[:1000]
-        lang = detect(sample)
-        if lang == "en":
-            st.info("🔤 تم اكتشاف أن العرض باللغة الإنجليزية، يجري ترجمة المعايير...")
-            translated = [
-                GoogleTranslator(source="ar", target="en").translate(c)
-                for c in criteria_list
-            ]
-            return translated, "en"
-    except Exception:
-        pass
-    return criteria_list, "ar"
+@traced("translate")
+def translate_if_needed(criteria_list, text=None, lang=None):
+    """
+    إذا كان النص إنجليزيًا تُعاد نسخة مترجمة من المعايير لهذا العرض فقط (القائمة الأصلية لا تتغير).
+    الترجمة تتم مرة واحدة للمناقصة (طلب مجمّع + ذاكرة دائمة في modules.translation).
+    lang: لغة مكتشفة مسبقًا (Document.language) بدل كشفها من النص مجددًا.
+    """
+    lang = lang or detect_language(text)
+    current_span().set(lang=lang)
+    if lang == "en":
+        return translate_texts(criteria_list, source="ar", target="en"), "en"
+    return list(criteria_list), "ar"
+
+
+def _restore_criteria(df, offer_criteria, criteria_list):
+    """
+    إرجاع أسماء المعايير في جدول الدرجات إلى نصها الأصلي كما في القائمة
+    (النموذج يعيدها بلغة العرض أو بصياغة قريبة) حتى تتطابق الجداول بين العروض وتُحفظ بمفتاح ثابت.
+    """
+    if df.empty:
+        return df
+    back = {t.strip().lower(): o for t, o in zip(offer_criteria, criteria_list)}
+
+    def _orig(name):
+        key = str(name).strip().lower()
+        if key in back:
+            return back[key]
+        close = difflib.get_close_matches(key, list(back), n=1, cutoff=0.6)
+        return back[close[0]] if close else name
+
+    df["criterion"] = df["criterion"].map(_orig)
+    return df
 
 
 # ===========================================================
-# 🧠 التقييم الذكي للعروض
+# 🧵 إعدادات التوازي وأوضاع التقييم
 # ===========================================================
-@st.cache_data(show_spinner=False)
-def evaluate_offers(offers, criteria_list):
-    results, details = [], {}
+# الحد الأقصى لعدد العروض التي تُقيَّم في نفس الوقت (قابل للضبط من .env)
+EVAL_MAX_WORKERS = int(os.getenv("EVAL_MAX_WORKERS", "4"))
+
+# "truncate": بداية العرض فقط (سريع) | "mapreduce": العرض كاملًا على أجزاء ثم تجميع
+# "retrieval": لكل مجموعة معايير مترابطة صفحات أدلتها فقط (BM25 + تضمين اختياري)، والمجموعات بالتوازي
+EVAL_MODES = ("truncate", "mapreduce", "retrieval")
+EVAL_MODE = os.getenv("EVAL_MODE", "truncate")
+EVAL_CHUNK_TOKENS = int(os.getenv("EVAL_CHUNK_TOKENS", "0"))  # ميزانية كل جزء (0 = تلقائي حسب النموذج)
+EVAL_MAX_CALLS_PER_OFFER = int(os.getenv("EVAL_MAX_CALLS_PER_OFFER", "8"))  # أجزاء + تجميع
+
+EVAL_MODEL = "llama-3.3-70b-versatile"
+
+# ذاكرة الدرجات: (بصمة محتوى العرض، المعيار، النموذج، الوضع) → صف الدرجة
+SCORES_CACHE_MAX_MB = int(os.getenv("SCORES_CACHE_MAX_MB", "128"))
+
+
+# ===========================================================
+# 💾 ذاكرة الدرجات لكل (عرض، معيار): إعادة التقييم تشمل المعايير الجديدة فقط
+# ===========================================================
+def _scores_cache():
+    return get_cache("scores", max_mb=SCORES_CACHE_MAX_MB)
+
+
+def _score_key(fid: str, criterion: str, mode: str) -> str:
+    return f"score|{fid}|{EVAL_MODEL}|{mode}|{hashlib.sha1(criterion.encode('utf-8')).hexdigest()}"
 
-    for f in offers:
-        with st.spinner(f"🔍 تحليل العرض: {f.name}"):
-            # استخراج النصوص
-            data = extract_text_with_pages(f)
-            if isinstance(data, dict):
-                if data.get("type") == "pdf":
-                    text = "\n".join(p["text"] for p in data.get("pages", []))
-                elif data.get("type") == "docx":
-                    text = data.get("text", "")
-                else:
-                    text = ""
-            else:
-                text = str(data)
 
-            if not text.strip():
-                st.warning(f"⚠️ لا يوجد نص يمكن تحليله في الملف: {f.name}")
-                continue
+def _comment_key(fid: str, mode: str) -> str:
+    return f"comment|{fid}|{EVAL_MODEL}|{mode}"
 
-            # ترجمة المعايير إذا لزم
-            criteria_list, lang_detected = translate_if_needed(criteria_list, text)
-            text_criteria = "\n".join([f"- {c}" for c in criteria_list])
 
-            # ===== التوجيه للنموذج =====
-            prompt = f"""
+def load_scores(fid: str, criteria_list, mode: str) -> dict:
+    """{معيار: صف الدرجة} للمعايير التي سبق تقييمها لهذا المحتوى"""
+    cache, out = _scores_cache(), {}
+    for c in criteria_list:
+        rec = cache.get_json(_score_key(fid, c, mode))
+        if rec is not None:
+            out[c] = rec
+    return out
+
+
+def store_scores(fid: str, df, mode: str, comment: str = None):
+    cache = _scores_cache()
+    for rec in json.loads(df.to_json(orient="records", force_ascii=False)):
+        cache.set_json(_score_key(fid, str(rec.get("criterion", "")), mode), rec)
+    if comment:
+        cache.set_json(_comment_key(fid, mode), comment)
+
+
+def load_comment(fid: str, mode: str):
+    return _scores_cache().get_json(_comment_key(fid, mode))
+
+def _clean_scores_frame(scores) -> pd.DataFrame:
+    """تحويل قائمة الدرجات إلى DataFrame بأعمدة ثابتة وتنظيف النصوص"""
+    df = pd.DataFrame(scores)
+    for col in ["criterion", "score", "reason", "ai_question"]:
+        if col not in df.columns:
+            df[col] = ""
+
+    # تنظيف الرموز الغريبة (مثل الصينية)
+    for c in ["reason", "ai_question"]:
+        df[c] = df[c].astype(str).apply(lambda x: re.sub(r"[^\u0600-\u06FFa-zA-Z0-9\s.,()%-]", "", x))
+
+    df["score"] = pd.to_numeric(df["score"], errors="coerce").fillna(0)
+    return df
+
+
+def _parse_json_object(result_text: str):
+    json_match = re.search(r"\{.*\}", result_text, re.S)
+    if not json_match:
+        return None
+    return json.loads(json_match.group(0))
+
+
+# ===========================================================
+# ✂️ وضع التقييم السريع: بداية العرض فقط
+# ===========================================================
+_TRUNCATED_PROMPT = """
 أنت خبير تقييم عروض تقنية. اقرأ النص التالي ثم قيّم العرض بناءً على المعايير المحددة.
 
 لكل معيار:
@@ -82,57 +152,344 @@ def evaluate_offers(offers, criteria_list):
 {text_criteria}
 
 النص:
-{text[:18000]}
+{text}
+"""
+
+
+def _score_truncated(pages, text_criteria):
+    """بداية العرض بأكبر قدر يتسع له سياق النموذج (مقطوعًا على حدود الصفحات/الفقرات)"""
+    budget = context_budget(EVAL_MODEL, 3500, _TRUNCATED_PROMPT.format(text_criteria=text_criteria, text=""))
+    text = fit_pages(pages, budget, marker="")
+    prompt = _TRUNCATED_PROMPT.format(text_criteria=text_criteria, text=text)
+    return chat_completion(
+        [{"role": "user", "content": prompt}],
+        model=EVAL_MODEL,
+        temperature=0.3,
+        max_tokens=3500,
+    ).strip()
+
+
+# ===========================================================
+# 🗺️ وضع Map-Reduce: استخراج الأدلة من كل جزء ثم التجميع
+# ===========================================================
+def _limit_chunks(chunks, max_map_calls, criteria=None):
+    """
+    عند تجاوز حد الاستدعاءات:
+    - مع المعايير: نُبقي الجزء الأول + الأجزاء الأكثر احتواءً على كلمات المعايير (ترشيح بالكلمات المفتاحية)
+    - بدونها أو عند غياب أي تطابق: أجزاء موزعة بالتساوي على كامل العرض (الأول والأخير دائمًا)
+    """
+    if len(chunks) <= max_map_calls:
+        return chunks
+    if max_map_calls == 1:
+        return chunks[:1]
+    if criteria:
+        matcher = criteria_matcher(criteria)
+        hits = [sum(matcher.hits(c).values()) for c in chunks]
+        if any(hits[1:]):
+            ranked = sorted(range(1, len(chunks)), key=lambda i: hits[i], reverse=True)
+            picked = sorted([0] + ranked[:max_map_calls - 1])
+            return [chunks[i] for i in picked]
+    step = (len(chunks) - 1) / (max_map_calls - 1)
+    picked = sorted({round(i * step) for i in range(max_map_calls)})
+    return [chunks[i] for i in picked]
+
+
+_MAP_PROMPT = """
+أنت خبير تقييم عروض تقنية. النص أدناه جزء من عرض فني ويحتوي على علامات صفحات بالشكل [[PAGE:n]].
+لكل معيار من المعايير، استخرج الأدلة الموجودة في هذا الجزء فقط (إن وجدت).
+
+أعد النتيجة بصيغة JSON فقط بهذا الشكل:
+{{
+  "evidence": [
+    {{"criterion":"...","strength":3,"pages":[4,5],"evidence":"ملخص موجز للدليل"}}
+  ]
+}}
+- strength من 1 إلى 4 بحسب قوة الدليل لهذا المعيار.
+- تجاهل المعايير التي لا يوجد لها دليل في هذا الجزء.
+
+المعايير:
+{text_criteria}
+
+النص:
+{chunk}
 """
 
+
+def _map_request(chunk, text_criteria) -> dict:
+    prompt = _MAP_PROMPT.format(text_criteria=text_criteria, chunk=chunk)
+    return {"messages": [{"role": "user", "content": prompt}], "model": EVAL_MODEL,
+            "temperature": 0.2, "max_tokens": 1500}
+
+
+def _score_mapreduce(pages, criteria, token_budget=None, max_calls=None):
+    max_calls = max_calls or EVAL_MAX_CALLS_PER_OFFER
+    text_criteria = "\n".join([f"- {c}" for c in criteria])
+    token_budget = token_budget or EVAL_CHUNK_TOKENS or context_budget(
+        EVAL_MODEL, 1500, _MAP_PROMPT.format(text_criteria=text_criteria, chunk="")
+    )
+    chunks = _limit_chunks(chunk_pages(pages, token_budget), max(1, max_calls - 1), criteria)
+
+    # Map: كل الأجزاء طلبات متزامنة على مجمع الاتصالات المشترك، وفشل جزء لا يُسقط البقية
+    evidence = []
+    replies = gather_completions([_map_request(c, text_criteria) for c in chunks], return_exceptions=True)
+    check_cancelled()  # أجزاء فشلت بسبب الإلغاء لا تُعامل كأجزاء بلا أدلة
+    for reply in replies:
+        if isinstance(reply, Exception):
+            continue
+        try:
+            evidence.extend((_parse_json_object(reply) or {}).get("evidence", []) or [])
+        except Exception:
+            continue
+
+    evidence_text = "\n".join(
+        f"- [{e.get('criterion', '')}] (قوة {e.get('strength', '')}، صفحات {e.get('pages', [])}): {e.get('evidence', '')}"
+        for e in evidence if isinstance(e, dict)
+    ) or "— لم يتم العثور على أدلة —"
+
+    # Reduce: دمج الأدلة في درجة نهائية لكل معيار
+    prompt = f"""
+أنت خبير تقييم عروض تقنية. فيما يلي أدلة مستخرجة من كامل العرض (جزءًا جزءًا) مع أرقام صفحاتها.
+ادمج الأدلة وقيّم العرض بناءً على المعايير المحددة.
+
+لكل معيار:
+- ضع درجة من 1 إلى 4 (1=ضعيف، 4=ممتاز)؛ المعيار بلا أدلة يأخذ 1
+- اكتب السؤال الذي طرحته لتقييمه (ai_question)
+- اكتب السبب المنطقي (reason)
+- اذكر أرقام الصفحات الداعمة (pages)
+
+أعد النتيجة بصيغة JSON فقط بهذا الشكل:
+{{
+  "scores": [
+    {{"criterion":"...","score":3,"ai_question":"...","reason":"...","pages":[4,5]}}
+  ],
+  "overall_comment": "ملاحظات عامة عن العرض"
+}}
+
+المعايير:
+{text_criteria}
+
+الأدلة:
+{evidence_text}
+"""
+    return chat_completion(
+        [{"role": "user", "content": prompt}],
+        model=EVAL_MODEL,
+        temperature=0.3,
+        max_tokens=3500,
+    ).strip()
+
+
+# ===========================================================
+# 🔎 وضع الاسترجاع: صفحات الأدلة لكل مجموعة معايير
+# ===========================================================
+_RETRIEVAL_PROMPT = """
+أنت خبير تقييم عروض تقنية. فيما يلي الصفحات الأكثر صلة بالمعايير المحددة من عرض فني،
+مع علامات صفحات بالشكل [[PAGE:n]] (ليست العرض كاملًا).
+
+لكل معيار:
+- ضع درجة من 1 إلى 4 (1=ضعيف، 4=ممتاز)؛ المعيار بلا دليل في هذه الصفحات يأخذ 1
+- اكتب السؤال الذي طرحته لتقييمه (ai_question)
+- اكتب السبب المنطقي (reason)
+- اذكر أرقام الصفحات الداعمة (pages)
+
+أعد النتيجة بصيغة JSON فقط بهذا الشكل:
+{{
+  "scores": [
+    {{"criterion":"...","score":3,"ai_question":"...","reason":"...","pages":[4,5]}}
+  ],
+  "overall_comment": "ملاحظات عامة عن العرض"
+}}
+
+المعايير:
+{text_criteria}
+
+الصفحات:
+{text}
+"""
+
+
+def _group_request(pages, criteria) -> dict:
+    text_criteria = "\n".join([f"- {c}" for c in criteria])
+    budget = context_budget(EVAL_MODEL, 1500, _RETRIEVAL_PROMPT.format(text_criteria=text_criteria, text=""))
+    text = fit_pages(pages, budget)
+    return {"messages": [{"role": "user", "content": _RETRIEVAL_PROMPT.format(text_criteria=text_criteria, text=text)}],
+            "model": EVAL_MODEL, "temperature": 0.3, "max_tokens": min(3500, 300 + 250 * len(criteria))}
+
+
+def _score_retrieval(doc, criteria):
+    """
+    فهرس واحد للعرض، ثم لكل مجموعة معايير استدعاء مستقل بصفحات أدلتها فقط (طلبات متزامنة).
+    يعيد نصًا بنفس شكل JSON الوضعين الآخرين (scores + overall_comment).
+    """
+    index = evidence_index(doc)
+    groups = plan_evidence(index, criteria)
+    by_page = {p["page_num"]: p for p in doc.page_dicts()}
+
+    scores, comments = [], []
+    replies = gather_completions(
+        [_group_request([by_page[n] for n in page_nums if n in by_page], group) for group, page_nums in groups],
+        return_exceptions=True,
+    )
+    check_cancelled()
+    for reply in replies:  # بترتيب المجموعات حتى يبقى التعليق العام ثابتًا
+        try:
+            data = _parse_json_object(reply) if not isinstance(reply, Exception) else None
+        except Exception:
+            data = None
+        if not data:
+            continue
+        scores.extend(s for s in data.get("scores", []) or [] if isinstance(s, dict))
+        if data.get("overall_comment"):
+            comments.append(str(data["overall_comment"]).strip())
+    if not scores:
+        raise RuntimeError("فشل تقييم كل مجموعات المعايير")
+    return json.dumps({"scores": scores, "overall_comment": " ".join(comments[:1])}, ensure_ascii=False)
+
+
+# ===========================================================
+# 🧠 تقييم عرض واحد (يعمل داخل خيط مستقل)
+# ===========================================================
+@traced("evaluate.offer")
+def _evaluate_single_offer(f, criteria_list, mode=None):
+    """
+    يقيّم عرضًا واحدًا ويعيد (row, df, notes):
+    - row: صف الترتيب {"file","overall","comment"} أو None إذا تم تخطي العرض
+    - df: جدول درجات المعايير
+    - notes: رسائل [(level, text)] تُعرض لاحقًا في الخيط الرئيسي
+    الدرجات المحفوظة لنفس المحتوى تُعاد كما هي، ولا يُرسل للنموذج إلا المعايير غير المقيّمة بعد.
+    """
+    notes = []
+    mode = mode or EVAL_MODE
+    doc = open_document(f)
+    fid = doc.fid
+    stored = load_scores(fid, criteria_list, mode)
+    missing = [c for c in criteria_list if c not in stored]
+    current_span().set(file=f.name, mode=mode, criteria=len(missing), reused=len(stored))
+    comment = load_comment(fid, mode)
+
+    if missing:
+        # استخراج النصوص
+        pages = doc.page_dicts()
+        text = doc.joined_text
+        if not text.strip():
+            notes.append(("warning", f"⚠️ لا يوجد نص يمكن تحليله في الملف: {f.name}"))
+            return None, None, notes
+
+        # ترجمة المعايير إذا لزم (نسخة خاصة بهذا العرض فقط)
+        offer_criteria, lang_detected = translate_if_needed(missing, lang=doc.language)
+        if lang_detected == "en":
+            notes.append(("info", f"🔤 العرض {f.name} باللغة الإنجليزية، تمت ترجمة المعايير."))
+        text_criteria = "\n".join([f"- {c}" for c in offer_criteria])
+
+        try:
+            if mode == "mapreduce":
+                result_text = _score_mapreduce(pages, offer_criteria)
+            elif mode == "retrieval":
+                result_text = _score_retrieval(doc, offer_criteria)
+            else:
+                result_text = _score_truncated(pages, text_criteria)
+
+            # محاولة استخراج JSON
+            data_json = _parse_json_object(result_text)
+            if data_json is None:
+                notes.append(("warning", f"⚠️ لم يُرجع النموذج JSON صالح للملف: {f.name}"))
+                if not stored:
+                    return None, None, notes
+            else:
+                new_comment = data_json.get("overall_comment")
+                df_new = _restore_criteria(_clean_scores_frame(data_json.get("scores", [])), offer_criteria, missing)
+                store_scores(fid, df_new, mode, comment=new_comment if not comment else None)
+                comment = comment or new_comment
+                for rec in json.loads(df_new.to_json(orient="records", force_ascii=False)):
+                    stored.setdefault(rec["criterion"], rec)
+
+        except Cancelled:
+            raise  # الإلغاء ليس خطأ عرض: لا صف افتراضي (ولا نتيجة تُحفظ في cache_data)
+        except Exception as e:
+            notes.append(("error", f"❌ خطأ أثناء تحليل {f.name}: {e}"))
+            if not stored:
+                # حتى لو فشل عرض واحد، نحفظ صف افتراضي
+                row = {"file": f.name, "overall": 0.0, "comment": f"خطأ أثناء التحليل: {e}"}
+                return row, pd.DataFrame(), notes
+
+        if len(missing) < len(criteria_list):
+            notes.append(("info", f"♻️ {f.name}: أُعيد استخدام {len(criteria_list) - len(missing)} درجة محفوظة، "
+                                  f"وقُيّم {len(missing)} معيار جديد."))
+
+    # الجدول بترتيب قائمة المعايير من الدرجات المحفوظة + الجديدة، ثم المتوسط
+    df = _clean_scores_frame([stored[c] for c in criteria_list if c in stored])
+    overall = float(normalize(df["score"]).mean()) if not df.empty else 0.0
+
+    row = {"file": f.name, "overall": overall, "comment": comment or "— لا توجد ملاحظات عامة —"}
+    return row, df, notes
+
+
+# ===========================================================
+# 🧠 التقييم الذكي للعروض (بالتوازي)
+# ===========================================================
+@cache_data(show_spinner=False)
+def evaluate_offers(offers, criteria_list, max_workers=None, mode=None):
+    """
+    يقيّم جميع العروض بالتوازي عبر مجموعة خيوط محدودة الحجم.
+    mode: "truncate" (بداية العرض) أو "mapreduce" (كامل العرض على أجزاء ثم تجميع)
+    أو "retrieval" (صفحات الأدلة لكل مجموعة معايير).
+    كل عرض (استخراج + كشف اللغة + استدعاء النموذج) يعمل في خيط مستقل،
+    وفشل أحد العروض لا يوقف البقية. الترتيب النهائي لا يتأثر بترتيب الانتهاء.
+    """
+    return _evaluate_offers(offers, criteria_list, max_workers, mode)
+
+
+def _evaluate_offers(offers, criteria_list, max_workers=None, mode=None):
+    """
+    جسم evaluate_offers دون st.cache_data: تستدعيه مهام الخلفية (modules.jobs) مباشرة
+    فيصل التقدم والملاحظات إلى مُبلِّغ المهمة ويُفحص الإلغاء في كل تشغيل
+    (مخزن الدرجات لكل معيار يجعل إعادة التشغيل رخيصة أصلًا).
+    """
+    results, details = [], {}
+    rep = get_reporter()
+    offers = list(offers)
+    if not offers:
+        rep.warning("⚠️ لم يتم تحليل أي عروض.")
+        return pd.DataFrame(columns=["file", "overall", "comment"]), {}
+
+    workers = max(1, min(max_workers or EVAL_MAX_WORKERS, len(offers)))
+    progress_bar = rep.progress(f"🔍 جارٍ تحليل {len(offers)} عرض...")
+    outcomes = [None] * len(offers)
+
+    with span("evaluate", offers=len(offers), criteria=len(criteria_list), mode=mode or EVAL_MODE), \
+            ThreadPoolExecutor(max_workers=workers, initializer=thread_initializer()) as pool:
+        futures = {
+            pool.submit(_evaluate_single_offer, f, criteria_list, mode): idx
+            for idx, f in enumerate(offers)
+        }
+        for done, fut in enumerate(as_completed(futures), start=1):
+            idx = futures[fut]
+            f = offers[idx]
             try:
-                response = client.chat.completions.create(
-                    model="llama-3.3-70b-versatile",
-                    temperature=0.3,
-                    max_tokens=3500,
-                    messages=[{"role": "user", "content": prompt}],
+                outcomes[idx] = fut.result()
+            except Cancelled:
+                for other in futures:
+                    other.cancel()
+                progress_bar.close()
+                raise
+            except Exception as e:
+                outcomes[idx] = (
+                    {"file": f.name, "overall": 0.0, "comment": f"خطأ أثناء التحليل: {e}"},
+                    pd.DataFrame(),
+                    [("error", f"❌ خطأ أثناء تحليل {f.name}: {e}")],
                 )
-                result_text = response.choices[0].message.content.strip()
-
-                # محاولة استخراج JSON
-                json_match = re.search(r"\{.*\}", result_text, re.S)
-                if not json_match:
-                    st.warning(f"⚠️ لم يُرجع النموذج JSON صالح للملف: {f.name}")
-                    continue
-
-                data_json = json.loads(json_match.group(0))
-                scores = data_json.get("scores", [])
-                comment = data_json.get("overall_comment", "— لا توجد ملاحظات عامة —")
-
-                df = pd.DataFrame(scores)
-                for col in ["criterion", "score", "reason", "ai_question"]:
-                    if col not in df.columns:
-                        df[col] = ""
-
-                # تنظيف الرموز الغريبة (مثل الصينية)
-                for c in ["reason", "ai_question"]:
-                    df[c] = df[c].astype(str).apply(lambda x: re.sub(r"[^\u0600-\u06FFa-zA-Z0-9\s.,()%-]", "", x))
-
-                # حساب المتوسط
-                df["score"] = pd.to_numeric(df["score"], errors="coerce").fillna(0)
-                overall = df["score"].mean() / 4
-
-                results.append({
-                    "file": f.name,
-                    "overall": overall,
-                    "comment": comment
-                })
-                details[f.name] = df
+            for level, msg in outcomes[idx][2]:
+                getattr(rep, level)(msg)
+            progress_bar.update(done / len(offers), text=f"✅ اكتمل {done}/{len(offers)}: {f.name}")
 
-            except Exception as e:
-                st.error(f"❌ خطأ أثناء تحليل {f.name}: {e}")
-                # حتى لو فشل عرض واحد، نحفظ صف افتراضي
-                results.append({
-                    "file": f.name,
-                    "overall": 0.0,
-                    "comment": f"خطأ أثناء التحليل: {e}"
-                })
-                details[f.name] = pd.DataFrame()
+    progress_bar.close()
+
+    # الحفاظ على ترتيب الرفع قبل الفرز حسب الدرجة
+    for f, (row, df, _notes) in zip(offers, outcomes):
+        if row is None:
+            continue
+        results.append(row)
+        details[f.name] = df
 
     # تحويل النتائج إلى DataFrame
     if results:
@@ -142,5 +499,5 @@ def evaluate_offers(offers, criteria_list):
         ranked = ranked.sort_values("overall", ascending=False).reset_index(drop=True)
         return ranked, details
     else:
-        st.warning("⚠️ لم يتم تحليل أي عروض.")
+        rep.warning("⚠️ لم يتم تحليل أي عروض.")
         return pd.DataFrame(columns=["file", "overall", "comment"]), {}
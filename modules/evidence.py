@@ -0,0 +1,157 @@
+# modules/evidence.py
+import os
+import threading
+from collections import OrderedDict
+
+from modules.retrieval import BM25Index, page_windows
+from modules.tracing import current_span, traced
+
+# ============================================================
+# ⚙️ الإعدادات
+# ============================================================
+EVIDENCE_CHUNK_CHARS = int(os.getenv("EVIDENCE_CHUNK_CHARS", "1500"))
+EVIDENCE_PAGES_PER_CRITERION = int(os.getenv("EVIDENCE_PAGES_PER_CRITERION", "3"))
+EVIDENCE_GROUP_SIZE = int(os.getenv("EVIDENCE_GROUP_SIZE", "4"))     # أقصى عدد معايير في استدعاء واحد
+# نموذج تضمين محلي اختياري (CPU) يُضاف إلى BM25، مثل:
+# sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2 — فارغ = BM25 فقط
+EVIDENCE_EMBED_MODEL = os.getenv("EVIDENCE_EMBED_MODEL", "")
+EVIDENCE_EMBED_WEIGHT = float(os.getenv("EVIDENCE_EMBED_WEIGHT", "0.5"))
+EVIDENCE_INDEXES = 32          # فهارس العروض المحفوظة في الذاكرة
+
+_EMBEDDER = False  # False = لم يُحمَّل بعد، None = غير متاح
+_embed_lock = threading.Lock()
+
+
+def _embedder():
+    """نموذج التضمين المحلي (يُحمَّل عند أول استخدام، وNone إن لم يُضبط أو لم تتوفر المكتبة)"""
+    global _EMBEDDER
+    if _EMBEDDER is False:
+        with _embed_lock:
+            if _EMBEDDER is False:
+                try:
+                    if not EVIDENCE_EMBED_MODEL:
+                        raise ImportError("EVIDENCE_EMBED_MODEL not set")
+                    from sentence_transformers import SentenceTransformer
+                    _EMBEDDER = SentenceTransformer(EVIDENCE_EMBED_MODEL, device="cpu")
+                except Exception:
+                    _EMBEDDER = None
+    return _EMBEDDER
+
+
+def _embed(texts: list):
+    """متجهات مطبّعة (numpy) أو None"""
+    model = _embedder()
+    if model is None or not texts:
+        return None
+    with _embed_lock:  # النموذج يستهلك كل أنوية المعالج أصلًا؛ استدعاء واحد في كل مرة
+        return model.encode(texts, batch_size=32, normalize_embeddings=True, show_progress_bar=False)
+
+
+# ============================================================
+# 🔎 فهرس الأدلة لكل عرض (يُبنى مرة واحدة لكل محتوى)
+# ============================================================
+class EvidenceIndex:
+    """
+    مقاطع صفحات العرض مع فهرس BM25 (تطبيع عربي) ومتجهات تضمين اختيارية:
+    درجة المقطع = BM25 مطبّعة إلى [0, 1] + EVIDENCE_EMBED_WEIGHT × تشابه جيب التمام.
+    """
+
+    def __init__(self, pages: list):
+        self.pages = {p["page_num"]: p.get("text", "") for p in pages}
+        self.bm25 = BM25Index(page_windows(pages, max_chars=EVIDENCE_CHUNK_CHARS))
+        self.chunks = self.bm25.chunks
+        self._vectors = False
+        self._lock = threading.Lock()
+
+    def _chunk_vectors(self):
+        if self._vectors is False:
+            with self._lock:
+                if self._vectors is False:
+                    self._vectors = _embed([c["text"] for c in self.chunks])
+        return self._vectors
+
+    def scores(self, query: str) -> list:
+        lexical = self.bm25.scores(query)
+        top = max(lexical, default=0.0)
+        out = [s / top for s in lexical] if top > 0 else [0.0] * len(lexical)
+        vectors = self._chunk_vectors()
+        if vectors is not None:
+            q = _embed([query])[0]
+            sims = vectors @ q
+            out = [s + EVIDENCE_EMBED_WEIGHT * max(0.0, float(v)) for s, v in zip(out, sims)]
+        return out
+
+    def ranked_pages(self, query: str) -> list:
+        """أرقام الصفحات مرتبة حسب أفضل مقطع فيها (الصفحات بلا أي صلة تُستبعد)"""
+        best = {}
+        for score, chunk in zip(self.scores(query), self.chunks):
+            if score > 0:
+                n = chunk["page_num"]
+                best[n] = max(best.get(n, 0.0), score)
+        return sorted(best, key=lambda n: (-best[n], n))
+
+
+_indexes = OrderedDict()
+_indexes_lock = threading.Lock()
+
+
+def evidence_index(doc) -> EvidenceIndex:
+    """فهرس الأدلة لمستند (modules.document.Document)، مرة واحدة لكل بصمة محتوى"""
+    with _indexes_lock:
+        index = _indexes.get(doc.fid)
+        if index is not None:
+            _indexes.move_to_end(doc.fid)
+            return index
+    index = EvidenceIndex(doc.page_dicts())
+    with _indexes_lock:
+        _indexes[doc.fid] = index
+        while len(_indexes) > EVIDENCE_INDEXES:
+            _indexes.popitem(last=False)
+    return index
+
+
+# ============================================================
+# 🧩 تجميع المعايير المترابطة واختيار صفحات كل مجموعة
+# ============================================================
+@traced("evidence.plan")
+def plan_evidence(index: EvidenceIndex, criteria: list, group_size: int = None,
+                  per_criterion: int = None) -> list:
+    """
+    [(معايير المجموعة, أرقام صفحات الأدلة)]:
+    المعيار ينضم إلى المجموعة التي تشاركه أكبر عدد من صفحاته الأعلى صلة (حتى group_size معايير)،
+    فتُرسل الصفحات المشتركة مرة واحدة، ثم تُضم المجموعات الصغيرة حتى group_size.
+    المعيار بلا أي تطابق يأخذ الصفحة الأولى.
+    """
+    group_size = max(1, group_size or EVIDENCE_GROUP_SIZE)
+    per_criterion = max(1, per_criterion or EVIDENCE_PAGES_PER_CRITERION)
+    first = min(index.pages) if index.pages else 1
+
+    groups = []  # [[معايير], [صفحات بترتيب الإضافة]]
+    for c in criteria:
+        pages = index.ranked_pages(c)[:per_criterion] or [first]
+        best, overlap = None, 0
+        for g in groups:
+            shared = len(set(pages) & set(g[1]))
+            if len(g[0]) < group_size and shared > overlap:
+                best, overlap = g, shared
+        if best is None:
+            groups.append([[c], list(pages)])
+        else:
+            best[0].append(c)
+            best[1].extend(p for p in pages if p not in best[1])
+
+    # المجموعات الصغيرة غير المترابطة تُضم معًا (first-fit) حتى لا يصبح كل معيار استدعاءً مستقلًا
+    packed = []
+    for g in sorted(groups, key=lambda g: len(g[0]), reverse=True):
+        target = next((p for p in packed if len(p[0]) + len(g[0]) <= group_size), None)
+        if target is None:
+            packed.append([list(g[0]), list(g[1])])
+        else:
+            target[0].extend(g[0])
+            target[1].extend(p for p in g[1] if p not in target[1])
+    order = {c: i for i, c in enumerate(criteria)}
+    groups = sorted(packed, key=lambda g: order[g[0][0]])
+
+    current_span().set(criteria=len(criteria), groups=len(groups), chunks=len(index.chunks),
+                       pages=sum(len(g[1]) for g in groups), embeddings=_embedder() is not None)
+    return [(g[0], sorted(g[1])) for g in groups]
@@ -1,58 +1,88 @@
 # modules/extractors.py
 import io
+import os
+import time
 import hashlib
-import streamlit as st
-import fitz  # PyMuPDF
-from docx import Document
-import pandas as pd
+from modules.cache import get_cache
+from modules.progress import get_reporter, cache_data
 
 # ============================================================
 # 🔧 أدوات مساعدة
 # ============================================================
 def _file_bytes(file_obj) -> bytes:
     """قراءة محتوى الملف كـ bytes دون تغيير المؤشر"""
+    if hasattr(file_obj, "getvalue"):  # BytesIO/UploadedFile: نفس الكائن دون نسخ
+        return file_obj.getvalue()
     pos = file_obj.tell()
     file_obj.seek(0)
     data = file_obj.read()
     file_obj.seek(pos)
     return data
 
-def _hash_bytes(b: bytes) -> str:
+def _hash_bytes(b) -> str:
+    """بصمة المحتوى (تقبل bytes أو memoryview دون نسخ)"""
     return hashlib.md5(b).hexdigest()
 
+
+class LocalUpload(io.BytesIO):
+    """ملف من القرص بنفس واجهة UploadedFile في Streamlit (name + read/seek/tell) للتشغيل الدفعي"""
+
+    def __init__(self, path: str):
+        with open(path, "rb") as fh:
+            super().__init__(fh.read())
+        self.name = os.path.basename(path)
+
+
 # ============================================================
-# 📄 استخراج PDF صفحة بصفحة (بدون تحريف)
+# 💾 ذاكرة الاستخراج الدائمة (حسب بصمة المحتوى)
 # ============================================================
-@st.cache_data(show_spinner=False)
-def extract_pdf_pages(name: str, data: bytes, fid: str):
+EXTRACT_CACHE_MAX_MB = int(os.getenv("EXTRACT_CACHE_MAX_MB", "1024"))
+
+def _extraction_cache():
+    return get_cache("extractions", max_mb=EXTRACT_CACHE_MAX_MB)
+
+def load_cached_extraction(kind: str, fid: str):
     """
-    يعيد قائمة صفحات:
-    [{"page_num": 1, "text": "..."} , ...]
-    باستخدام PyMuPDF لضمان الترتيب والدقة العالية.
+    قراءة نتيجة استخراج سابقة من القرص (مشتركة بين الجلسات وبعد إعادة التشغيل).
+    kind: "pdf" أو "docx" أو "ocr" ...، fid: بصمة محتوى الملف.
     """
-    pages = []
     try:
-        doc = fitz.open(stream=data, filetype="pdf")
-        for i, page in enumerate(doc):
-            text = page.get_text("text") or ""
-            pages.append({"page_num": i + 1, "text": text})
-        doc.close()
-    except Exception as e:
-        st.error(f"❌ خطأ في قراءة PDF {name}: {e}")
-    return pages
+        return _extraction_cache().get_json(f"{kind}:{fid}")
+    except Exception:
+        return None
+
+def store_extraction(kind: str, fid: str, payload: dict, name: str = "", extractor: str = ""):
+    """حفظ نتيجة الاستخراج (نص الصفحات + أعلام OCR + بيانات وصفية) على القرص"""
+    record = dict(payload)
+    record["meta"] = {
+        "name": name,
+        "extractor": extractor,
+        "page_count": len(payload.get("pages", [])),
+        "extracted_at": time.time(),
+    }
+    try:
+        _extraction_cache().set_json(f"{kind}:{fid}", record)
+    except Exception:
+        pass
 
 # ============================================================
-# 📝 استخراج DOCX (ملف وورد)
+# 📄 استخراج PDF / DOCX (عبر المستند الموحّد في modules.document)
 # ============================================================
-@st.cache_data(show_spinner=False)
-def extract_docx_text(name: str, data: bytes, fid: str):
+def extract_pdf_pages(name: str, data, fid: str = None):
+    """
+    يعيد قائمة صفحات:
+    [{"page_num": 1, "text": "..."} , ...]
+    باستخدام PyMuPDF لضمان الترتيب والدقة العالية.
+    """
+    from modules.document import open_bytes
+    return open_bytes(name, data, fid).page_dicts()
+
+
+def extract_docx_text(name: str, data, fid: str = None):
     """إرجاع نص DOCX كسلسلة نصية واحدة (سطر لكل فقرة)."""
-    try:
-        doc = Document(io.BytesIO(data))
-        return "\n".join(p.text for p in doc.paragraphs)
-    except Exception as e:
-        st.error(f"❌ خطأ في قراءة DOCX {name}: {e}")
-        return ""
+    from modules.document import open_bytes
+    texts = open_bytes(name, data, fid).texts
+    return texts[0] if texts else ""
 
 # ============================================================
 # ⚡ الدالة الرئيسية الموحّدة للاستخدام في الواجهة
@@ -62,27 +92,21 @@ def extract_text_with_pages(uploaded_file):
     يكتشف نوع الملف ويعيد محتواه بشكل موحد:
     PDF → {"type": "pdf", "pages": [{"page_num":1,"text":"..."}]}
     DOCX → {"type": "docx", "text": "..."}
+    الملف يُقرأ ويُستخرج مرة واحدة (modules.document)، والاستدعاءات التالية تعيد نفس النصوص.
     """
-    data = _file_bytes(uploaded_file)
-    fid = _hash_bytes(data)
-    name = uploaded_file.name.lower()
-
-    if name.endswith(".pdf"):
-        pages = extract_pdf_pages(name, data, fid)
-        return {"type": "pdf", "pages": pages}
-    elif name.endswith(".docx"):
-        text = extract_docx_text(name, data, fid)
-        return {"type": "docx", "text": text}
-    else:
-        st.warning("⚠️ نوع الملف غير مدعوم (يرجى رفع PDF أو DOCX فقط).")
-        return {"type": "unknown"}
+    from modules.document import open_document
+    doc = open_document(uploaded_file)
+    if doc.kind == "unknown":
+        get_reporter().warning("⚠️ نوع الملف غير مدعوم (يرجى رفع PDF أو DOCX فقط).")
+    return doc.payload()
 
 # ============================================================
 # 📊 استخراج المعايير من Excel
 # ============================================================
-@st.cache_data(show_spinner=False)
-def parse_criteria_from_excel(xfile) -> pd.DataFrame:
-    """محاولة استخراج عمود المعايير من ملف Excel"""
+@cache_data(show_spinner=False)
+def parse_criteria_from_excel(xfile):
+    """محاولة استخراج عمود المعايير من ملف Excel (يعيد DataFrame)"""
+    import pandas as pd
     try:
         xl = pd.ExcelFile(xfile)
         target = next(
@@ -116,7 +140,7 @@ def parse_criteria_from_excel(xfile) -> pd.DataFrame:
         return pd.DataFrame({"criterion": defaults})
 
     except Exception as e:
-        st.warning(f"⚠️ تعذر قراءة Excel ({e})، سيتم استخدام قائمة افتراضية.")
+        get_reporter().warning(f"⚠️ تعذر قراءة Excel ({e})، سيتم استخدام قائمة افتراضية.")
         defaults = [
             "جودة الحل المقترح","المنهجية الفنية","الخبرة السابقة","خطة التنفيذ",
             "فريق العمل","الابتكار في الحل","إدارة المشروع","الامتثال للمتطلبات",
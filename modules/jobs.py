@@ -0,0 +1,496 @@
+# modules/jobs.py
+import os
+import json
+import time
+import uuid
+import zlib
+import shutil
+import socket
+import sqlite3
+import threading
+
+from modules.cache import CACHE_DIR
+from modules.progress import (
+    Cancelled, ProgressHandle, Reporter, cancellation, check_cancelled, logger, use_reporter,
+)
+from modules.tracing import Trace, capture
+
+# ============================================================
+# ⚙️ الإعدادات
+# ============================================================
+JOBS_DB = os.getenv("JOBS_DB", os.path.join(CACHE_DIR, "jobs.sqlite"))
+JOBS_DIR = os.getenv("JOBS_DIR", os.path.join(CACHE_DIR, "jobs"))  # ملفات العروض لكل مهمة حتى انتهائها
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))                     # مهام تعمل بالتوازي في العملية
+JOB_KEEP_DAYS = float(os.getenv("JOB_KEEP_DAYS", "7"))               # عمر المهام المنتهية قبل حذفها
+JOB_MESSAGES = 50                                                    # آخر n رسالة لكل مهمة
+JOB_WRITE_INTERVAL = 0.3                                             # أقل فاصل بين كتابتَي تقدم (ثوانٍ)
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id        TEXT PRIMARY KEY,
+    kind      TEXT NOT NULL,
+    owner     TEXT,
+    status    TEXT NOT NULL,
+    params    TEXT NOT NULL,
+    progress  REAL NOT NULL DEFAULT 0,
+    message   TEXT NOT NULL DEFAULT '',
+    messages  TEXT NOT NULL DEFAULT '[]',
+    result    BLOB,
+    error     TEXT,
+    stats     TEXT,
+    cancel    INTEGER NOT NULL DEFAULT 0,
+    worker    TEXT,
+    created   REAL NOT NULL,
+    started   REAL,
+    finished  REAL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, created);
+CREATE INDEX IF NOT EXISTS idx_jobs_owner ON jobs(owner, created);
+"""
+
+_STATUS_COLUMNS = "id, kind, owner, status, progress, message, messages, error, stats, cancel, created, started, finished"
+
+
+# ============================================================
+# 🧰 أنواع المهام (كل نوع دالة تستقبل المُعاملات وملفات العروض وتعيد نتيجة JSON)
+# ============================================================
+JOB_KINDS = {}
+
+
+def job_kind(name: str):
+    """تسجيل دالة تنفيذ لنوع مهمة: fn(ctx: JobContext, **params) -> نتيجة قابلة للتحويل إلى JSON"""
+    def wrap(fn):
+        JOB_KINDS[name] = fn
+        return fn
+    return wrap
+
+
+@job_kind("evaluate")
+def _run_evaluate(ctx, criteria, mode=None):
+    # دون st.cache_data: لا سياق Streamlit في خيط المهمة، والتقدم والإلغاء يجب أن يعملا في كل تشغيل
+    from modules.evaluator import _evaluate_offers
+    from modules.utils import frame_records
+    ranked, details = _evaluate_offers(ctx.offers(), criteria, mode=mode)
+    return {
+        "criteria": list(criteria),
+        "ranking": frame_records(ranked),
+        "details": {name: frame_records(df) for name, df in details.items()},
+    }
+
+
+@job_kind("sections")
+def _run_sections(ctx):
+    from modules.document import open_document
+    from modules.analyzer import iter_sections_analysis
+    offers = ctx.offers()
+    payloads = {}
+    for i, f in enumerate(offers):
+        ctx.progress(0.1 * i / len(offers), f"📖 قراءة {f.name}...")
+        try:
+            doc = open_document(f)
+            doc.texts  # الاستخراج هنا ليظهر تقدم القراءة منفصلًا عن التحليل
+            payloads[f.name] = doc
+        except Exception as e:
+            ctx.reporter.error(f"⚠️ خطأ أثناء قراءة {f.name}: {e}")
+
+    out, ratios = {name: [] for name in payloads}, {name: 0.0 for name in payloads}
+    for name, sections, done, total in iter_sections_analysis(payloads):
+        out[name] = sections
+        ratios[name] = done / total if total else 1.0
+        ctx.progress(0.1 + 0.9 * sum(ratios.values()) / max(1, len(ratios)),
+                     f"📂 {name}: الجزء {done}/{total} — {len(sections)} قسم")
+        if done >= total:
+            ctx.reporter.success(f"✅ تم تحليل {name} بنجاح ({len(sections)} قسم).")
+    return out
+
+
+@job_kind("suggest")
+def _run_suggest(ctx, criteria, limit=5):
+    from modules.document import open_document
+    from modules.analyzer import suggest_criteria_table
+    offers_pages = {f.name: open_document(f).page_dicts() for f in ctx.offers()}
+    ctx.progress(0.5, "🤖 جاري اقتراح معايير جديدة...")
+    check_cancelled()
+    return suggest_criteria_table(offers_pages, criteria, limit)
+
+
+# ============================================================
+# 📣 مُبلِّغ المهمة: الرسائل والتقدم يُكتبان في جدول المهام بدل الواجهة
+# ============================================================
+class _JobProgress(ProgressHandle):
+    def __init__(self, reporter, text=None):
+        self._reporter = reporter
+        if text:
+            reporter.caption(text)
+
+    def update(self, fraction, text=None):
+        self._reporter.set_progress(fraction, text)
+
+
+class JobReporter(Reporter):
+    """
+    Reporter لمهمة خلفية: كل رسالة تُحفظ في سجل المهمة (آخر JOB_MESSAGES رسالة)
+    وكل تحديث تقدم يُكتب في الجدول (بحد أقصى مرة كل JOB_WRITE_INTERVAL).
+    كل استدعاء نقطة فحص للإلغاء.
+    """
+
+    def __init__(self, queue, job_id: str, event: threading.Event):
+        self.queue = queue
+        self.job_id = job_id
+        self.event = event
+        self.messages = []
+        self.fraction = 0.0
+        self.text = ""
+        self._lock = threading.Lock()
+        self._last_write = 0.0
+
+    def _flush(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_write < JOB_WRITE_INTERVAL:
+            return
+        self._last_write = now
+        if self.queue._write_progress(self.job_id, self.fraction, self.text, self.messages):
+            self.event.set()  # طلب إلغاء من عملية أو جلسة أخرى
+
+    def _log(self, level, msg):
+        with self._lock:
+            self.messages = (self.messages + [[level, str(msg)]])[-JOB_MESSAGES:]
+            self.text = str(msg)
+            self._flush(force=level in ("error", "warning", "success"))
+        self.check()
+
+    def info(self, msg):
+        self._log("info", msg)
+
+    def success(self, msg):
+        self._log("success", msg)
+
+    def warning(self, msg):
+        self._log("warning", msg)
+
+    def error(self, msg):
+        self._log("error", msg)
+
+    def caption(self, msg):
+        self._log("caption", msg)
+
+    def set_progress(self, fraction, text=None):
+        with self._lock:
+            self.fraction = min(max(float(fraction), self.fraction), 1.0)
+            if text:
+                self.text = text
+            self._flush()
+        self.check()
+
+    def check(self):
+        if self.event.is_set():
+            raise Cancelled("تم إلغاء المهمة")
+
+    def progress(self, text=None):
+        return _JobProgress(self, text)
+
+
+class JobContext:
+    """ما تتلقاه دالة نوع المهمة: ملفات العروض والمُبلِّغ"""
+
+    def __init__(self, job_id: str, files: list, reporter: JobReporter):
+        self.job_id = job_id
+        self.files = files
+        self.reporter = reporter
+
+    def offers(self) -> list:
+        from modules.extractors import LocalUpload
+        return [LocalUpload(path) for path in self.files]
+
+    def progress(self, fraction: float, text: str = None):
+        self.reporter.set_progress(fraction, text)
+
+
+# ============================================================
+# 🏭 طابور المهام: جدول SQLite دائم + خيوط عمل داخل العملية
+# ============================================================
+def _pack(obj) -> bytes:
+    return zlib.compress(json.dumps(obj, ensure_ascii=False, default=str).encode("utf-8"), 6)
+
+
+def _unpack(blob):
+    return None if blob is None else json.loads(zlib.decompress(blob).decode("utf-8"))
+
+
+def _worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _worker_alive(worker: str) -> bool:
+    """هل ما زالت العملية التي استلمت المهمة حية؟ (على نفس الجهاز فقط، وإلا نفترض ذلك)"""
+    host, _, pid = (worker or "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return bool(worker)
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class JobQueue:
+    """
+    طابور مهام خلفية مستقل عن دورة إعادة تشغيل سكربت Streamlit:
+    - submit(kind, params, files) يحفظ المهمة وملفاتها ويعيد معرّفها فورًا
+    - status(id) / result(id) / cancel(id) / jobs(owner) للاستعلام من أي جلسة
+    - خيوط العمل تستلم أقدم مهمة منتظرة، والمهام التي انقطعت بتوقف العملية تعود للطابور عند البدء
+    النتائج تُخزَّن مضغوطة (JSON) وتبقى JOB_KEEP_DAYS يومًا.
+    """
+
+    def __init__(self, path: str = JOBS_DB, workers: int = JOB_WORKERS, spool_dir: str = JOBS_DIR):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.spool_dir = spool_dir
+        self.worker = _worker_id()
+        self._lock = threading.Lock()
+        self._wake = threading.Condition()
+        self._events = {}   # معرّف مهمة جارية → حدث الإلغاء
+        self._traces = {}   # معرّف مهمة → سجل قياس الجلسة التي أرسلتها (داخل نفس العملية)
+        self._stopped = False
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript(_SCHEMA)
+            self._conn.commit()
+        self._recover()
+        self.purge()
+        self._threads = [
+            threading.Thread(target=self._work, name=f"job-worker-{i + 1}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for t in self._threads:
+            t.start()
+
+    # ---------------- الإرسال والاستعلام ----------------
+    def submit(self, kind: str, params: dict = None, files=None, owner: str = None, trace: Trace = None) -> str:
+        """
+        files: قائمة (اسم، bytes) أو كائنات ملفات (name + getvalue/read) — تُنسخ إلى مجلد المهمة
+        حتى لا تعتمد المهمة على كائنات الجلسة. يعيد معرّف المهمة.
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(f"unknown job kind: {kind}")
+        job_id = uuid.uuid4().hex
+        params = dict(params or {})
+        params["_files"] = self._spool(job_id, files or [])
+        if trace is not None:
+            self._traces[job_id] = trace
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, kind, owner, status, params, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, kind, owner, QUEUED, json.dumps(params, ensure_ascii=False), time.time()),
+            )
+            self._conn.commit()
+        with self._wake:
+            self._wake.notify()
+        return job_id
+
+    def _spool(self, job_id: str, files) -> list:
+        if not files:
+            return []
+        folder = os.path.join(self.spool_dir, job_id)
+        os.makedirs(folder, exist_ok=True)
+        paths = []
+        for i, f in enumerate(files):
+            if isinstance(f, (tuple, list)):
+                name, data = f
+            else:
+                name = f.name
+                data = f.getvalue() if hasattr(f, "getvalue") else f.read()
+            # بادئة رقمية تحفظ ترتيب الرفع وتمنع تصادم الأسماء، مع إبقاء الاسم الأصلي بعدها
+            path = os.path.join(folder, f"{i:03d}", os.path.basename(name))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as fh:
+                fh.write(bytes(data))
+            paths.append(path)
+        return paths
+
+    def status(self, job_id: str) -> dict:
+        """حالة المهمة (بدون النتيجة) أو None إن لم توجد"""
+        with self._lock:
+            row = self._conn.execute(f"SELECT {_STATUS_COLUMNS} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def result(self, job_id: str):
+        """نتيجة مهمة منتهية بنجاح (أو None)"""
+        with self._lock:
+            row = self._conn.execute("SELECT status, result FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or row[0] != DONE:
+            return None
+        return _unpack(row[1])
+
+    def jobs(self, owner: str = None, limit: int = 20) -> list:
+        """أحدث المهام (لمالك معيّن أو للجميع)"""
+        sql = f"SELECT {_STATUS_COLUMNS} FROM jobs"
+        args = ()
+        if owner is not None:
+            sql += " WHERE owner = ?"
+            args = (owner,)
+        sql += " ORDER BY created DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(sql, args + (limit,)).fetchall()
+        return [self._row(r) for r in rows]
+
+    def cancel(self, job_id: str) -> bool:
+        """المهمة المنتظرة تُلغى فورًا، والجارية تتوقف عند أول نقطة فحص؛ يعيد False إن كانت منتهية"""
+        with self._lock:
+            queued = self._conn.execute(
+                "UPDATE jobs SET status = ?, cancel = 1, finished = ? WHERE id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, QUEUED),
+            ).rowcount
+            running = 0 if queued else self._conn.execute(
+                "UPDATE jobs SET cancel = 1 WHERE id = ? AND status = ?", (job_id, RUNNING)
+            ).rowcount
+            self._conn.commit()
+        if queued:
+            self._cleanup(job_id)
+        event = self._events.get(job_id)
+        if event is not None:
+            event.set()
+        return bool(queued or running)
+
+    @staticmethod
+    def _row(row) -> dict:
+        keys = [c.strip() for c in _STATUS_COLUMNS.split(",")]
+        job = dict(zip(keys, row))
+        job["messages"] = json.loads(job["messages"] or "[]")
+        job["stats"] = json.loads(job["stats"]) if job["stats"] else None
+        job["cancel"] = bool(job["cancel"])
+        end = job["finished"] or time.time()
+        job["elapsed_s"] = round(end - job["started"], 1) if job["started"] else 0.0
+        return job
+
+    # ---------------- خيوط العمل ----------------
+    def _claim(self):
+        """استلام أقدم مهمة منتظرة (تحديث شرطي واحد يمنع استلامها مرتين عبر العمليات)"""
+        with self._lock:
+            while True:
+                row = self._conn.execute(
+                    "SELECT id, kind, params FROM jobs WHERE status = ? ORDER BY created LIMIT 1", (QUEUED,)
+                ).fetchone()
+                if row is None:
+                    return None
+                cur = self._conn.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, started = ?, progress = 0 WHERE id = ? AND status = ?",
+                    (RUNNING, self.worker, time.time(), row[0], QUEUED),
+                )
+                self._conn.commit()
+                if cur.rowcount:
+                    return row
+
+    def _work(self):
+        while not self._stopped:
+            row = self._claim()
+            if row is None:
+                with self._wake:
+                    self._wake.wait(timeout=2.0)
+                continue
+            self._run(*row)
+
+    def _run(self, job_id: str, kind: str, params_json: str):
+        params = json.loads(params_json)
+        files = params.pop("_files", [])
+        event = self._events.setdefault(job_id, threading.Event())
+        reporter = JobReporter(self, job_id, event)
+        trace = self._traces.pop(job_id, None) or Trace()
+        status, result, error = DONE, None, None
+        started = time.monotonic()
+        reporter._flush(force=True)  # يلتقط طلب إلغاء وصل بين الاستلام والبدء
+        try:
+            with use_reporter(reporter), cancellation(event), capture(trace=trace):
+                check_cancelled()
+                result = JOB_KINDS[kind](JobContext(job_id, files, reporter), **params)
+            if event.is_set():
+                status = CANCELLED
+        except Cancelled:
+            status = CANCELLED
+        except Exception as e:
+            logger.exception("job %s (%s) failed", job_id, kind)
+            status, error = FAILED, f"{type(e).__name__}: {e}"
+        finally:
+            self._events.pop(job_id, None)
+
+        stats = {"seconds": round(time.monotonic() - started, 3), "stages": trace.summary()[:10]}
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, progress = ?, message = ?, messages = ?, result = ?, error = ?, "
+                "stats = ?, finished = ? WHERE id = ?",
+                (status, 1.0 if status == DONE else reporter.fraction, reporter.text,
+                 json.dumps(reporter.messages, ensure_ascii=False),
+                 _pack(result) if status == DONE else None, error,
+                 json.dumps(stats, ensure_ascii=False, default=str), time.time(), job_id),
+            )
+            self._conn.commit()
+        self._cleanup(job_id)
+
+    def _write_progress(self, job_id: str, fraction: float, text: str, messages: list) -> bool:
+        """يكتب التقدم ويعيد True إن طُلب إلغاء المهمة"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET progress = ?, message = ?, messages = ? WHERE id = ?",
+                (fraction, text or "", json.dumps(messages, ensure_ascii=False), job_id),
+            )
+            self._conn.commit()
+            row = self._conn.execute("SELECT cancel FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row[0])
+
+    # ---------------- الصيانة ----------------
+    def _recover(self):
+        """المهام الجارية لعملية توقفت (إعادة تشغيل الخادم مثلًا) تعود للطابور؛ درجات المعايير المحفوظة تجعل إعادتها سريعة"""
+        with self._lock:
+            rows = self._conn.execute("SELECT id, worker FROM jobs WHERE status = ?", (RUNNING,)).fetchall()
+            for job_id, worker in rows:
+                if not _worker_alive(worker):
+                    self._conn.execute(
+                        "UPDATE jobs SET status = ?, worker = NULL, started = NULL WHERE id = ?", (QUEUED, job_id)
+                    )
+            self._conn.commit()
+
+    def _cleanup(self, job_id: str):
+        shutil.rmtree(os.path.join(self.spool_dir, job_id), ignore_errors=True)
+
+    def purge(self, older_than_days: float = JOB_KEEP_DAYS) -> int:
+        """حذف المهام المنتهية الأقدم من المدة المحددة"""
+        cutoff = time.time() - older_than_days * 86400
+        with self._lock:
+            ids = [r[0] for r in self._conn.execute(
+                "SELECT id FROM jobs WHERE finished IS NOT NULL AND finished < ?", (cutoff,)
+            ).fetchall()]
+            self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(i,) for i in ids])
+            self._conn.commit()
+        for job_id in ids:
+            self._cleanup(job_id)
+        return len(ids)
+
+    def shutdown(self, wait: bool = False):
+        """إيقاف استلام مهام جديدة (المهام الجارية تكمل ما لم تُلغَ)"""
+        self._stopped = True
+        with self._wake:
+            self._wake.notify_all()
+        if wait:
+            for t in self._threads:
+                t.join()
+
+
+# ============================================================
+# 🔑 طابور مشترك داخل العملية (يبقى عبر إعادة تشغيل سكربت Streamlit)
+# ============================================================
+_queue = None
+_queue_lock = threading.Lock()
+
+
+def get_queue() -> JobQueue:
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            _queue = JobQueue()
+        return _queue
@@ -0,0 +1,510 @@
+# modules/llm.py
+import os
+import json
+import time
+import asyncio
+import contextvars
+import concurrent.futures
+import heapq
+import random
+import hashlib
+import itertools
+import threading
+from collections import deque
+from dotenv import load_dotenv
+from modules.cache import get_cache
+from modules.budget import LLM_TPM, count_message_tokens, count_tokens
+from modules.tracing import current_span, span, start_span, traced
+from modules.progress import check_cancelled
+
+# تحميل مفتاح Groq من .env
+load_dotenv()
+
+# ============================================================
+# ⚙️ الإعدادات العامة لاستدعاءات النموذج
+# ============================================================
+DEFAULT_MODEL = "llama-3.3-70b-versatile"
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1") != "0"
+LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600)))  # أسبوع
+LLM_CACHE_MAX_MB = int(os.getenv("LLM_CACHE_MAX_MB", "256"))
+
+# حصة الحساب: طلبات/دقيقة (تُضبط حسب خطة Groq)؛ رموز/دقيقة LLM_TPM من modules.budget
+LLM_RPM = int(os.getenv("LLM_RPM", "30"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "6"))
+LLM_BACKOFF_BASE = float(os.getenv("LLM_BACKOFF_BASE", "1.0"))   # ثوانٍ
+LLM_BACKOFF_MAX = float(os.getenv("LLM_BACKOFF_MAX", "60"))
+
+# مجمع اتصالات HTTP واحد للعملية (keep-alive): لا مصافحة TLS جديدة لكل استدعاء
+LLM_MAX_CONNECTIONS = int(os.getenv("LLM_MAX_CONNECTIONS", "32"))
+LLM_KEEPALIVE_S = float(os.getenv("LLM_KEEPALIVE_S", "60"))
+LLM_TIMEOUT_S = float(os.getenv("LLM_TIMEOUT_S", "120"))
+
+# الأولوية: الأصغر يُخدم أولًا (أسئلة المحادثة قبل التقييم الدفعي)
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+_client = None
+_async_client = None
+_loop = None
+_client_lock = threading.Lock()
+
+
+# ============================================================
+# ☁️ عميل Groq مشترك (يُنشأ عند أول استدعاء)
+# ============================================================
+def _api_key() -> str:
+    api_key = os.getenv("GROQ_API_KEY")
+    if not api_key:
+        raise RuntimeError("⚠️ GROQ_API_KEY غير مضبوط.")
+    return api_key
+
+
+def _http_limits():
+    import httpx
+    return httpx.Limits(max_connections=LLM_MAX_CONNECTIONS,
+                        max_keepalive_connections=LLM_MAX_CONNECTIONS,
+                        keepalive_expiry=LLM_KEEPALIVE_S)
+
+
+def get_client():
+    """عميل Groq الوحيد في العملية (المكتبة نفسها تُستورد عند أول استدعاء فعلي)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            import httpx
+            from groq import Groq
+            # إعادة المحاولة تتم في البوابة أدناه (مع مراعاة الحصة) وليس داخل الـ SDK
+            _client = Groq(api_key=_api_key(), max_retries=0,
+                           http_client=httpx.Client(limits=_http_limits(), timeout=LLM_TIMEOUT_S))
+        return _client
+
+
+def _event_loop():
+    """حلقة asyncio واحدة في خيط خلفي تخدم كل الاستدعاءات غير المتزامنة في العملية"""
+    global _loop
+    with _client_lock:
+        if _loop is None or _loop.is_closed():
+            loop = asyncio.new_event_loop()
+            threading.Thread(target=loop.run_forever, name="llm-async", daemon=True).start()
+            _loop = loop
+        return _loop
+
+
+def get_async_client():
+    """عميل AsyncGroq الوحيد (مرتبط بحلقة _event_loop؛ يُستخدم من داخلها فقط)"""
+    global _async_client
+    with _client_lock:
+        if _async_client is None:
+            import httpx
+            from groq import AsyncGroq
+            _async_client = AsyncGroq(api_key=_api_key(), max_retries=0,
+                                      http_client=httpx.AsyncClient(limits=_http_limits(), timeout=LLM_TIMEOUT_S))
+        return _async_client
+
+
+# ============================================================
+# 💾 ذاكرة الردود (النموذج + الرسائل + المعاملات)
+# ============================================================
+def _cache():
+    return get_cache("llm_responses", max_mb=LLM_CACHE_MAX_MB, ttl=LLM_CACHE_TTL)
+
+
+def cache_key(model: str, messages: list, temperature=None, max_tokens=None) -> str:
+    """مفتاح ثابت: اسم النموذج + بصمة الرسائل + درجة الحرارة + الحد الأقصى للرموز"""
+    msg_hash = hashlib.sha256(
+        json.dumps(messages, ensure_ascii=False, sort_keys=True).encode("utf-8")
+    ).hexdigest()
+    return f"{model}|{msg_hash}|t={temperature}|m={max_tokens}"
+
+
+def cache_stats() -> dict:
+    """عدد الإصابات/الإخفاقات وحجم ذاكرة الردود"""
+    return _cache().stats()
+
+
+# ============================================================
+# 🪣 محدِّد المعدل: دلوا رموز (طلبات/دقيقة + رموز/دقيقة) مع طابور أولوية
+# ============================================================
+class TokenBucket:
+    def __init__(self, per_minute: float):
+        self.capacity = float(max(1, per_minute))
+        self.rate = self.capacity / 60.0  # تعبئة لكل ثانية
+        self.level = self.capacity
+        self.stamp = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.stamp) * self.rate)
+        self.stamp = now
+
+    def wait_time(self, amount: float) -> float:
+        return max(0.0, (min(amount, self.capacity) - self.level) / self.rate)
+
+
+class RateLimiter:
+    """
+    محدِّد على مستوى العملية لكل استدعاءات Groq:
+    - لا يمر الطلب إلا إذا توفر في الدلوين (الطلبات والرموز) ما يكفيه
+    - الطلبات المنتظرة تُخدم حسب الأولوية ثم حسب ترتيب الوصول
+    - عند 429 يُوقف الجميع حتى انقضاء Retry-After
+    """
+
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self._cond = threading.Condition()
+        self._queue = []
+        self._seq = itertools.count()
+        self._blocked_until = 0.0
+
+    def acquire(self, tokens: int, priority: int = PRIORITY_BATCH):
+        tokens = min(float(tokens), self.tokens.capacity)
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._queue, ticket)
+            try:
+                while True:
+                    now = time.monotonic()
+                    self.requests.refill(now)
+                    self.tokens.refill(now)
+                    if self._queue[0] == ticket:
+                        wait = max(
+                            self._blocked_until - now,
+                            self.requests.wait_time(1),
+                            self.tokens.wait_time(tokens),
+                        )
+                        if wait <= 0:
+                            self.requests.level -= 1
+                            self.tokens.level -= tokens
+                            return
+                        self._cond.wait(timeout=wait)
+                    else:
+                        self._cond.wait(timeout=1.0)
+            finally:
+                self._queue.remove(ticket)
+                heapq.heapify(self._queue)
+                self._cond.notify_all()
+
+    def try_acquire(self, tokens: int, priority: int = PRIORITY_BATCH) -> float:
+        """
+        نسخة غير حاجبة من acquire للمسار غير المتزامن: 0 = تم الحجز، وإلا ثوانٍ مقترحة قبل المحاولة مجددًا.
+        الخيوط المنتظرة بأولوية مساوية أو أعلى تُخدم أولًا.
+        """
+        tokens = min(float(tokens), self.tokens.capacity)
+        with self._cond:
+            now = time.monotonic()
+            self.requests.refill(now)
+            self.tokens.refill(now)
+            if self._queue and self._queue[0][0] <= priority:
+                return 0.05
+            wait = max(
+                self._blocked_until - now,
+                self.requests.wait_time(1),
+                self.tokens.wait_time(tokens),
+            )
+            if wait <= 0:
+                self.requests.level -= 1
+                self.tokens.level -= tokens
+                return 0.0
+            return wait
+
+    def settle(self, reserved: float, actual: float):
+        """تصحيح دلو الرموز بعد معرفة الاستهلاك الفعلي (استرداد أو خصم الفرق)"""
+        with self._cond:
+            self.tokens.level = min(self.tokens.capacity, self.tokens.level + reserved - actual)
+            self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        with self._cond:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._cond.notify_all()
+
+
+limiter = RateLimiter(LLM_RPM, LLM_TPM)
+
+
+def _estimate_request_tokens(messages, max_tokens) -> int:
+    return count_message_tokens(messages) + (max_tokens or 1000)
+
+
+# ============================================================
+# 📈 سجل الاستهلاك الفعلي لكل استدعاء (رموز المطالبة/الرد والزمن)
+# ============================================================
+USAGE_HISTORY = 500  # آخر n استدعاء محفوظة في الذاكرة
+_usage_log = deque(maxlen=USAGE_HISTORY)
+_usage_totals = {"calls": 0, "cached": 0, "prompt_tokens": 0, "completion_tokens": 0, "seconds": 0.0}
+_usage_lock = threading.Lock()
+
+
+def _record_usage(model, messages, content, usage=None, cached=False, seconds=0.0, sp=None):
+    """يسجل الاستهلاك الفعلي من Groq، أو تقديرًا محليًا عند الرد من الذاكرة (وفي مقطع القياس إن وُجد)"""
+    prompt = getattr(usage, "prompt_tokens", None) or count_message_tokens(messages)
+    completion = getattr(usage, "completion_tokens", None) or count_tokens(content)
+    entry = {
+        "model": model, "cached": cached, "prompt_tokens": prompt,
+        "completion_tokens": completion, "seconds": round(seconds, 3), "at": time.time(),
+    }
+    if sp is not None:
+        sp.set(model=model, cached=cached, prompt_tokens=prompt, completion_tokens=completion)
+    with _usage_lock:
+        _usage_log.append(entry)
+        _usage_totals["calls"] += 1
+        _usage_totals["cached"] += int(cached)
+        if not cached:  # الردود من الذاكرة لا تستهلك من الحصة
+            _usage_totals["prompt_tokens"] += prompt
+            _usage_totals["completion_tokens"] += completion
+            _usage_totals["seconds"] += seconds
+
+
+def usage_stats(recent: int = 20) -> dict:
+    """إجمالي الاستهلاك منذ بدء العملية + آخر الاستدعاءات"""
+    with _usage_lock:
+        return {**_usage_totals, "recent": list(_usage_log)[-recent:]}
+
+
+def _retry_after(exc) -> float:
+    response = getattr(exc, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def _is_retryable(exc) -> bool:
+    import groq
+    if isinstance(exc, (groq.RateLimitError, groq.APIConnectionError, groq.APITimeoutError)):
+        return True
+    status = getattr(exc, "status_code", None)
+    return isinstance(exc, groq.APIStatusError) and status is not None and status >= 500
+
+
+def _backoff(attempt: int, retry_after: float) -> float:
+    """تراجع أُسّي مع تشويش عشوائي، ولا يقل عن Retry-After إن وُجد"""
+    delay = min(LLM_BACKOFF_MAX, LLM_BACKOFF_BASE * (2 ** attempt))
+    return max(retry_after, random.uniform(delay / 2, delay))
+
+
+def _create_with_retry(kwargs: dict, priority: int):
+    reserved = _estimate_request_tokens(kwargs["messages"], kwargs.get("max_tokens"))
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        check_cancelled()  # لا طلبات جديدة لمهمة أُلغيت
+        limiter.acquire(reserved, priority)
+        try:
+            resp = get_client().chat.completions.create(**kwargs)
+        except Exception as e:
+            if attempt >= LLM_MAX_RETRIES or not _is_retryable(e):
+                raise
+            wait = _backoff(attempt, _retry_after(e))
+            if _retry_after(e):
+                limiter.pause(wait)
+            time.sleep(wait)
+            continue
+        usage = getattr(resp, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None):
+            limiter.settle(min(reserved, limiter.tokens.capacity), usage.total_tokens)
+        return resp
+
+
+async def _acreate_with_retry(kwargs: dict, priority: int):
+    """نفس سياسة _create_with_retry داخل الحلقة: انتظار الحصة والتراجع بـ asyncio.sleep دون حجز خيط"""
+    reserved = _estimate_request_tokens(kwargs["messages"], kwargs.get("max_tokens"))
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        check_cancelled()
+        while True:
+            wait = limiter.try_acquire(reserved, priority)
+            if wait <= 0:
+                break
+            await asyncio.sleep(min(wait, 1.0))
+            check_cancelled()
+        try:
+            resp = await get_async_client().chat.completions.create(**kwargs)
+        except Exception as e:
+            if attempt >= LLM_MAX_RETRIES or not _is_retryable(e):
+                raise
+            wait = _backoff(attempt, _retry_after(e))
+            if _retry_after(e):
+                limiter.pause(wait)
+            await asyncio.sleep(wait)
+            continue
+        usage = getattr(resp, "usage", None)
+        if usage is not None and getattr(usage, "total_tokens", None):
+            limiter.settle(min(reserved, limiter.tokens.capacity), usage.total_tokens)
+        return resp
+
+
+# ============================================================
+# 🧠 طبقة الاستدعاء الموحّدة لكل الإكمالات
+# ============================================================
+def _request(messages, model, temperature, max_tokens, use_cache):
+    """(النموذج، المفتاح، استخدام الذاكرة، معاملات الطلب) المشتركة بين المسارين"""
+    model = model or DEFAULT_MODEL
+    kwargs = {"model": model, "messages": messages, "temperature": temperature}
+    if max_tokens is not None:
+        kwargs["max_tokens"] = max_tokens
+    return model, cache_key(model, messages, temperature, max_tokens), use_cache and LLM_CACHE_ENABLED, kwargs
+
+
+def _from_cache(key, model, messages, sp):
+    hit = _cache().get_json(key)
+    if hit is None:
+        return None
+    _record_usage(model, messages, hit.get("content", ""), cached=True, sp=sp)
+    return hit.get("content", "")
+
+
+def _finish(resp, key, model, messages, use_cache, started, sp) -> str:
+    content = resp.choices[0].message.content or ""
+    _record_usage(model, messages, content, getattr(resp, "usage", None),
+                  seconds=time.monotonic() - started, sp=sp)
+    if use_cache and content.strip():
+        _cache().set_json(key, {"model": model, "content": content})
+    return content
+
+
+@traced("llm")
+def chat_completion(messages, model=None, temperature=0.25, max_tokens=None, use_cache=True,
+                    priority=PRIORITY_BATCH) -> str:
+    """
+    يرسل الرسائل إلى Groq ويعيد نص الرد.
+    الردود تُخزَّن على القرص، فإعادة نفس الطلب بنفس المدخلات تعود فورًا دون استدعاء الشبكة.
+    كل استدعاء يمر عبر محدِّد المعدل المشترك ويُعاد تلقائيًا عند 429 وأخطاء الخادم.
+    """
+    model, key, use_cache, kwargs = _request(messages, model, temperature, max_tokens, use_cache)
+    if use_cache:
+        hit = _from_cache(key, model, messages, current_span())
+        if hit is not None:
+            return hit
+    started = time.monotonic()
+    resp = _create_with_retry(kwargs, priority)
+    return _finish(resp, key, model, messages, use_cache, started, current_span())
+
+
+async def achat_completion(messages, model=None, temperature=0.25, max_tokens=None, use_cache=True,
+                           priority=PRIORITY_BATCH) -> str:
+    """
+    نفس chat_completion (الذاكرة والحصة وإعادة المحاولة) عبر AsyncGroq ومجمع الاتصالات المشترك.
+    قراءة الذاكرة وكتابتها (SQLite) تجري في خيط منفصل حتى لا تُوقف حلقة llm-async المشتركة.
+    """
+    with span("llm", mode="async") as sp:
+        model, key, use_cache, kwargs = _request(messages, model, temperature, max_tokens, use_cache)
+        if use_cache:
+            hit = await asyncio.to_thread(_from_cache, key, model, messages, sp)
+            if hit is not None:
+                return hit
+        started = time.monotonic()
+        resp = await _acreate_with_retry(kwargs, priority)
+        return await asyncio.to_thread(_finish, resp, key, model, messages, use_cache, started, sp)
+
+
+# ============================================================
+# 🚀 دفعات غير متزامنة: عشرات الطلبات المتزامنة دون خيوط إضافية
+# ============================================================
+def run_async(coro) -> concurrent.futures.Future:
+    """
+    يشغّل coroutine على حلقة العملية ويعيد Future عاديًا (يُنتظر من أي خيط).
+    المهمة ترث سياق المستدعي (مقطع القياس الحالي، المُبلِّغ، إشارة الإلغاء).
+    """
+    loop = _event_loop()
+    if threading.current_thread().name == "llm-async":
+        coro.close()
+        raise RuntimeError("run_async cannot be awaited from the LLM event loop itself")
+    fut = concurrent.futures.Future()
+
+    def _done(task):
+        try:
+            if task.cancelled():
+                fut.cancel()
+            elif task.exception() is not None:
+                fut.set_exception(task.exception())
+            else:
+                fut.set_result(task.result())
+        except concurrent.futures.InvalidStateError:
+            pass  # أُلغي Future من المستدعي أثناء الاكتمال
+
+    def _start():
+        if fut.cancelled():
+            coro.close()
+            return
+        task = loop.create_task(coro)
+        task.add_done_callback(_done)
+        # إلغاء Future من أي خيط يلغي الطلب نفسه داخل الحلقة
+        fut.add_done_callback(lambda f: f.cancelled() and loop.call_soon_threadsafe(task.cancel))
+
+    loop.call_soon_threadsafe(_start, context=contextvars.copy_context())
+    return fut
+
+
+def submit_completion(messages, **kwargs) -> concurrent.futures.Future:
+    """إرسال طلب واحد دون انتظار؛ يُجمع مع غيره عبر concurrent.futures.as_completed أو .result()"""
+    return run_async(achat_completion(messages, **kwargs))
+
+
+def gather_completions(requests: list, return_exceptions: bool = False) -> list:
+    """
+    مثل asyncio.gather لطلبات متزامنة: requests = [{"messages": [...], "model": ..., "max_tokens": ...}, ...]
+    يعيد نصوص الردود بنفس الترتيب؛ مع return_exceptions يوضع الاستثناء مكان الرد الفاشل بدل رفعه.
+    """
+    futures = [submit_completion(**req) for req in requests]
+    out = []
+    for fut in futures:
+        try:
+            out.append(fut.result())
+        except Exception as e:
+            if not return_exceptions:
+                for other in futures:
+                    other.cancel()
+                raise
+            out.append(e)
+    return out
+
+
+# ============================================================
+# 🌊 إكمال متدفق (رمزًا برمز) لعرض الرد تدريجيًا
+# ============================================================
+def stream_chat_completion(messages, model=None, temperature=0.25, max_tokens=None, use_cache=True,
+                           priority=PRIORITY_INTERACTIVE):
+    """
+    مولّد يُنتج أجزاء نص الرد فور وصولها من Groq.
+    عند وجود الرد في الذاكرة يُنتج كاملًا دفعة واحدة، وبعد اكتمال البث يُحفظ في الذاكرة.
+    """
+    model = model or DEFAULT_MODEL
+    use_cache = use_cache and LLM_CACHE_ENABLED
+    key = cache_key(model, messages, temperature, max_tokens)
+    # المولّد يمتد عبر yield، فمقطع القياس لا يُجعل الحالي ويُغلق يدويًا
+    sp = start_span("llm.stream", priority=priority)
+    try:
+        if use_cache:
+            hit = _cache().get_json(key)
+            if hit is not None:
+                _record_usage(model, messages, hit.get("content", ""), cached=True, sp=sp)
+                yield hit.get("content", "")
+                return
+
+        kwargs = {"model": model, "messages": messages, "temperature": temperature, "stream": True}
+        if max_tokens is not None:
+            kwargs["max_tokens"] = max_tokens
+        reserved = min(_estimate_request_tokens(messages, max_tokens), limiter.tokens.capacity)
+        started = time.monotonic()
+        stream = _create_with_retry(kwargs, priority)
+
+        parts, final_usage = [], None
+        for chunk in stream:
+            if chunk.choices:
+                delta = chunk.choices[0].delta.content or ""
+                if delta:
+                    if not parts:
+                        sp.set(first_token_s=round(time.monotonic() - started, 3))
+                    parts.append(delta)
+                    yield delta
+            # Groq يرسل الاستهلاك الفعلي في آخر جزء ضمن x_groq.usage
+            usage = getattr(getattr(chunk, "x_groq", None), "usage", None)
+            if usage is not None and getattr(usage, "total_tokens", None):
+                limiter.settle(reserved, usage.total_tokens)
+                final_usage = usage
+
+        content = "".join(parts)
+        _record_usage(model, messages, content, final_usage, seconds=time.monotonic() - started, sp=sp)
+        if use_cache and content.strip():
+            _cache().set_json(key, {"model": model, "content": content})
+    finally:
+        sp.finish()
@@ -0,0 +1,88 @@
+# modules/matcher.py
+import re
+from collections import Counter, defaultdict
+
+from modules.retrieval import normalize_arabic, tokenize
+
+# ============================================================
+# 🔤 تطبيع موحّد للمصطلحات والنصوص قبل المطابقة
+# ============================================================
+def _norm(text: str) -> str:
+    text = normalize_arabic(text).replace("_", " ")
+    return re.sub(r"\s+", " ", text).strip()
+
+
+# ============================================================
+# 🎯 مطابقة متعددة المصطلحات بمرور واحد على كل صفحة
+# ============================================================
+class TermMatcher:
+    """
+    يبني تعبيرًا منتظمًا واحدًا (بدائل مرتبة من الأطول للأقصر) لكل المصطلحات ومرادفاتها،
+    فيُفحص نص كل صفحة مرة واحدة فقط بدل regex منفصل لكل مرادف/صفحة/عرض.
+
+    terms = {"إدارة المخاطر": ["إدارة المخاطر", "إدارة_المخاطر", ...], ...}
+    """
+
+    def __init__(self, terms: dict):
+        self.labels = list(terms)
+        self._owners = defaultdict(set)  # الصيغة المطبّعة → المصطلحات التي تملكها
+        for label, synonyms in terms.items():
+            for syn in [label] + list(synonyms or []):
+                variant = _norm(syn)
+                if variant:
+                    self._owners[variant].add(label)
+
+        variants = sorted(self._owners, key=len, reverse=True)
+        self._pattern = None
+        if variants:
+            alternation = "|".join(re.escape(v).replace(r"\ ", r"\s+") for v in variants)
+            # سوابق عربية ملتصقة اختيارية (و/ف/ب/ل/ك + ال/لل) حتى تُطابق "والتنفيذ" مع "تنفيذ"
+            self._pattern = re.compile(rf"(?<!\w)(?:[وفبلك]?(?:ال|لل)?)({alternation})(?!\w)")
+
+    def find(self, text: str) -> set:
+        """الصيغ المطبّعة الموجودة في النص (مرور واحد)"""
+        if self._pattern is None or not text:
+            return set()
+        return {re.sub(r"\s+", " ", m.group(1)) for m in self._pattern.finditer(_norm(text))}
+
+    def hits(self, text: str) -> Counter:
+        """عدد الصيغ المختلفة المطابقة لكل مصطلح داخل النص"""
+        out = Counter()
+        for variant in self.find(text):
+            for label in self._owners.get(variant, ()):
+                out[label] += 1
+        return out
+
+    def scan_pages(self, pages: list) -> dict:
+        """{مصطلح: {"count": n, "pages": [..]}} لقائمة صفحات عرض واحد"""
+        stats = {label: {"count": 0, "pages": []} for label in self.labels}
+        for p in pages:
+            for label, n in self.hits(p.get("text", "")).items():
+                stats[label]["count"] += n
+                stats[label]["pages"].append(p["page_num"])
+        return stats
+
+    def scan_offers(self, offers_pages: dict) -> dict:
+        """
+        فحص جميع العروض معًا: offers_pages = {اسم العرض: [صفحات]}
+        يعيد {مصطلح: {"count": n, "pages": [أرقام مرتبة], "offers": {اسم العرض: [صفحات]}}}
+        """
+        stats = {label: {"count": 0, "pages": set(), "offers": {}} for label in self.labels}
+        for name, pages in offers_pages.items():
+            for label, s in self.scan_pages(pages).items():
+                if s["count"]:
+                    stats[label]["count"] += s["count"]
+                    stats[label]["pages"].update(s["pages"])
+                    stats[label]["offers"][name] = s["pages"]
+        for s in stats.values():
+            s["pages"] = sorted(s["pages"])
+        return stats
+
+
+def criteria_matcher(criteria: list) -> TermMatcher:
+    """مطابق للمعايير: نص المعيار كاملًا + كلماته الدالّة (لترشيح الأدلة في المقيّم)"""
+    terms = {}
+    for c in criteria:
+        words = [w for w in tokenize(c) if len(w) >= 3]
+        terms[c] = words
+    return TermMatcher(terms)
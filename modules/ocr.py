@@ -0,0 +1,100 @@
+# modules/ocr.py
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+# fitz / pytesseract / PIL تُستورد عند أول صفحة فعلية (لا عند استيراد الوحدة)
+
+# ============================================================
+# ⚙️ إعدادات محرك OCR (قابلة للضبط من .env)
+# ============================================================
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0")) or (os.cpu_count() or 1)
+OCR_DPI = int(os.getenv("OCR_DPI", "200"))
+OCR_LANG = os.getenv("OCR_LANG", "ara+eng")
+OCR_MIN_TEXT_CHARS = 40  # الصفحة التي يقل نصها عن ذلك تُعتبر ممسوحة ضوئيًا
+# "spawn" آمن مع خيوط Streamlit (fork قد يسبب تجمّد العمليات الفرعية)
+OCR_MP_START = os.getenv("OCR_MP_START", "spawn")
+
+
+# ============================================================
+# 🔎 المرحلة 1: تحديد الصفحات التي تحتاج OCR
+# ============================================================
+def page_needs_ocr(text: str, min_chars: int = OCR_MIN_TEXT_CHARS) -> bool:
+    """الصفحة الفقيرة نصيًا (أقل من min_chars حرفًا بعد التشذيب) تحتاج OCR"""
+    return len((text or "").strip()) < min_chars
+
+
+# ============================================================
+# 🖼️ المرحلة 2: التحويل لصورة والتعرّف (داخل عملية مستقلة)
+# ============================================================
+_worker_doc = None
+
+
+def _init_worker(pdf_bytes):
+    """يُفتح المستند مرة واحدة لكل عملية بدل فتحه لكل صفحة"""
+    global _worker_doc
+    # Tesseract متعدد الخيوط داخليًا؛ نحصره في خيط واحد لتفادي التزاحم بين العمليات
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    import fitz
+    _worker_doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+
+
+def _render_and_recognize(doc, index: int, dpi: int, lang: str) -> str:
+    import pytesseract
+    from PIL import Image
+    page = doc[index]
+    pix = page.get_pixmap(dpi=dpi)
+    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+    return pytesseract.image_to_string(img, lang=lang)
+
+
+def _ocr_page(index: int, dpi: int, lang: str):
+    return index, _render_and_recognize(_worker_doc, index, dpi, lang)
+
+
+def ocr_pages(pdf_bytes, indexes, dpi: int = None, workers: int = None, lang: str = None, on_page=None,
+              open_handle=None):
+    """
+    تشغيل OCR على الصفحات المحددة بالتوازي عبر مجموعة عمليات بحجم أنوية الجهاز.
+    يعيد dict {رقم الصفحة (من 0): النص}. on_page(index) يُستدعى بعد كل صفحة لتحديث التقدم.
+    open_handle: دالة تعيد مدير سياق لمقبض fitz مفتوح مسبقًا (Document.handle) لمسار العامل الواحد.
+    """
+    dpi = dpi or OCR_DPI
+    lang = lang or OCR_LANG
+    workers = max(1, min(workers or OCR_WORKERS, len(indexes) or 1))
+    results = {}
+
+    if not indexes:
+        return results
+
+    # صفحة واحدة أو عامل واحد: لا داعي لتكلفة إنشاء العمليات
+    if workers == 1 or len(indexes) == 1:
+        if open_handle is not None:
+            with open_handle() as doc:
+                for i in indexes:
+                    results[i] = _render_and_recognize(doc, i, dpi, lang)
+                    if on_page:
+                        on_page(i)
+            return results
+        import fitz
+        doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+        try:
+            for i in indexes:
+                results[i] = _render_and_recognize(doc, i, dpi, lang)
+                if on_page:
+                    on_page(i)
+        finally:
+            doc.close()
+        return results
+
+    ctx = multiprocessing.get_context(OCR_MP_START)
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=ctx,
+        initializer=_init_worker, initargs=(pdf_bytes,),
+    ) as pool:
+        futures = [pool.submit(_ocr_page, i, dpi, lang) for i in indexes]
+        for fut in as_completed(futures):
+            i, text = fut.result()
+            results[i] = text
+            if on_page:
+                on_page(i)
+    return results
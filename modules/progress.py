@@ -0,0 +1,238 @@
+# modules/progress.py
+import logging
+import threading
+import contextvars
+from contextlib import contextmanager
+
+logger = logging.getLogger("smarttender")
+
+# ============================================================
+# 🔌 هل نعمل داخل Streamlit؟
+# ============================================================
+def streamlit_active() -> bool:
+    """True فقط عند التشغيل عبر streamlit run (وليس من سطر الأوامر)"""
+    try:
+        from streamlit import runtime
+        return runtime.exists()
+    except Exception:
+        return False
+
+
+# ============================================================
+# 📣 واجهة التقارير الموحّدة (مستقلة عن الواجهة)
+# ============================================================
+class ProgressHandle:
+    """مقبض شريط التقدم: update(fraction, text) ثم close()"""
+
+    def update(self, fraction: float, text: str = None):
+        pass
+
+    def close(self):
+        pass
+
+
+class Reporter:
+    """
+    الواجهة التي تستخدمها الوحدات بدل استدعاء st.* مباشرة.
+    التطبيق يستخدم StreamlitReporter، والتشغيل الدفعي يستخدم LogReporter.
+    """
+
+    def info(self, msg: str):
+        pass
+
+    def success(self, msg: str):
+        pass
+
+    def warning(self, msg: str):
+        pass
+
+    def error(self, msg: str):
+        pass
+
+    def caption(self, msg: str):
+        pass
+
+    def progress(self, text: str = None) -> ProgressHandle:
+        return ProgressHandle()
+
+
+class _StreamlitProgress(ProgressHandle):
+    def __init__(self, text=None):
+        import streamlit as st
+        self._bar = st.progress(0.0, text=text)
+
+    def update(self, fraction, text=None):
+        self._bar.progress(min(max(fraction, 0.0), 1.0), text=text)
+
+    def close(self):
+        self._bar.empty()
+
+
+class StreamlitReporter(Reporter):
+    """يعرض الرسائل وأشرطة التقدم داخل صفحة Streamlit"""
+
+    def _st(self):
+        import streamlit as st
+        return st
+
+    def info(self, msg):
+        self._st().info(msg)
+
+    def success(self, msg):
+        self._st().success(msg)
+
+    def warning(self, msg):
+        self._st().warning(msg)
+
+    def error(self, msg):
+        self._st().error(msg)
+
+    def caption(self, msg):
+        self._st().caption(msg)
+
+    def progress(self, text=None):
+        return _StreamlitProgress(text)
+
+
+class _LogProgress(ProgressHandle):
+    def __init__(self, log, text=None):
+        self._log = log
+        self._last = -1
+        if text:
+            self._log.info(text)
+
+    def update(self, fraction, text=None):
+        # سطر واحد لكل 10% لتفادي إغراق السجل
+        step = int(fraction * 10)
+        if step != self._last:
+            self._last = step
+            self._log.info("%3d%% %s", int(fraction * 100), text or "")
+
+
+class LogReporter(Reporter):
+    """يكتب الرسائل في logging (للتشغيل الدفعي على الخادم)"""
+
+    def __init__(self, log: logging.Logger = None):
+        self.log = log or logger
+
+    def info(self, msg):
+        self.log.info(msg)
+
+    def success(self, msg):
+        self.log.info(msg)
+
+    def warning(self, msg):
+        self.log.warning(msg)
+
+    def error(self, msg):
+        self.log.error(msg)
+
+    def caption(self, msg):
+        self.log.debug(msg)
+
+    def progress(self, text=None):
+        return _LogProgress(self.log, text)
+
+
+# ============================================================
+# 🎯 المُبلِّغ الحالي (لكل سياق/خيط)
+# ============================================================
+_current = contextvars.ContextVar("smarttender_reporter", default=None)
+
+
+def get_reporter() -> Reporter:
+    rep = _current.get()
+    if rep is not None:
+        return rep
+    return StreamlitReporter() if streamlit_active() else LogReporter()
+
+
+# متغيرات سياق إضافية تُنقل لخيوط العمل (مثل المقطع الحالي في modules.tracing)
+_propagated = []
+
+
+def propagate_to_threads(var: contextvars.ContextVar) -> contextvars.ContextVar:
+    _propagated.append(var)
+    return var
+
+
+# ============================================================
+# ⛔ الإلغاء التعاوني (لمهام الخلفية في modules.jobs)
+# ============================================================
+class Cancelled(Exception):
+    """تُرفع داخل العمل الجاري عند طلب إلغاء مهمته"""
+
+
+_cancel = propagate_to_threads(contextvars.ContextVar("smarttender_cancel", default=None))
+
+
+@contextmanager
+def cancellation(event: threading.Event):
+    """ربط حدث إلغاء بالسياق الحالي (وخيوط العمل المنشأة منه)"""
+    token = _cancel.set(event)
+    try:
+        yield event
+    finally:
+        _cancel.reset(token)
+
+
+def check_cancelled():
+    """نقطة فحص: ترفع Cancelled إن طُلب إلغاء المهمة الحالية (لا أثر خارج المهام)"""
+    event = _cancel.get()
+    if event is not None and event.is_set():
+        raise Cancelled("تم إلغاء المهمة")
+
+
+@contextmanager
+def use_reporter(reporter: Reporter):
+    """تفعيل مُبلِّغ معيّن داخل كتلة with"""
+    token = _current.set(reporter)
+    try:
+        yield reporter
+    finally:
+        _current.reset(token)
+
+
+def thread_initializer():
+    """
+    دالة تهيئة لخيوط ThreadPoolExecutor تنقل إليها المُبلِّغ الحالي (ومتغيرات السياق المسجلة)
+    وسياق Streamlit (إن وُجد) حتى تعمل الرسائل وst.cache_data داخلها.
+    """
+    reporter = _current.get()
+    extra = [(var, var.get()) for var in _propagated]
+    st_ctx = None
+    if streamlit_active():
+        try:
+            from streamlit.runtime.scriptrunner import get_script_run_ctx
+            st_ctx = get_script_run_ctx()
+        except Exception:
+            st_ctx = None
+
+    def _init():
+        if reporter is not None:
+            _current.set(reporter)
+        for var, value in extra:
+            if value is not None:
+                var.set(value)
+        if st_ctx is not None:
+            from streamlit.runtime.scriptrunner import add_script_run_ctx
+            add_script_run_ctx(threading.current_thread(), st_ctx)
+
+    return _init
+
+
+# ============================================================
+# 💾 st.cache_data عند العمل داخل Streamlit فقط
+# ============================================================
+def cache_data(func=None, **kwargs):
+    """
+    يطبّق st.cache_data داخل التطبيق، ويترك الدالة كما هي في التشغيل الدفعي
+    (حيث تتكفل ذاكرة القرص في modules.cache بإعادة الاستخدام).
+    """
+    def wrap(f):
+        if streamlit_active():
+            import streamlit as st
+            return st.cache_data(**kwargs)(f)
+        return f
+
+    return wrap(func) if func is not None else wrap
@@ -0,0 +1,166 @@
+# modules/report.py
+import io
+import hashlib
+import threading
+from collections import OrderedDict
+from modules.tracing import current_span, traced
+
+PURPLE_DARK = "4B2E83"
+PURPLE_LIGHT = "8B5CF6"
+ROW_ALT = "F5F0FF"
+WHITE = "FFFFFF"
+
+REPORT_CACHE_SIZE = 8  # عدد التقارير المحفوظة في الذاكرة (لكل نتيجة تقييم تقرير واحد)
+
+
+# ============================================================
+# 🎨 الأنماط المشتركة (نمط مسمّى واحد يُشارك بين كل الخلايا)
+# ============================================================
+def _named_styles():
+    from openpyxl.styles import Font, Alignment, PatternFill, NamedStyle
+    center = Alignment(horizontal="center", vertical="center", wrap_text=True)
+    return [
+        NamedStyle(
+            name="st_title",
+            font=Font(bold=True, size=16, color=WHITE),
+            alignment=Alignment(horizontal="center", vertical="center"),
+            fill=PatternFill(start_color=PURPLE_DARK, end_color=PURPLE_DARK, fill_type="solid"),
+        ),
+        NamedStyle(
+            name="st_header",
+            font=Font(bold=True, color=WHITE),
+            alignment=center,
+            fill=PatternFill(start_color=PURPLE_LIGHT, end_color=PURPLE_LIGHT, fill_type="solid"),
+        ),
+        NamedStyle(
+            name="st_row_alt",
+            font=Font(size=13),
+            alignment=center,
+            fill=PatternFill(start_color=ROW_ALT, end_color=ROW_ALT, fill_type="solid"),
+        ),
+        NamedStyle(name="st_row", font=Font(size=13), alignment=center),
+        NamedStyle(name="st_text", alignment=Alignment(wrap_text=True, vertical="top")),
+    ]
+
+
+def _cells(ws, values, style):
+    from openpyxl.cell import WriteOnlyCell
+    out = []
+    for v in values:
+        c = WriteOnlyCell(ws, value=v)
+        c.style = style
+        out.append(c)
+    return out
+
+
+def _title_row(ws, title, width):
+    """شريط العنوان: الخلية الأولى بالنص وبقية الأعمدة بنفس النمط (وضع الكتابة فقط لا يدعم الدمج)"""
+    ws.append(_cells(ws, [title] + [None] * (width - 1), "st_title"))
+
+
+def _set_widths(ws, ncols, width):
+    from openpyxl.utils import get_column_letter
+    for col_idx in range(1, ncols + 1):
+        ws.column_dimensions[get_column_letter(col_idx)].width = width
+
+
+# ============================================================
+# 📊 بناء تقرير Excel الكامل (الترتيب + تفاصيل العروض + سبب الاختيار)
+# ============================================================
+@traced("report")
+def build_excel_report(ranked, details: dict, explanation: str = "", method: str = None) -> bytes:
+    """
+    يعيد محتوى ملف xlsx كـ bytes.
+    method: طريقة التطبيع المستخدمة في الترتيب (modules.scoring.NORMALIZATIONS) — تُكتب في عنوان عمود التحويل.
+    يُكتب بوضع write_only صفًا بصف (ذاكرة محدودة وزمن خطي مع عدد الصفوف)
+    وبأنماط مسمّاة مشتركة بدل إنشاء Font/Fill/Alignment لكل خلية.
+    """
+    # openpyxl وnumpy يُستوردان عند أول تقرير فقط
+    from openpyxl import Workbook
+    from modules.scoring import DEFAULT_NORMALIZATION, NORMALIZATIONS, normalize
+
+    method = method or DEFAULT_NORMALIZATION
+    norm_col = f"تحويل: {NORMALIZATIONS[method]}"
+
+    wb = Workbook(write_only=True)
+    for style in _named_styles():
+        wb.add_named_style(style)
+
+    # 🏆 الترتيب النهائي
+    ws_rank = wb.create_sheet("🏆 الترتيب النهائي")
+    _set_widths(ws_rank, 3, 35)
+    _title_row(ws_rank, "📊 الترتيب النهائي للعروض", 3)
+    ws_rank.append(_cells(ws_rank, ["اسم العرض", "النسبة %", "الدرجة الإجمالية"], "st_header"))
+    for i, (fname, overall) in enumerate(zip(ranked["file"], ranked["overall"].astype(float))):
+        style = "st_row_alt" if i % 2 == 0 else "st_row"
+        ws_rank.append(_cells(ws_rank, [fname, round(overall * 100, 1), round(overall, 3)], style))
+
+    # 🧾 تفاصيل العروض
+    for fname, df in details.items():
+        ws = wb.create_sheet(title=fname[:28])
+        _set_widths(ws, 6, 40)
+        _title_row(ws, f"📋 تفاصيل العرض: {fname}", 6)
+        ws.append(_cells(ws, ["المعيار", "الدرجة", "الوزن", norm_col, "السبب", "سؤال الذكاء الصناعي"], "st_header"))
+
+        df2 = df.copy()
+        # ✅ إصلاح الأعمدة المفقودة
+        for col, default in (("criterion", ""), ("reason", ""), ("ai_question", ""), ("score", 0), ("weight", 1.0)):
+            if col not in df2.columns:
+                df2[col] = default
+        df2["score"] = df2["score"].astype(float)
+        # نفس تطبيع نسبة الترتيب (modules.scoring)؛ عمود normalized من ScoreMatrix.details إن وُجد
+        if "normalized" not in df2.columns:
+            df2["normalized"] = normalize(df2["score"], method)
+        df2["normalized"] = df2["normalized"].astype(float).round(3)
+
+        rows = zip(
+            df2["criterion"], df2["score"], df2["weight"].astype(float), df2["normalized"],
+            df2["reason"].astype(str), df2["ai_question"].astype(str),
+        )
+        for i, r in enumerate(rows):
+            ws.append(_cells(ws, list(r), "st_row_alt" if i % 2 == 0 else "st_row"))
+
+    if explanation:
+        ws_exp = wb.create_sheet("🧠 سبب الاختيار")
+        ws_exp.column_dimensions["A"].width = 100
+        _title_row(ws_exp, "🧠 سبب اختيار العرض الأفضل", 1)
+        ws_exp.append(_cells(ws_exp, [explanation], "st_text"))
+
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    data = buffer.getvalue()
+    current_span().set(offers=len(details), rows=len(ranked) + sum(len(df) for df in details.values()), bytes=len(data))
+    return data
+
+
+# ============================================================
+# 💾 تقرير واحد لكل نتيجة تقييم (حسب بصمة النتائج)
+# ============================================================
+_reports = OrderedDict()
+_reports_lock = threading.Lock()
+
+
+def result_hash(ranked, details: dict, explanation: str = "", method: str = None) -> str:
+    h = hashlib.md5()
+    h.update((method or "").encode("utf-8"))
+    h.update(ranked.to_json(orient="split", force_ascii=False).encode("utf-8"))
+    for fname in sorted(details):
+        h.update(fname.encode("utf-8"))
+        h.update(details[fname].to_json(orient="split", force_ascii=False).encode("utf-8"))
+    h.update((explanation or "").encode("utf-8"))
+    return h.hexdigest()
+
+
+def get_excel_report(ranked, details: dict, explanation: str = "", method: str = None) -> bytes:
+    """يبني التقرير مرة واحدة لكل نتيجة (وطريقة تطبيع)، وإعادة التشغيل تعيد النسخة المحفوظة"""
+    key = result_hash(ranked, details, explanation, method)
+    with _reports_lock:
+        if key in _reports:
+            _reports.move_to_end(key)
+            return _reports[key]
+    data = build_excel_report(ranked, details, explanation, method)
+    with _reports_lock:
+        _reports[key] = data
+        while len(_reports) > REPORT_CACHE_SIZE:
+            _reports.popitem(last=False)
+    return data
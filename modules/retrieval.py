@@ -0,0 +1,136 @@
+# modules/retrieval.py
+import re
+import math
+from collections import Counter
+
+# ============================================================
+# 🔤 تطبيع النص العربي (توحيد الألف/الياء/التاء المربوطة وحذف التشكيل)
+# ============================================================
+_DIACRITICS = re.compile(r"[\u0610-\u061A\u064B-\u065F\u0670\u06D6-\u06ED\u0640]")
+_TOKEN_RE = re.compile(r"[A-Za-z0-9\u0621-\u064A\u0660-\u0669\u0671-\u06D3]+")
+
+_STOPWORDS = {
+    # عربية
+    "في", "من", "على", "الى", "عن", "مع", "هذا", "هذه", "ذلك", "التي", "الذي", "او", "ان",
+    "ما", "هل", "كيف", "لماذا", "متي", "اين", "هو", "هي", "كان", "تم", "ثم", "قد", "كل",
+    "عرض", "العرض", "السوال", "الحالي",
+    # إنجليزية
+    "the", "a", "an", "of", "to", "in", "on", "for", "and", "or", "is", "are", "what", "how",
+    "with", "by", "be", "this", "that", "it", "as", "at", "from",
+}
+
+
+def normalize_arabic(text: str) -> str:
+    """تطبيع خفيف: حذف التشكيل والتطويل، أ/إ/آ→ا، ى→ي، ة→ه، ؤ→و، ئ→ي، وتحويل اللاتيني لأحرف صغيرة"""
+    text = _DIACRITICS.sub("", text or "")
+    text = re.sub("[إأآٱ]", "ا", text)
+    text = text.replace("ى", "ي").replace("ة", "ه").replace("ؤ", "و").replace("ئ", "ي")
+    return text.lower()
+
+
+def _light_stem(tok: str) -> str:
+    """حذف أداة التعريف والحروف الملتصقة الشائعة (وال، بال، لل...) للكلمات الطويلة"""
+    for pre in ("وال", "بال", "كال", "فال", "لل", "ال"):
+        if tok.startswith(pre) and len(tok) - len(pre) >= 3:
+            return tok[len(pre):]
+    return tok
+
+
+def tokenize(text: str) -> list:
+    """تقسيم النص المطبّع إلى كلمات مع حذف كلمات التوقف"""
+    out = []
+    for tok in _TOKEN_RE.findall(normalize_arabic(text)):
+        if len(tok) < 2 or tok in _STOPWORDS or tok.isdigit():
+            continue
+        out.append(_light_stem(tok))
+    return out
+
+
+# ============================================================
+# 📑 تقسيم المستند إلى مقاطع حسب الصفحات
+# ============================================================
+_PAGE_MARK = re.compile(r"\[صفحة\s*(\d+)\]")
+
+
+def pages_from_text(text: str) -> list:
+    """يحوّل نصًا يحتوي علامات [صفحة n] إلى قائمة صفحات؛ وبدونها يُعتبر صفحة واحدة"""
+    parts = _PAGE_MARK.split(text or "")
+    if len(parts) == 1:
+        return [{"page_num": 1, "text": text or ""}]
+    pages = []
+    for i in range(1, len(parts), 2):
+        pages.append({"page_num": int(parts[i]), "text": parts[i + 1]})
+    return pages
+
+
+def page_windows(pages: list, max_chars: int = 2000) -> list:
+    """
+    مقطع لكل صفحة، والصفحات الطويلة تُقسم على حدود الفقرات بحيث لا يتجاوز المقطع max_chars.
+    كل مقطع: {"page_num": n, "text": "..."}
+    (نوافذ بالأحرف لفهرس BM25؛ تقسيم المطالبات بالرموز هو modules.budget.chunk_pages)
+    """
+    chunks = []
+    for p in pages:
+        text = (p.get("text") or "").strip()
+        if not text:
+            continue
+        if len(text) <= max_chars:
+            chunks.append({"page_num": p["page_num"], "text": text})
+            continue
+        buf = ""
+        for para in re.split(r"\n\s*\n|\n", text):
+            if buf and len(buf) + len(para) + 1 > max_chars:
+                chunks.append({"page_num": p["page_num"], "text": buf.strip()})
+                buf = ""
+            buf += para + "\n"
+            while len(buf) > max_chars:
+                chunks.append({"page_num": p["page_num"], "text": buf[:max_chars].strip()})
+                buf = buf[max_chars:]
+        if buf.strip():
+            chunks.append({"page_num": p["page_num"], "text": buf.strip()})
+    return chunks
+
+
+# ============================================================
+# 🔎 فهرس BM25 للبحث داخل مقاطع العرض
+# ============================================================
+class BM25Index:
+    """فهرس BM25 بسيط يُبنى مرة واحدة لكل عرض ويُستعلم لكل سؤال"""
+
+    def __init__(self, chunks: list, k1: float = 1.5, b: float = 0.75):
+        self.chunks = chunks
+        self.k1, self.b = k1, b
+        self._tf = [Counter(tokenize(c["text"])) for c in chunks]
+        self._len = [sum(tf.values()) for tf in self._tf]
+        self._avg = (sum(self._len) / len(self._len)) if self._len else 0.0
+        df = Counter()
+        for tf in self._tf:
+            df.update(tf.keys())
+        n = len(chunks)
+        self._idf = {t: math.log(1 + (n - d + 0.5) / (d + 0.5)) for t, d in df.items()}
+
+    @classmethod
+    def from_pages(cls, pages: list, max_chars: int = 2000):
+        return cls(page_windows(pages, max_chars=max_chars))
+
+    def scores(self, query: str) -> list:
+        q = [t for t in tokenize(query) if t in self._idf]
+        out = []
+        for tf, dl in zip(self._tf, self._len):
+            s = 0.0
+            for t in q:
+                f = tf.get(t)
+                if f:
+                    denom = f + self.k1 * (1 - self.b + self.b * dl / (self._avg or 1))
+                    s += self._idf[t] * f * (self.k1 + 1) / denom
+            out.append(s)
+        return out
+
+    def search(self, query: str, k: int = 6) -> list:
+        """يعيد أفضل k مقاطع [(score, chunk)] مرتبة حسب الصلة (المقاطع ذات الدرجة صفر تُستبعد)"""
+        ranked = sorted(
+            ((s, c) for s, c in zip(self.scores(query), self.chunks) if s > 0),
+            key=lambda x: x[0], reverse=True,
+        )
+        return ranked[:k]
+
@@ -0,0 +1,202 @@
+# modules/scoring.py
+import numpy as np
+import pandas as pd
+
+# ============================================================
+# 📏 تحويل الدرجات (1..4) إلى نسبة — مصدر واحد للتطبيع في كل الوحدات
+# ============================================================
+SCORE_MIN, SCORE_MAX = 1.0, 4.0
+
+NORMALIZATIONS = {
+    "ratio": "الدرجة ÷ 4 (الافتراضي)",
+    "minmax": "(الدرجة − 1) ÷ 3",
+    "rank": "ترتيب العرض داخل كل معيار (0..1)",
+}
+DEFAULT_NORMALIZATION = "ratio"
+
+
+def normalize(scores, method: str = DEFAULT_NORMALIZATION):
+    """
+    تطبيع مصفوفة/عمود درجات (القيم المفقودة تبقى NaN):
+    - ratio: s/4 (نفس نسبة "overall" المعروضة منذ البداية)
+    - minmax: (s-1)/3
+    - rank: ترتيب نسبي للعروض داخل كل عمود (للمصفوفات ثنائية الأبعاد)
+    """
+    s = np.asarray(scores, dtype=float)
+    if method == "ratio":
+        return s / SCORE_MAX
+    if method == "minmax":
+        return (s - SCORE_MIN) / (SCORE_MAX - SCORE_MIN)
+    if method == "rank":
+        if s.ndim == 1:
+            s = s[:, None]
+        ranks = pd.DataFrame(s).rank(axis=0, method="average", pct=True).to_numpy()
+        return ranks if np.asarray(scores).ndim > 1 else ranks[:, 0]
+    raise ValueError(f"unknown normalization: {method}")
+
+
+# ============================================================
+# 🧮 مصفوفة الدرجات: عروض × معايير (+ الأوزان والأسباب والصفحات)
+# ============================================================
+class ScoreMatrix:
+    """
+    تمثيل مضغوط لنتيجة التقييم:
+    scores[i, j] درجة العرض i في المعيار j (NaN = لم يُقيّم)، weights[j] وزن المعيار،
+    ومصفوفات موازية للأسباب والأسئلة وصفحات الأدلة.
+    إعادة الترتيب بعد تعديل الأوزان عملية مصفوفية فورية دون أي استدعاء للنموذج.
+    """
+
+    def __init__(self, offers, criteria, scores=None, weights=None,
+                 reasons=None, questions=None, pages=None, comments=None):
+        self.offers = list(offers)
+        self.criteria = list(criteria)
+        shape = (len(self.offers), len(self.criteria))
+        self.scores = np.full(shape, np.nan) if scores is None else np.asarray(scores, dtype=float)
+        self.weights = np.ones(shape[1]) if weights is None else self._weights(weights)
+        self.reasons = np.full(shape, "", dtype=object) if reasons is None else reasons
+        self.questions = np.full(shape, "", dtype=object) if questions is None else questions
+        self.pages = np.empty(shape, dtype=object) if pages is None else pages
+        self.comments = list(comments) if comments is not None else [""] * shape[0]
+
+    @classmethod
+    def from_results(cls, ranked: pd.DataFrame, details: dict, criteria=None, weights=None):
+        """بناء المصفوفة من ناتج evaluate_offers (جدول الترتيب + جدول لكل عرض)"""
+        offers = ranked["file"].tolist() if not ranked.empty else list(details)
+        if criteria is None:
+            criteria = list(dict.fromkeys(c for df in details.values() if not df.empty for c in df["criterion"]))
+        m = cls(offers, criteria, weights=weights)
+        col = {c: j for j, c in enumerate(m.criteria)}
+        comments = dict(zip(ranked.get("file", []), ranked.get("comment", [])))
+        for i, name in enumerate(m.offers):
+            m.comments[i] = comments.get(name, "")
+            df = details.get(name)
+            if df is None or df.empty:
+                continue
+            for rec in df.to_dict("records"):
+                j = col.get(rec.get("criterion"))
+                if j is None:
+                    continue
+                m.scores[i, j] = pd.to_numeric(rec.get("score"), errors="coerce")
+                m.reasons[i, j] = rec.get("reason", "")
+                m.questions[i, j] = rec.get("ai_question", "")
+                m.pages[i, j] = rec.get("pages") if isinstance(rec.get("pages"), list) else None
+        return m
+
+    def _weights(self, weights) -> np.ndarray:
+        """أوزان من قائمة أو dict {معيار: وزن}؛ المفقود أو غير الصالح = 1، والسالب = 0"""
+        if isinstance(weights, dict):
+            weights = [weights.get(c, 1.0) for c in self.criteria]
+        w = pd.to_numeric(pd.Series(list(weights), dtype=object), errors="coerce").to_numpy(dtype=float)
+        w = np.where(np.isnan(w), 1.0, w)
+        return np.clip(w, 0.0, None)
+
+    def with_weights(self, weights) -> "ScoreMatrix":
+        """نسخة تشارك نفس المصفوفات بأوزان جديدة"""
+        m = ScoreMatrix(self.offers, self.criteria, self.scores, None,
+                        self.reasons, self.questions, self.pages, self.comments)
+        m.weights = self._weights(weights)
+        return m
+
+    # ---------------- الترتيب ----------------
+    def overall(self, method: str = DEFAULT_NORMALIZATION, weights=None) -> np.ndarray:
+        """المتوسط الموزون للدرجات المطبّعة لكل عرض (المعايير غير المقيّمة لا تدخل في المقام)"""
+        w = self.weights if weights is None else self._weights(weights)
+        norm = normalize(self.scores, method)
+        mask = ~np.isnan(norm)
+        num = np.where(mask, norm, 0.0) @ w
+        den = mask.astype(float) @ w
+        return np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+
+    def ranking(self, method: str = DEFAULT_NORMALIZATION, weights=None) -> pd.DataFrame:
+        """جدول الترتيب بنفس أعمدة evaluate_offers (file, overall, comment) + rank (التعادل يأخذ نفس الترتيب)"""
+        overall = self.overall(method, weights)
+        ranked = pd.DataFrame({"file": self.offers, "overall": overall, "comment": self.comments})
+        ranked["rank"] = ranked["overall"].round(6).rank(ascending=False, method="min").astype(int)
+        return ranked.sort_values(["rank", "file"]).reset_index(drop=True)
+
+    def details(self, method: str = None) -> dict:
+        """
+        {عرض: جدول درجات} بالشكل الذي يستخدمه التقرير، مع عمود الوزن.
+        عند تمرير method يُضاف عمود normalized محسوبًا على المصفوفة كاملة (rank يحتاج كل العروض).
+        """
+        columns = ["criterion", "score", "weight", "reason", "ai_question", "pages"]
+        norm = None
+        if method:
+            norm = normalize(self.scores, method)
+            columns.append("normalized")
+        out = {}
+        for i, name in enumerate(self.offers):
+            rows = []
+            for j, c in enumerate(self.criteria):
+                if np.isnan(self.scores[i, j]):
+                    continue
+                row = {"criterion": c, "score": self.scores[i, j], "weight": float(self.weights[j]),
+                       "reason": self.reasons[i, j], "ai_question": self.questions[i, j],
+                       "pages": self.pages[i, j] or []}
+                if norm is not None:
+                    row["normalized"] = float(norm[i, j])
+                rows.append(row)
+            out[name] = pd.DataFrame(rows, columns=columns)
+        return out
+
+    # ---------------- التعادل والحساسية ----------------
+    def ties(self) -> dict:
+        """{معيار: [العروض المتعادلة على أعلى درجة]} للمعايير التي يتقاسم فيها أكثر من عرض القمة"""
+        out = {}
+        for j, c in enumerate(self.criteria):
+            col = self.scores[:, j]
+            if np.all(np.isnan(col)):
+                continue
+            top = np.nanmax(col)
+            winners = [self.offers[i] for i in np.flatnonzero(col == top)]
+            if len(winners) > 1:
+                out[c] = winners
+        return out
+
+    def sensitivity(self, spread: float = 0.3, samples: int = 500,
+                    method: str = DEFAULT_NORMALIZATION, seed: int = 0) -> dict:
+        """
+        ثبات الترتيب عند تغيّر الأوزان:
+        - عشوائيًا: كل وزن يُضرب في معامل منتظم ضمن [1−spread, 1+spread] (samples مرة، دفعة مصفوفية واحدة)
+          → نسبة بقاء كل عرض في المركز الأول ومتوسط تغيّر ترتيبه.
+        - معيارًا معيارًا: إلغاء وزن كل معيار ومضاعفته → هل يتغير العرض الأفضل؟
+        """
+        n_off = len(self.offers)
+        if n_off == 0 or not self.criteria:
+            return {"top_share": {}, "mean_rank_shift": {}, "flips": []}
+        norm = normalize(self.scores, method)
+        mask = ~np.isnan(norm)
+        vals, present = np.where(mask, norm, 0.0), mask.astype(float)
+
+        def _overall(W):  # W: (k, C) → (k, O)
+            num, den = W @ vals.T, W @ present.T
+            return np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+
+        def _ranks(scores):  # ترتيب تنازلي 0 = الأول
+            return np.argsort(np.argsort(-scores, axis=1, kind="stable"), axis=1, kind="stable")
+
+        base = self.weights[None, :]
+        base_rank = _ranks(_overall(base))[0]
+        best = int(np.argmin(base_rank))
+
+        rng = np.random.default_rng(seed)
+        W = base * rng.uniform(1 - spread, 1 + spread, size=(samples, len(self.criteria)))
+        ranks = _ranks(_overall(W))
+        top_share = (ranks == 0).mean(axis=0)
+        shift = np.abs(ranks - base_rank[None, :]).mean(axis=0)
+
+        flips = []
+        for j, c in enumerate(self.criteria):
+            for label, factor in (("إلغاء", 0.0), ("مضاعفة", 2.0)):
+                w = self.weights.copy()
+                w[j] *= factor
+                o = _overall(w[None, :])[0]
+                if o[best] < o.max() - 1e-9:  # التعادل مع الأفضل لا يُعد انقلابًا
+                    flips.append({"criterion": c, "change": label, "new_best": self.offers[int(np.argmax(o))]})
+
+        return {
+            "best": self.offers[best],
+            "top_share": {o: round(float(v), 3) for o, v in zip(self.offers, top_share)},
+            "mean_rank_shift": {o: round(float(v), 3) for o, v in zip(self.offers, shift)},
+            "flips": flips,
+        }
@@ -0,0 +1,231 @@
+# modules/sections.py
+import os
+import re
+from collections import Counter
+
+from modules.retrieval import normalize_arabic
+from modules.tracing import current_span, traced
+
+# ============================================================
+# ⚙️ الإعدادات
+# ============================================================
+# "auto": تقسيم بنيوي محلي ثم النموذج للتسمية والتلخيص فقط | "llm": النموذج يقسّم ويعيد النص كاملًا (السابق)
+SECTIONS_MODE = os.getenv("SECTIONS_MODE", "auto")
+SECTIONS_MIN = 2              # أقل عدد أقسام لاعتبار البنية موثوقة
+SECTIONS_MAX = 60             # أكثر من ذلك غالبًا قوائم مرقّمة لا عناوين
+HEADING_MAX_CHARS = 90
+HEADING_MAX_WORDS = 12
+FONT_HEADING_RATIO = 1.15     # العنوان أكبر من خط المتن بهذه النسبة على الأقل
+PREAMBLE_MIN_CHARS = 200      # نص ما قبل أول عنوان يصبح قسم "تمهيد" إن تجاوز هذا الطول
+PREAMBLE_TITLE = "تمهيد"
+
+# ============================================================
+# 🔢 أنماط العناوين (عربي/إنجليزي)
+# ============================================================
+_DIGITS = str.maketrans("٠١٢٣٤٥٦٧٨٩۰۱۲۳۴۵۶۷۸۹", "01234567890123456789")
+
+# "1." / "2)" / "3 -" / "1.2" (أرقام عربية أو هندية) ثم العنوان
+_NUMBERED = re.compile(r"^\s*(\d{1,2}(?:\.\d{1,2}){0,2})\s*[\.\)\-–:]?\s+(\S.*)$")
+# "أولاً:" / "ثانيا -" ...
+_ORDINALS = ["اولا", "ثانيا", "ثالثا", "رابعا", "خامسا", "سادسا", "سابعا", "ثامنا", "تاسعا", "عاشرا"]
+_ORDINAL = re.compile(r"^\s*(" + "|".join(_ORDINALS) + r")[ً]?\s*[:\-–\.]?\s*(.*)$")
+# "Section 3" / "Chapter 2" / "الفصل الأول" / "الباب 2" / "القسم الثالث" / "المحور 1" / "I." / "IV)"
+_LABELLED = re.compile(
+    r"^\s*((?:section|chapter|part)\s+\w+|(?:الفصل|الباب|القسم|المحور|الجزء)\s+\S+|[IVX]{1,4}[\.\)])\s*[:\-–\.]?\s*(.*)$",
+    re.I,
+)
+
+# عناوين شائعة في العروض الفنية (سطر قصير يبدأ بأحدها)
+HEADING_KEYWORDS = [
+    "المقدمه", "مقدمه", "الملخص التنفيذي", "الاهداف", "نطاق العمل", "المنهجيه", "منهجيه العمل",
+    "خطه التنفيذ", "خطه العمل", "الجدول الزمني", "فريق العمل", "الفريق", "الهيكل التنظيمي",
+    "اداره المشروع", "اداره المخاطر", "ضمان الجوده", "الخبرات السابقه", "الخبره السابقه",
+    "المخرجات", "التدريب", "الدعم الفني", "العرض المالي", "النتائج", "الخاتمه", "الملاحق",
+    "introduction", "executive summary", "objectives", "scope of work", "methodology", "approach",
+    "implementation plan", "work plan", "timeline", "schedule", "project team", "team",
+    "project management", "risk management", "quality assurance", "experience", "deliverables",
+    "training", "support", "financial proposal", "results", "conclusion", "appendix", "appendices",
+]
+_KEYWORDS = sorted({normalize_arabic(k) for k in HEADING_KEYWORDS}, key=len, reverse=True)
+
+
+def _short_line(line: str) -> bool:
+    line = line.strip()
+    return 1 < len(line) <= HEADING_MAX_CHARS and len(line.split()) <= HEADING_MAX_WORDS
+
+
+def _keyword_heading(line: str) -> bool:
+    norm = normalize_arabic(line.strip())
+    for k in _KEYWORDS:
+        if norm.startswith(k):
+            rest = norm[len(k):]
+            # الكلمة المفتاحية كاملة، يليها فاصل أو ترجمة قصيرة ("المقدمة / Introduction")
+            if not rest or not rest[0].isalnum():
+                return True
+    return False
+
+
+# ============================================================
+# 📍 تحويل العناوين إلى مواضع في النص الموحّد
+# ============================================================
+def _locate(doc, page_index: int, title: str, start: int = 0) -> int:
+    """موضع العنوان داخل joined_text (بداية الصفحة إن لم يوجد نصه حرفيًا)"""
+    texts = doc.texts
+    if not 0 <= page_index < len(texts):
+        return -1
+    base = doc.offsets[page_index]
+    text = texts[page_index]
+    needle = title.strip()
+    pos = text.find(needle, max(0, start - base)) if needle else -1
+    if pos < 0 and needle:
+        # اختلاف المسافات بين استخراج النص وبين الأسطر/الفهرس
+        words = [re.escape(w) for w in needle.split()[:6]]
+        m = re.search(r"\s+".join(words), text[max(0, start - base):]) if words else None
+        pos = m.start() + max(0, start - base) if m else -1
+    return base + pos if pos >= 0 else base
+
+
+def _cut(doc, headings: list) -> list:
+    """
+    headings: [(موضع في joined_text, العنوان)] مرتبة → أقسام بنصها الحرفي ونطاق صفحاتها.
+    """
+    text = doc.joined_text
+    headings = sorted({off: title for off, title in headings if off >= 0}.items())
+    sections = []
+    if headings and len(text[:headings[0][0]].strip()) >= PREAMBLE_MIN_CHARS:
+        headings.insert(0, (0, PREAMBLE_TITLE))
+    for i, (off, title) in enumerate(headings):
+        end = headings[i + 1][0] if i + 1 < len(headings) else len(text)
+        content = text[off:end].strip()
+        if not content:
+            continue
+        sections.append({
+            "heading": re.sub(r"\s+", " ", title).strip(),
+            "start_page": doc.page_at(off),
+            "end_page": doc.page_at(max(off, end - 1)),
+            "content": content,
+        })
+    return sections
+
+
+# ============================================================
+# 🧭 الاستراتيجيات: الفهرس ← حجم الخط ← الترقيم والكلمات المفتاحية
+# ============================================================
+def _from_toc(doc) -> list:
+    if doc.kind != "pdf":
+        return []
+    with doc.handle() as handle:
+        toc = [entry for entry in (handle.get_toc(simple=True) or []) if entry[2] >= 1]
+    if not toc:
+        return []
+    # أعلى مستوى فيه عنوانان على الأقل
+    for level in sorted({lvl for lvl, _t, _p in toc}):
+        entries = [(title, page) for lvl, title, page in toc if lvl == level]
+        if SECTIONS_MIN <= len(entries) <= SECTIONS_MAX:
+            out, cursor = [], 0
+            for title, page in entries:
+                off = _locate(doc, page - 1, title, cursor)
+                out.append((off, title))
+                cursor = max(cursor, off)
+            return out
+    return []
+
+
+def _from_fonts(doc) -> list:
+    """أسطر أكبر من خط المتن (أو عريضة بحجمه وقصيرة ومستقلة) تعتبر عناوين؛ يُختار أكبر مستوى يعطي تقسيمًا معقولًا"""
+    if doc.kind != "pdf":
+        return []
+    lines, sizes = [], Counter()
+    with doc.handle() as handle:
+        for pno, page in enumerate(handle):
+            for block in page.get_text("dict").get("blocks", []):
+                block_lines = block.get("lines", [])
+                for line in block_lines:
+                    spans = [s for s in line.get("spans", []) if s.get("text", "").strip()]
+                    if not spans:
+                        continue
+                    text = "".join(s["text"] for s in spans).strip()
+                    size = round(max(s.get("size", 0) for s in spans), 1)
+                    bold = all(s.get("flags", 0) & 16 for s in spans)
+                    sizes[size] += len(text)
+                    lines.append((pno, text, size, bold, len(block_lines) == 1))
+    if not sizes:
+        return []
+    body = sizes.most_common(1)[0][0]
+
+    candidates = [
+        (pno, text, size) for pno, text, size, bold, alone in lines
+        if _short_line(text) and not text.endswith((".", "،", "؛", ","))
+        and (size >= body * FONT_HEADING_RATIO or (bold and alone and size >= body))
+    ]
+    # من أكبر حجم نزولًا: نضم المستويات حتى يصبح عدد العناوين كافيًا
+    for threshold in sorted({size for _p, _t, size in candidates}, reverse=True):
+        chosen = [(pno, text) for pno, text, size in candidates if size >= threshold]
+        if len(chosen) > SECTIONS_MAX:
+            break
+        if len(chosen) >= SECTIONS_MIN:
+            out, cursor = [], 0
+            for pno, text in chosen:
+                off = _locate(doc, pno, text, cursor)
+                out.append((off, text))
+                cursor = max(cursor, off)
+            return out
+    return []
+
+
+def _from_patterns(doc) -> list:
+    """العناوين المرقّمة (بتسلسل متصاعد للمستوى الأول) أو الأسطر القصيرة التي تبدأ بعنوان شائع"""
+    numbered, labelled, keywords = [], [], []
+    expected = None
+    text = doc.joined_text
+    pos = 0
+    for raw in text.split("\n"):
+        line = raw.strip()
+        off = pos + (len(raw) - len(raw.lstrip()))
+        pos += len(raw) + 1
+        if not _short_line(line) or line.endswith((".", "،", "؛", ",")):
+            continue
+        m = _NUMBERED.match(line.translate(_DIGITS))
+        if m and "." not in m.group(1):
+            num = int(m.group(1))
+            if expected is None or num == expected:
+                numbered.append((off, line))
+                expected = num + 1
+            continue
+        norm = normalize_arabic(line)
+        if _ORDINAL.match(norm) or _LABELLED.match(line):
+            labelled.append((off, line))
+        elif _keyword_heading(line):
+            keywords.append((off, line))
+    for found in (numbered, labelled, keywords):
+        if SECTIONS_MIN <= len(found) <= SECTIONS_MAX:
+            return found
+    return []
+
+
+_STRATEGIES = (("toc", _from_toc), ("fonts", _from_fonts), ("patterns", _from_patterns))
+
+
+@traced("sections.split")
+def split_sections(doc) -> list:
+    """
+    تقسيم بنيوي محلي لمستند (modules.document.Document) دون أي استدعاء للنموذج:
+    فهرس PDF ← عناوين بخط أكبر/عريض ← عناوين مرقّمة أو شائعة (عربي/إنجليزي).
+    يعيد [{"heading", "start_page", "end_page", "content"}] بنص كل قسم حرفيًا،
+    أو [] إن لم تظهر بنية موثوقة (فيُستخدم تقسيم النموذج).
+    """
+    sp = current_span().set(file=doc.name, pages=doc.page_count)
+    if not doc.joined_text.strip():
+        return []
+    for name, strategy in _STRATEGIES:
+        try:
+            headings = strategy(doc)
+        except Exception as e:
+            sp.set(**{f"{name}_error": type(e).__name__})
+            continue
+        sections = _cut(doc, headings) if headings else []
+        if len(sections) >= SECTIONS_MIN:
+            sp.set(strategy=name, sections=len(sections))
+            return sections
+    sp.set(strategy="none")
+    return []
@@ -0,0 +1,231 @@
+# modules/tracing.py
+import os
+import json
+import time
+import itertools
+import threading
+import functools
+import contextvars
+from collections import deque, defaultdict
+from contextlib import contextmanager
+
+from modules.progress import propagate_to_threads
+
+# ============================================================
+# ⚙️ الإعدادات
+# ============================================================
+TRACE_HISTORY = int(os.getenv("TRACE_HISTORY", "2000"))  # آخر n مقطع في الذاكرة
+TRACE_OTEL = os.getenv("TRACE_OTEL", "1") != "0"          # تصدير إلى OpenTelemetry إن كان مثبتًا
+
+# الخصائص العددية التي تُجمع في ملخص كل مرحلة
+SUMMED_ATTRS = ("bytes", "pages", "ocr_pages", "chars", "offers", "chunks", "criteria",
+                "prompt_tokens", "completion_tokens", "rows")
+
+_ids = itertools.count(1)
+_recent = deque(maxlen=TRACE_HISTORY)
+
+# المقطع الحالي (للتداخل) وسجل التشغيل الحالي (لجمع مقاطع تشغيل واحد) — يُنقلان لخيوط العمل
+_current_span = propagate_to_threads(contextvars.ContextVar("smarttender_span", default=None))
+_current_trace = propagate_to_threads(contextvars.ContextVar("smarttender_trace", default=None))
+
+_otel = None
+_otel_checked = False
+
+
+def _otel_tracer():
+    """متتبع OpenTelemetry (بلا أثر إن لم يُضبط مزوّد SDK في العملية)"""
+    global _otel, _otel_checked
+    if not _otel_checked:
+        _otel_checked = True
+        if TRACE_OTEL:
+            try:
+                from opentelemetry import trace as ot
+                _otel = ot.get_tracer("smarttender")
+            except Exception:
+                _otel = None
+    return _otel
+
+
+# ============================================================
+# ⏱️ المقطع الزمني
+# ============================================================
+class Span:
+    """
+    مقطع قياس واحد: الاسم + المدة + خصائص (بايتات، صفحات، رموز، ...).
+    الخصائص المذكورة في SUMMED_ATTRS تُجمع في ملخص المرحلة.
+    """
+
+    __slots__ = ("name", "id", "parent_id", "thread", "start", "end", "attrs", "_t0", "_otel_span")
+
+    def __init__(self, name: str, parent=None, **attrs):
+        self.name = name
+        self.id = next(_ids)
+        self.parent_id = parent.id if parent is not None else None
+        self.thread = threading.current_thread().name
+        self.start = time.time()
+        self.end = None
+        self.attrs = dict(attrs)
+        self._t0 = time.perf_counter()
+        self._otel_span = None
+        tracer = _otel_tracer()
+        if tracer is not None:
+            try:
+                from opentelemetry import trace as ot
+                ctx = ot.set_span_in_context(parent._otel_span) if parent is not None and parent._otel_span else None
+                self._otel_span = tracer.start_span(name, context=ctx, start_time=time.time_ns())
+            except Exception:
+                self._otel_span = None
+
+    @property
+    def duration(self) -> float:
+        return (self.end if self.end is not None else time.time()) - self.start
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+        return self
+
+    def add(self, key: str, amount=1):
+        self.attrs[key] = self.attrs.get(key, 0) + amount
+        return self
+
+    def finish(self, trace=None):
+        if self.end is not None:
+            return
+        self.end = self.start + (time.perf_counter() - self._t0)
+        _recent.append(self)
+        trace = trace if trace is not None else _current_trace.get()
+        if trace is not None:
+            trace.record(self)
+        if self._otel_span is not None:
+            try:
+                for k, v in self.attrs.items():
+                    if isinstance(v, (str, bool, int, float)):
+                        self._otel_span.set_attribute(f"smarttender.{k}", v)
+                self._otel_span.end()
+            except Exception:
+                pass
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name, "id": self.id, "parent_id": self.parent_id, "thread": self.thread,
+            "start": round(self.start, 6), "duration_s": round(self.duration, 6), "attrs": self.attrs,
+        }
+
+
+# ============================================================
+# 📒 سجل تشغيل واحد (جلسة التطبيق أو تشغيل دفعي) مع ملف JSONL اختياري
+# ============================================================
+class Trace:
+    def __init__(self, jsonl_path: str = None, limit: int = TRACE_HISTORY):
+        self.spans = deque(maxlen=limit)
+        self.jsonl_path = jsonl_path
+        self._lock = threading.Lock()
+
+    def record(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+            if self.jsonl_path:
+                with open(self.jsonl_path, "a", encoding="utf-8") as fh:
+                    fh.write(json.dumps(span.to_dict(), ensure_ascii=False, default=str) + "\n")
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+    def summary(self) -> list:
+        with self._lock:
+            spans = list(self.spans)
+        return summarize(spans)
+
+
+def summarize(spans) -> list:
+    """
+    تجميع حسب اسم المقطع: العدد، المجموع، المتوسط، الأقصى،
+    ومجموع الخصائص العددية في SUMMED_ATTRS (bytes / pages / prompt_tokens / ...).
+    """
+    groups = defaultdict(list)
+    for s in spans:
+        groups[s.name].append(s)
+    rows = []
+    for name, items in groups.items():
+        durations = [s.duration for s in items]
+        row = {
+            "stage": name, "calls": len(items), "total_s": round(sum(durations), 3),
+            "mean_s": round(sum(durations) / len(items), 3), "max_s": round(max(durations), 3),
+        }
+        for key in SUMMED_ATTRS:
+            values = [s.attrs[key] for s in items if isinstance(s.attrs.get(key), (int, float))]
+            if values:
+                row[key] = sum(values)
+        rows.append(row)
+    return sorted(rows, key=lambda r: r["total_s"], reverse=True)
+
+
+def recent_spans(n: int = 200) -> list:
+    return list(_recent)[-n:]
+
+
+# ============================================================
+# 🧩 واجهات الاستخدام: with span(...) / @traced(...) / start_span(...)
+# ============================================================
+def current_span():
+    return _current_span.get()
+
+
+def start_span(name: str, **attrs) -> Span:
+    """مقطع دون جعله الحالي (للمولّدات التي تمتد عبر yield): يُغلق بـ span.finish()"""
+    return Span(name, parent=_current_span.get(), **attrs)
+
+
+@contextmanager
+def activate(span_obj: Span):
+    """جعل مقطع قائم هو الأب مؤقتًا (مثلًا عند إنشاء مجموعة خيوط داخل مولّد)"""
+    token = _current_span.set(span_obj)
+    try:
+        yield span_obj
+    finally:
+        _current_span.reset(token)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    sp = Span(name, parent=_current_span.get(), **attrs)
+    token = _current_span.set(sp)
+    try:
+        yield sp
+    except BaseException as e:
+        sp.set(error=type(e).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        sp.finish()
+
+
+def traced(name: str = None, **static_attrs):
+    """مزخرف يلف الدالة بمقطع باسمها (أو الاسم المحدد)"""
+    def wrap(fn):
+        label = name or fn.__qualname__
+
+        @functools.wraps(fn)
+        def inner(*args, **kwargs):
+            with span(label, **static_attrs):
+                return fn(*args, **kwargs)
+        return inner
+    return wrap
+
+
+@contextmanager
+def capture(jsonl_path: str = None, trace: Trace = None):
+    """جمع كل المقاطع داخل الكتلة (وخيوط العمل المنشأة منها) في Trace، مع كتابتها في JSONL اختياريًا"""
+    trace = trace or Trace(jsonl_path)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def bind_trace(trace: Trace) -> Trace:
+    """ربط سجل بسياق التشغيل الحالي حتى نهايته (لتشغيل سكربت Streamlit كاملًا)"""
+    _current_trace.set(trace)
+    return trace
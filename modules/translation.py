@@ -0,0 +1,144 @@
+# modules/translation.py
+import os
+import re
+import hashlib
+import threading
+
+from modules.cache import get_cache
+from modules.tracing import span, traced
+
+# ============================================================
+# ⚙️ الإعدادات
+# ============================================================
+TRANSLATION_CACHE_MAX_MB = int(os.getenv("TRANSLATION_CACHE_MAX_MB", "64"))
+TRANSLATION_OFFLINE = os.getenv("TRANSLATION_OFFLINE", "0") == "1"  # بلا شبكة: المسرد المحلي فقط
+TRANSLATION_BATCH_CHARS = 4500  # حد Google لطلب واحد 5000 حرف
+
+# مسرد محلي للمعايير الشائعة (يُستخدم عند غياب الشبكة؛ وما لا يوجد فيه يبقى كما هو)
+GLOSSARY = {
+    ("ar", "en"): {
+        "جودة الحل المقترح": "Quality of the proposed solution",
+        "المنهجية الفنية": "Technical methodology",
+        "الخبرة السابقة": "Previous experience",
+        "خطة التنفيذ": "Implementation plan",
+        "فريق العمل": "Project team",
+        "الابتكار في الحل": "Innovation in the solution",
+        "إدارة المشروع": "Project management",
+        "الامتثال للمتطلبات": "Compliance with requirements",
+        "إدارة المخاطر": "Risk management",
+        "ضمان الجودة": "Quality assurance",
+        "الجدول الزمني": "Timeline",
+        "التدريب ونقل المعرفة": "Training and knowledge transfer",
+        "الدعم الفني": "Technical support",
+        "التكلفة": "Cost",
+        "الاستدامة": "Sustainability",
+        "الأمن السيبراني": "Cybersecurity",
+    },
+}
+
+_lock = threading.Lock()  # طلب شبكة واحد في كل مرة: بقية الخيوط تجد النتيجة في الذاكرة بعده
+
+
+def _cache():
+    return get_cache("translations", max_mb=TRANSLATION_CACHE_MAX_MB)
+
+
+def _key(source: str, target: str, text: str) -> str:
+    return f"{source}|{target}|{hashlib.sha1(text.encode('utf-8')).hexdigest()}"
+
+
+def _norm(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+# ============================================================
+# 🔤 كشف اللغة
+# ============================================================
+@traced("translate.langdetect")
+def detect_language(text: str, sample_chars: int = 1000) -> str:
+    """رمز لغة النص ("ar"/"en"/...) من عينة من بدايته، أو "ar" عند التعذر"""
+    try:
+        from langdetect import detect
+        return detect(text[:sample_chars])
+    except Exception:
+        return "ar"
+
+
+# ============================================================
+# 🌐 الترجمة (دفعة واحدة + ذاكرة دائمة + بديل محلي)
+# ============================================================
+def _batches(texts: list, limit: int = TRANSLATION_BATCH_CHARS) -> list:
+    out, buf, size = [], [], 0
+    for t in texts:
+        if buf and size + len(t) + 1 > limit:
+            out.append(buf)
+            buf, size = [], 0
+        buf.append(t)
+        size += len(t) + 1
+    if buf:
+        out.append(buf)
+    return out
+
+
+def _translate_remote(texts: list, source: str, target: str) -> list:
+    """
+    يرسل النصوص في طلب واحد (سطر لكل نص) لكل دفعة ≤ 4500 حرف؛
+    إن لم يتطابق عدد الأسطر المترجمة نعود لترجمة كل نص على حدة.
+    """
+    from deep_translator import GoogleTranslator
+    translator = GoogleTranslator(source=source, target=target)
+    out = []
+    for batch in _batches(texts):
+        reply = translator.translate("\n".join(batch)) or ""
+        lines = [_norm(line) for line in reply.split("\n") if line.strip()]
+        if len(lines) != len(batch):
+            lines = [_norm(translator.translate(t) or t) for t in batch]
+        out.extend(lines)
+    return out
+
+
+def _translate_offline(text: str, source: str, target: str) -> str:
+    glossary = {_norm(k): v for k, v in GLOSSARY.get((source, target), {}).items()}
+    return glossary.get(_norm(text), text)
+
+
+def translate_texts(texts: list, source: str = "ar", target: str = "en") -> list:
+    """
+    يترجم قائمة نصوص بالترتيب:
+    - ما سبقت ترجمته يُقرأ من الذاكرة الدائمة حسب (المصدر، الهدف، النص)
+    - الباقي يُترجم بطلب شبكة واحد (لكل 4500 حرف) ويُحفظ
+    - عند تعذر الشبكة (أو TRANSLATION_OFFLINE=1) يُستخدم المسرد المحلي أو النص كما هو، دون حفظه
+    """
+    texts = [_norm(t) for t in texts]
+    if source == target or not texts:
+        return list(texts)
+
+    with span("translate.batch", criteria=len(texts), source=source, target=target) as sp:
+        cache = _cache()
+        out = [cache.get_json(_key(source, target, t)) for t in texts]
+        missing = [i for i, v in enumerate(out) if v is None]
+        sp.set(cached=len(texts) - len(missing))
+        if not missing:
+            return out
+
+        with _lock:
+            # خيط آخر ربما ترجمها أثناء الانتظار
+            for i in missing:
+                out[i] = cache.get_json(_key(source, target, texts[i]))
+            missing = [i for i, v in enumerate(out) if v is None]
+            todo = list(dict.fromkeys(texts[i] for i in missing))
+
+            translated = {}
+            if todo and not TRANSLATION_OFFLINE:
+                try:
+                    translated = dict(zip(todo, _translate_remote(todo, source, target)))
+                    sp.set(remote=len(todo))
+                    for src, dst in translated.items():
+                        cache.set_json(_key(source, target, src), dst)
+                except Exception as e:
+                    sp.set(offline_fallback=type(e).__name__)
+                    translated = {}
+
+        for i in missing:
+            out[i] = translated.get(texts[i]) or _translate_offline(texts[i], source, target)
+        return out
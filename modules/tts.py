@@ -0,0 +1,242 @@
+# modules/tts.py
+import io
+import os
+import re
+import html
+import wave
+import shutil
+import hashlib
+import tempfile
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+from modules.cache import get_cache
+from modules.tracing import current_span, traced
+
+# ============================================================
+# ⚙️ الإعدادات
+# ============================================================
+# "auto": gTTS (شبكة) ثم المحرك المحلي عند الفشل | "gtts" | "offline" (pyttsx3 أو espeak-ng دون شبكة)
+TTS_ENGINE = os.getenv("TTS_ENGINE", "auto")
+TTS_LANG = os.getenv("TTS_LANG", "ar")
+TTS_CACHE_MAX_MB = int(os.getenv("TTS_CACHE_MAX_MB", "128"))
+TTS_CHUNK_CHARS = int(os.getenv("TTS_CHUNK_CHARS", "300"))   # طول كل مقطع يُركَّب مستقلًا
+TTS_WORKERS = int(os.getenv("TTS_WORKERS", "4"))              # مقاطع متزامنة للمحركات الشبكية
+TTS_MAX_CHARS = int(os.getenv("TTS_MAX_CHARS", "3000"))       # ما بعده لا يُقرأ (الرد يبقى نصًا كاملًا)
+
+MIME = {"mp3": "audio/mp3", "wav": "audio/wav"}
+
+
+# ============================================================
+# 🧹 تنظيف النص قبل القراءة
+# ============================================================
+_TAGS = re.compile(r"<[^>]+>")
+_MARKDOWN = re.compile(r"[*_`#>|~]+")
+_EMOJI = re.compile("[\\U0001F000-\\U0001FAFF\\u2600-\\u27BF\\uFE0F\\u200D]")
+_PAGE_REF = re.compile(r"\[\s*(صفحة\s*\d+)\s*\]")
+
+
+def clean_for_speech(text: str) -> str:
+    """نص مقروء فقط: دون HTML/Markdown/رموز تعبيرية، و[صفحة 3] تُقرأ "صفحة 3" """
+    text = re.sub(r"<br\s*/?>", "\n", text or "", flags=re.I)
+    text = html.unescape(_TAGS.sub(" ", text))
+    text = _PAGE_REF.sub(r"\1", text)
+    text = _EMOJI.sub("", _MARKDOWN.sub(" ", text))
+    text = re.sub(r"[ \t]+", " ", text)
+    return re.sub(r"\s*\n\s*", "\n", text).strip()
+
+
+_SENTENCE_END = re.compile(r"(?<=[.!?؟؛…])\s+|\n+")
+
+
+def split_sentences(text: str, max_chars: int = None) -> list:
+    """جمل مجمّعة في مقاطع لا تتجاوز max_chars (الجملة الأطول تُقسم على المسافات)"""
+    max_chars = max(40, max_chars or TTS_CHUNK_CHARS)
+    chunks, buf = [], ""
+    for sentence in (s.strip() for s in _SENTENCE_END.split(text or "")):
+        if not sentence:
+            continue
+        while len(sentence) > max_chars:
+            cut = sentence.rfind(" ", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            if buf:
+                chunks.append(buf)
+                buf = ""
+            chunks.append(sentence[:cut].strip())
+            sentence = sentence[cut:].strip()
+        if buf and len(buf) + len(sentence) + 1 > max_chars:
+            chunks.append(buf)
+            buf = ""
+        buf = f"{buf} {sentence}".strip()
+    if buf:
+        chunks.append(buf)
+    return chunks
+
+
+# ============================================================
+# 🔌 المحركات: دالة (نص، لغة) → بايتات صوت بصيغة المحرك
+# ============================================================
+TTS_ENGINES = {}
+
+
+def tts_engine(name: str, fmt: str, concurrent: bool = True):
+    """تسجيل محرك جديد؛ concurrent=False للمحركات غير الآمنة بين الخيوط (تُركَّب مقاطعها بالتتابع)"""
+    def wrap(fn):
+        TTS_ENGINES[name] = {"fn": fn, "format": fmt, "concurrent": concurrent}
+        return fn
+    return wrap
+
+
+@tts_engine("gtts", fmt="mp3")
+def _gtts(text: str, lang: str) -> bytes:
+    from gtts import gTTS
+    buf = io.BytesIO()
+    gTTS(text=text, lang=lang).write_to_fp(buf)
+    return buf.getvalue()
+
+
+_offline_lock = threading.Lock()
+
+
+def _lang_tag_matches(tag, lang: str) -> bool:
+    """وسم اللغة يطابق الرمز تمامًا أو يبدأ بـ code- / code_ (ar ↔ ar-SA، لا ar ↔ ca-ar)"""
+    if isinstance(tag, bytes):  # espeak يعيد الوسم كبايتات مسبوقة ببايت الأولوية (b"\x05ar")
+        tag = tag[1:] if tag[:1] and tag[0] < 32 else tag
+        tag = tag.decode("utf-8", "ignore")
+    tag = str(tag).strip().lower()
+    return tag == lang or tag.startswith((lang + "-", lang + "_"))
+
+
+def _voice_matches(voice, lang: str) -> bool:
+    """اللغة من voice.languages، وإلا من آخر مقطع في معرّف الصوت (مثل .../voices/ar أو ar-SA)"""
+    if any(_lang_tag_matches(code, lang) for code in getattr(voice, "languages", None) or []):
+        return True
+    last = re.split(r"[\\/]", getattr(voice, "id", "") or "")[-1]
+    return _lang_tag_matches(last, lang)
+
+
+@tts_engine("offline", fmt="wav", concurrent=False)
+def _offline(text: str, lang: str) -> bytes:
+    """
+    pyttsx3 (SAPI5/NSSpeech/espeak) إن توفر وعمل، وإلا espeak-ng/espeak من سطر الأوامر:
+    فشل الاستيراد أو init() أو runAndWait()، أو انتهاؤه دون كتابة الملف، كلها تنتقل إلى espeak.
+    """
+    lang = lang.lower()
+    with _offline_lock, tempfile.TemporaryDirectory(prefix="smarttender-tts-") as tmp:
+        path = os.path.join(tmp, "chunk.wav")
+        error = None
+        try:
+            import pyttsx3
+            engine = pyttsx3.init()
+            for voice in engine.getProperty("voices") or []:
+                if _voice_matches(voice, lang):
+                    engine.setProperty("voice", voice.id)
+                    break
+            engine.save_to_file(text, path)
+            engine.runAndWait()
+        except Exception as e:  # ImportError، أو غياب مشغّل الصوت في النظام (RuntimeError/OSError...)
+            error = e
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            binary = shutil.which("espeak-ng") or shutil.which("espeak")
+            if not binary:
+                raise RuntimeError(f"لا يوجد محرك صوت محلي (pyttsx3 أو espeak-ng): {error or 'لم يُكتب ملف الصوت'}")
+            subprocess.run([binary, "-v", lang, "-w", path, text], check=True, capture_output=True, timeout=60)
+        with open(path, "rb") as fh:
+            return fh.read()
+
+
+def _join(parts: list, fmt: str) -> bytes:
+    """إطارات MP3 تُضم مباشرة؛ ملفات WAV تُدمج إطاراتها تحت ترويسة واحدة"""
+    if fmt != "wav" or len(parts) == 1:
+        return b"".join(parts)
+    out = io.BytesIO()
+    with wave.open(out, "wb") as dst:
+        for i, part in enumerate(parts):
+            with wave.open(io.BytesIO(part), "rb") as src:
+                if i == 0:
+                    dst.setparams(src.getparams())
+                dst.writeframes(src.readframes(src.getnframes()))
+    return out.getvalue()
+
+
+# ============================================================
+# 💾 التركيب مع الذاكرة (بصمة النص + المحرك + اللغة)
+# ============================================================
+def _cache():
+    return get_cache("tts", max_mb=TTS_CACHE_MAX_MB)
+
+
+def _key(engine: str, lang: str, text: str) -> str:
+    return f"{engine}|{lang}|{hashlib.sha1(text.encode('utf-8')).hexdigest()}"
+
+
+def _render(engine: str, text: str, lang: str) -> bytes:
+    """كل مقاطع النص بمحرك واحد (بالتوازي إن سمح)، وكل مقطع محفوظ على حدة لإعادة استخدامه"""
+    spec = TTS_ENGINES[engine]
+    cache = _cache()
+    chunks = split_sentences(text)
+    hits = []
+
+    def _chunk(chunk):
+        key = _key(engine, lang, chunk)
+        data = cache.get(key)
+        if data is None:
+            data = spec["fn"](chunk, lang)
+            cache.set(key, data)
+        else:
+            hits.append(key)
+        return data
+
+    workers = max(1, min(TTS_WORKERS, len(chunks))) if spec["concurrent"] else 1
+    if workers == 1:
+        parts = [_chunk(c) for c in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="tts-chunk") as pool:
+            parts = list(pool.map(_chunk, chunks))
+    current_span().set(chunks=len(chunks), cached_chunks=len(hits))
+    return _join(parts, spec["format"])
+
+
+@traced("tts")
+def synthesize(text: str, lang: str = None, engine: str = None):
+    """
+    (بايتات الصوت، نوع MIME) لنص رد (قد يحتوي HTML/Markdown)، أو (None, None) إن لم يبق نص مقروء.
+    كل مقطع محفوظ ببصمة نصه، فنفس الرد (أو جمله المتكررة) يعود من الذاكرة دون تركيب؛
+    engine="auto" يجرب gTTS ثم المحرك المحلي.
+    """
+    lang = lang or TTS_LANG
+    engine = engine or TTS_ENGINE
+    text = clean_for_speech(text)[:TTS_MAX_CHARS]
+    sp = current_span().set(chars=len(text), lang=lang)
+    if not text:
+        return None, None
+
+    errors = []
+    for name in (["gtts", "offline"] if engine == "auto" else [engine]):
+        if name not in TTS_ENGINES:
+            raise ValueError(f"unknown TTS engine: {name}")
+        try:
+            data = _render(name, text, lang)
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+            continue
+        sp.set(engine=name, bytes=len(data))
+        return data, MIME[TTS_ENGINES[name]["format"]]
+    raise RuntimeError("; ".join(errors))
+
+
+# ============================================================
+# 🎧 التركيب في الخلفية (الرد النصي يظهر فورًا)
+# ============================================================
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def speak_async(text: str, lang: str = None, engine: str = None):
+    """Future يُرجع (بايتات، MIME) — يُفحص بـ done() عند كل إعادة تشغيل للواجهة"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="tts")
+    return _executor.submit(synthesize, text, lang, engine)
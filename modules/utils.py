@@ -1,5 +1,4 @@
 import re, json
-import fitz  # مكتبة PyMuPDF لقراءة عدد صفحات PDF
 
 # ============================================================
 # 📦 استخراج JSON من النص حتى لو كان محاطًا بكلام إضافي
@@ -19,14 +18,24 @@ def robust_json_extract(text):
 
 
 # ============================================================
-# 🧮 تحويل المتوسط (1..4) إلى نسبة معيارية (0..1)
+# 🗃️ جدول → سجلات JSON (لملفات المخرجات ونتائج المهام)
 # ============================================================
-def normalized_mean_score(df_scores):
-    """تحويل متوسط الدرجات من المدى (1..4) إلى (0..1)."""
+def frame_records(df) -> list:
+    """صفوف DataFrame كقائمة dict قابلة للتسلسل (القيم المفقودة → None)؛ الجدول الفارغ → []"""
+    if df is None or df.empty:
+        return []
+    return json.loads(df.to_json(orient="records", force_ascii=False))
+
+
+# ============================================================
+# 🧮 تحويل المتوسط (1..4) إلى نسبة معيارية
+# ============================================================
+def normalized_mean_score(df_scores, method="ratio"):
+    """متوسط الدرجات المطبّعة بنفس تطبيع الترتيب والتقرير (modules.scoring)."""
+    from modules.scoring import normalize
     if df_scores.empty:
         return 0.0
-    m = df_scores["score"].astype(float).mean()
-    return float((m - 1) / 3.0)
+    return float(normalize(df_scores["score"].astype(float), method).mean())
 
 
 # ============================================================
@@ -36,18 +45,11 @@ def pdf_page_count(file_like):
     """
     يُرجع عدد صفحات ملف PDF من الكائن المرفوع (UploadedFile).
     يُستخدم للتحقق من مدى قراءة المستند بالكامل.
+    المستند الموحّد (modules.document) يُعاد استخدامه: لا قراءة ولا فتح جديد للملف، والمؤشر لا يتحرك.
     """
     try:
-        # نفتح الملف في الذاكرة
-        with fitz.open(stream=file_like.read(), filetype="pdf") as doc:
-            total_pages = doc.page_count
-        # نعيد المؤشر لبداية الملف حتى لا يؤثر على عمليات القراءة التالية
-        file_like.seek(0)
-        return total_pages
+        from modules.document import open_document
+        return open_document(file_like).page_count
     except Exception as e:
-        try:
-            file_like.seek(0)
-        except:
-            pass
         print(f"⚠️ خطأ أثناء حساب صفحات PDF: {e}")
         return None